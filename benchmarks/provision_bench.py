@@ -0,0 +1,272 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# provision_bench.py
+# End-to-end provisioning benchmark against the in-process simulated sensor (src/sim_peripheral.py),
+# so it runs on machines without Bluetooth. Every case (MTU x write mode x CA certificate size) runs
+# the full flow several times and reports p50/p95/p99 per phase plus devices per minute:
+#
+#   scan      advertising interval until the sensor is seen (modelled, there is no simulated scanner)
+#   connect   connectToDevice() until connected
+#   discover  primary service discovery until SVC_UUID is known
+#   details   characteristic discovery of SVC_UUID
+#   write     until the sensor has stored the config (includes CAPS/digest round trips)
+#   ack       until the app knows the write succeeded (RESULT, write response or the WNR grace period)
+#
+# Results are written as JSON (every sample) and CSV (one line per case); --baseline compares the
+# total p50 of every case with an earlier JSON result. A case without a single successful run shows
+# "n/a" (null in JSON), for example no-response with a payload larger than one packet at that MTU.
+#
+#   python benchmarks/provision_bench.py --runs 20 --out bench/ --baseline bench/previous.json
+
+import argparse, csv, json, os, platform, random, sys, tempfile, time, pathlib
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "src"))
+from typing import Any, Dict, List, Optional
+from PySide6.QtCore import QCoreApplication, QEventLoop, QTimer
+
+from ble_session import ProvisionSession
+from cert_utils import cert_fingerprint, der_to_pem, pem_to_der
+from constants import CTRL_UUID, DATA_UUID, SVC_UUID
+from gatt_cache import GattCache
+from sensor_config import build_payload
+from sim_peripheral import SimLink, SimulatedPeripheral, SimulatedTransport
+from wire_codec import ENCODING_MODES, TransferOptions, pack_payload, resolve_options
+
+PHASES = ("scan", "connect", "discover", "details", "write", "ack")
+WRITE_MODES = ("response", "no-response", "framed", "verified")
+
+BASE_CONFIG = {
+    "wifiSsid": "bench-network", "wifiPassword": "correct horse battery staple",
+    "sensorId": "bench-sensor-0001", "configName": "benchmark",
+    "mqttServer": "mqtt.example.net", "mqttPort": 8883, "mqttUsername": "sensor",
+    "mqttPassword": "s3cr3t-passw0rd", "mqttTopic": "sensors/bench-sensor-0001/data",
+}
+
+def _der(tag: int, content: bytes) -> bytes:
+    n = len(content)
+    if n < 0x80:
+        return bytes((tag, n)) + content
+    size = n.to_bytes((n.bit_length() + 7) // 8, "big")
+    return bytes((tag, 0x80 | len(size))) + size + content
+
+# Structurally valid certificate with random contents (compresses like real keys and signatures)
+def synthetic_cert(pem_chars: int, rng: random.Random) -> str:
+    if pem_chars <= 0:
+        return ""
+    der_len = max(64, pem_chars * 3 // 4 - (pem_chars // 65) * 3 - 60)
+    alg = _der(0x30, bytes.fromhex("06092a864886f70d01010b0500"))
+    sig = _der(0x03, b"\x00" + bytes(rng.getrandbits(8) for _ in range(min(256, der_len // 4))))
+    tbs = _der(0x30, bytes(rng.getrandbits(8) for _ in range(max(16, der_len - len(alg) - len(sig) - 12))))
+    return der_to_pem(_der(0x30, tbs + alg + sig))
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None}
+    return {"p50": round(percentile(values, 0.50), 2), "p95": round(percentile(values, 0.95), 2),
+            "p99": round(percentile(values, 0.99), 2),
+            "mean": round(sum(values) / len(values), 2)}
+
+def fmt_ms(value: Optional[float], width: int) -> str:
+    return f"{'n/a':>{width}s}" if value is None else f"{value:{width}.1f}"
+
+# One provisioning run; returns per-phase milliseconds or None on failure
+def run_once(payload: Dict[str, Any], link: SimLink, options: TransferOptions, advert_ms: float,
+             cache: Optional[GattCache], rng: random.Random, timeout_ms: int,
+             stored: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, float]]:
+    loop = QEventLoop()
+    marks: Dict[str, float] = {}
+    outcome: List[bool] = []
+    peripheral = SimulatedPeripheral(stored, caps=link.caps)
+    transport = SimulatedTransport(peripheral, link)
+    session = ProvisionSession(transport, payload, timeout_ms, options, cache)
+
+    def mark(phase: str) -> None:
+        marks.setdefault(phase, time.perf_counter())
+
+    cached = cache is not None and cache.get(transport.address) is not None
+    transport.connected.connect(lambda: mark("connect"))
+    transport.serviceDiscovered.connect(lambda uuid: cached and uuid == SVC_UUID and mark("discover"))
+    transport.discoveryFinished.connect(lambda found: mark("discover"))
+    transport.serviceReady.connect(lambda: mark("details"))
+    peripheral.on_commit = lambda: mark("write")
+    session.finished.connect(lambda address, ok, msg: (mark("ack"), outcome.append(ok), loop.quit()))
+
+    def start() -> None:
+        mark("scan")
+        session.start()
+    marks["start"] = time.perf_counter()
+    # Until the next advertisement arrives: uniformly distributed over the advertising interval
+    QTimer.singleShot(int(rng.uniform(0.0, advert_ms)), start)
+    loop.exec()
+    session.deleteLater()
+
+    if not outcome or not outcome[0] or any(p not in marks for p in PHASES):
+        return None
+    phases: Dict[str, float] = {}
+    prev = marks["start"]
+    for phase in PHASES:
+        phases[phase] = round((marks[phase] - prev) * 1000.0, 3)
+        prev = marks[phase]
+    phases["total"] = round((prev - marks["start"]) * 1000.0, 3)
+    return phases
+
+def run_case(args: argparse.Namespace, mtu: int, mode: str, cert_chars: int, rng: random.Random) -> Dict[str, Any]:
+    payload = build_payload({**BASE_CONFIG, "caCertificate": synthetic_cert(cert_chars, rng)})
+    link = SimLink(mtu=mtu, latency_ms=args.latency, packet_ms=args.packet, loss=args.loss,
+                   write_response=mode != "no-response", seed=rng.randrange(1 << 30))
+    options = TransferOptions(framed=mode in ("framed", "verified"), verify=mode == "verified",
+                              window=args.window, encoding=args.encoding,
+                              deflate=args.deflate, cert_ref=args.cert_ref)
+    # With --cert-ref the sensor is being re-provisioned and already holds the certificate
+    stored = payload if args.cert_ref else None
+    sent = payload
+    if args.cert_ref and payload["caCertificate"]:
+        sent = {**{k: v for k, v in payload.items() if k != "caCertificate"},
+                "caCertificateRef": cert_fingerprint(pem_to_der(payload["caCertificate"]))}
+    wire_bytes = len(pack_payload(sent, resolve_options(options, link.caps))[0])
+
+    cache_dir = tempfile.mkdtemp(prefix="bench-gatt-") if args.gatt_cache else None
+    cache = GattCache(os.path.join(cache_dir, "gatt_cache.json")) if cache_dir else None
+    samples: List[Dict[str, float]] = []
+    failures = 0
+    for i in range(args.warmup + args.runs):
+        result = run_once(payload, link, options, args.advert_ms, cache, rng, args.timeout, stored)
+        if i < args.warmup:
+            continue
+        if result is None:
+            failures += 1
+        else:
+            samples.append(result)
+
+    busy_ms = sum(s["total"] for s in samples)
+    return {
+        "mtu": mtu, "mode": mode, "cert_chars": cert_chars, "payload_bytes": wire_bytes,
+        "runs": args.runs, "ok": len(samples), "failed": failures,
+        "devices_per_min": round(len(samples) / busy_ms * 60000.0, 2) if busy_ms else None,
+        "phases": {phase: summarize([s[phase] for s in samples]) for phase in PHASES + ("total",)},
+        "samples": samples,
+    }
+
+def case_key(case: Dict[str, Any]) -> str:
+    return f"mtu={case['mtu']} mode={case['mode']} cert={case['cert_chars']}"
+
+def write_results(out_dir: str, meta: Dict[str, Any], cases: List[Dict[str, Any]]) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    json_path = os.path.join(out_dir, f"provision-{stamp}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "cases": cases}, f, indent=1)
+    with open(os.path.join(out_dir, f"provision-{stamp}.csv"), "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["mtu", "mode", "cert_chars", "payload_bytes", "ok", "failed", "devices_per_min"]
+                   + [f"{phase}_{stat}" for phase in PHASES + ("total",) for stat in ("p50", "p95", "p99")])
+        for c in cases:
+            w.writerow([c["mtu"], c["mode"], c["cert_chars"], c["payload_bytes"], c["ok"], c["failed"],
+                        c["devices_per_min"]]
+                       + [c["phases"][phase][stat] for phase in PHASES + ("total",) for stat in ("p50", "p95", "p99")])
+    return json_path
+
+def compare(baseline_path: str, cases: List[Dict[str, Any]]) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        old = {case_key(c): c for c in json.load(f).get("cases", [])}
+    print(f"\nCompared with {baseline_path} (total p50):")
+    for c in cases:
+        prev = old.get(case_key(c))
+        if prev is None or not prev["phases"]["total"]["p50"]:
+            print(f"  {case_key(c):40s}  no baseline"); continue
+        if c["phases"]["total"]["p50"] is None:
+            print(f"  {case_key(c):40s}  no successful run"); continue
+        a, b = prev["phases"]["total"]["p50"], c["phases"]["total"]["p50"]
+        print(f"  {case_key(c):40s}  {a:8.1f} -> {b:8.1f} ms  ({(b - a) / a * 100.0:+.1f}%)")
+
+def int_list(text: str) -> List[int]:
+    return [int(v) for v in text.split(",") if v.strip()]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark the provisioning flow against a simulated sensor.")
+    ap.add_argument("--runs", type=int, default=10, help="measured runs per case (default: 10)")
+    ap.add_argument("--warmup", type=int, default=1, help="unmeasured runs per case (default: 1)")
+    ap.add_argument("--mtu", type=int_list, default=[23, 185, 247], help="ATT MTUs to sweep (default: 23,185,247)")
+    ap.add_argument("--mode", default=",".join(WRITE_MODES),
+                    help=f"write modes to sweep, any of {', '.join(WRITE_MODES)} (default: all)")
+    ap.add_argument("--cert", type=int_list, default=[0, 1200, 3000],
+                    help="CA certificate sizes in PEM characters, 0 = none (default: 0,1200,3000)")
+    ap.add_argument("--encoding", choices=ENCODING_MODES, default="json", help="payload encoding (default: json)")
+    ap.add_argument("--deflate", action="store_true", help="compress payloads when that makes them smaller")
+    ap.add_argument("--cert-ref", action="store_true",
+                    help="re-provision sensors that already hold the CA certificate, sending only its fingerprint "
+                         "(needs --encoding compact or auto)")
+    ap.add_argument("--window", type=int, default=8, help="framed transfer window (default: 8)")
+    ap.add_argument("--latency", type=float, default=15.0, help="one-way link latency in ms (default: 15)")
+    ap.add_argument("--packet", type=float, default=1.25, help="air time per packet in ms (default: 1.25)")
+    ap.add_argument("--loss", type=float, default=0.0, help="WriteWithoutResponse loss probability (default: 0)")
+    ap.add_argument("--advert-ms", type=float, default=100.0, help="advertising interval in ms (default: 100)")
+    ap.add_argument("--gatt-cache", action="store_true", help="reuse the GATT layout after the first run")
+    ap.add_argument("--timeout", type=int, default=30000, help="per-run timeout in ms (default: 30000)")
+    ap.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    ap.add_argument("--out", default="bench_results", help="directory for the JSON/CSV results")
+    ap.add_argument("--baseline", help="earlier JSON result to compare with")
+    args = ap.parse_args()
+
+    modes = [m.strip() for m in args.mode.split(",") if m.strip()]
+    for m in modes:
+        if m not in WRITE_MODES:
+            ap.error(f"unknown write mode '{m}'")
+    if args.runs < 1:
+        ap.error("--runs must be at least 1")
+    if args.cert_ref and args.encoding == "json":
+        ap.error("--cert-ref needs --encoding compact or auto")
+
+    app = QCoreApplication(sys.argv[:1])
+    rng = random.Random(args.seed)
+    cases: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+    print(f"{'case':40s} {'bytes':>6s} {'ok':>5s}  " + " ".join(f"{p:>9s}" for p in PHASES + ("total",))
+          + "   dev/min   (p50 ms)")
+    for mtu in args.mtu:
+        for mode in modes:
+            for cert_chars in args.cert:
+                case = run_case(args, mtu, mode, cert_chars, rng)
+                cases.append(case)
+                print(f"{case_key(case):40s} {case['payload_bytes']:6d} {case['ok']:2d}/{case['runs']:<2d}  "
+                      + " ".join(fmt_ms(case['phases'][p]['p50'], 9) for p in PHASES + ("total",))
+                      + f"   {fmt_ms(case['devices_per_min'], 7)}", flush=True)
+    wall = time.perf_counter() - started
+    ok = sum(c["ok"] for c in cases)
+    print(f"\n{ok} devices provisioned in {wall:.1f}s ({ok / wall * 60.0:.1f} devices/min overall).")
+
+    meta = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "wall_seconds": round(wall, 3),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}}
+    print(f"Results: {write_results(args.out, meta, cases)}")
+    if args.baseline:
+        compare(args.baseline, cases)
+    del app
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# startup_bench.py
+# Cold-start benchmark for the setup app. Launches it repeatedly with ENVDATA_STARTUP_PROBE set
+# (src/startup_probe.py), so every launch records wall-clock marks and quits on its own:
+#
+#   imported     interpreter started (or the one-file exe unpacked) and the app modules imported
+#   window       MainWindow constructed
+#   first_paint  first paint event of the main window
+#   interactive  deferred widgets built and the event loop idle again
+#
+# All marks are measured from the moment the process was spawned. Works with the script and with
+# a PyInstaller build (--exe), which also shows the cost of --onefile unpacking.
+#
+#   python benchmarks/startup_bench.py --runs 20
+#   python benchmarks/startup_bench.py --exe dist\EnvDataMqtt_Setup\EnvDataMqtt_Setup.exe --out bench_results
+
+import argparse, json, os, platform, subprocess, sys, tempfile, time, pathlib
+from typing import Any, Dict, List, Optional
+
+from provision_bench import summarize
+
+MARKS = ("imported", "window", "first_paint", "interactive")
+SCRIPT = pathlib.Path(__file__).resolve().parent.parent / "src" / "EnvDataMqtt_Setup.py"
+
+# One launch; returns milliseconds since spawn per mark, or None when the app did not report
+def run_once(cmd: List[str], timeout_s: float) -> Optional[Dict[str, float]]:
+    fd, probe_path = tempfile.mkstemp(prefix="envdata-startup-", suffix=".json")
+    os.close(fd); os.unlink(probe_path)
+    env = dict(os.environ, ENVDATA_STARTUP_PROBE=probe_path)
+    spawned = time.time()
+    try:
+        subprocess.run(cmd, env=env, timeout=timeout_s, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(probe_path, "r", encoding="utf-8") as f:
+            marks = json.load(f)
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+    finally:
+        if os.path.exists(probe_path):
+            os.unlink(probe_path)
+    return {m: round((marks[m] - spawned) * 1000.0, 2) for m in MARKS if m in marks}
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Measure cold start of the setup app.")
+    ap.add_argument("--runs", type=int, default=10, help="measured launches (default: 10)")
+    ap.add_argument("--warmup", type=int, default=1, help="unmeasured launches, fills the OS file cache (default: 1)")
+    ap.add_argument("--exe", help="packaged executable to launch instead of src/EnvDataMqtt_Setup.py")
+    ap.add_argument("--timeout", type=float, default=60.0, help="per-launch timeout in seconds (default: 60)")
+    ap.add_argument("--out", help="directory for a JSON result with every sample")
+    args = ap.parse_args()
+    if args.runs < 1:
+        ap.error("--runs must be at least 1")
+
+    cmd = [args.exe] if args.exe else [sys.executable, str(SCRIPT)]
+    for _ in range(args.warmup):
+        run_once(cmd, args.timeout)
+    samples: List[Dict[str, float]] = []
+    failed = 0
+    for i in range(args.runs):
+        sample = run_once(cmd, args.timeout)
+        if sample is None:
+            failed += 1; continue
+        samples.append(sample)
+        print(f"run {i + 1:3d}: " + "  ".join(f"{m} {sample.get(m, 0.0):7.1f}" for m in MARKS), flush=True)
+
+    stats: Dict[str, Any] = {m: summarize([s[m] for s in samples if m in s]) for m in MARKS}
+    print(f"\n{'mark':12s} {'p50':>8s} {'p95':>8s} {'mean':>8s}   (ms since spawn, {len(samples)} ok, {failed} failed)")
+    for m in MARKS:
+        print(f"{m:12s} {stats[m]['p50']:8.1f} {stats[m]['p95']:8.1f} {stats[m]['mean']:8.1f}")
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        path = os.path.join(args.out, f"startup-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        meta = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                "platform": platform.platform(), "command": cmd}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "stats": stats, "samples": samples, "failed": failed}, f, indent=1)
+        print(f"Results: {path}")
+    if not samples:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
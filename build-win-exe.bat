@@ -2,7 +2,9 @@
 setlocal enableextensions
 
 REM ==========================================================
-REM Build EnvDataMqtt_Setup.exe (one-file) with PyInstaller
+REM Build EnvDataMqtt_Setup.exe with PyInstaller
+REM   build-win-exe.bat          folder build (fast startup)
+REM   build-win-exe.bat onefile  single exe, unpacks itself on every launch
 REM ==========================================================
 
 cd /d "%~dp0"
@@ -12,6 +14,13 @@ set "SCRIPT=.\src\EnvDataMqtt_Setup.py"
 set "ICON_1=.\src\icons\EnvDataMqtt_Setup.ico"
 set "ICON_2=.\src\icons\EnvDataMqtt_Setup.png"
 
+set "MODE=--onedir"
+set "OUTPUT=dist\%NAME%\%NAME%.exe"
+if /i "%~1"=="onefile" (
+  set "MODE=--onefile"
+  set "OUTPUT=dist\%NAME%.exe"
+)
+
 echo [CLEAN] Removing previous build artifacts...
 if exist build rmdir /s /q build
 if exist dist rmdir /s /q dist
@@ -20,7 +29,7 @@ if exist "%NAME%.spec" del /q "%NAME%.spec"
 echo [BUILD] Packaging with PyInstaller...
 py -m PyInstaller --clean --noconfirm ^
     --name "%NAME%" ^
-    --onefile --noconsole ^
+    %MODE% --noconsole ^
     --icon "%ICON_1%" ^
     --hidden-import PySide6.QtCore ^
     --hidden-import PySide6.QtGui ^
@@ -34,6 +43,6 @@ if errorlevel 1 (
   exit /b 1
 )
 
-echo [DONE] Built: dist\%NAME%.exe
+echo [DONE] Built: %OUTPUT%
 echo If the icon does not show immediately in Explorer, refresh or clear the icon cache.
 pause
\ No newline at end of file
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# EnvDataMqtt_Batch.py
+# Headless batch provisioning: pushes configs from a manifest to many sensors without the GUI.
+# Requirements: Python 3.8+, PySide6 (pip pyside6)
+#
+# Manifest (JSON):
+#   {
+#     "config":  { ...shared config, same keys as "Save Config…" },
+#     "devices": [ { "address": "AA:BB:CC:DD:EE:FF", "config": { ...per-device overrides },
+#                    "timeout": 45 }, ... ]
+#   }
+#
+# Fleet manifest (CSV or JSONL rows plus --base config.json), see fleet_manifest.py:
+#   address,sensorId,localIp
+#   AA:BB:CC:DD:EE:FF,greenhouse-01,192.168.1.51
+
+import argparse, json, sys, pathlib
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
+from typing import Any, Dict, Iterable, List
+from PySide6.QtCore import QCoreApplication, QTimer
+
+from scheduler import ProvisionJob, ProvisionScheduler
+from sensor_config import build_payload
+from fleet_manifest import FleetManifest, ManifestError, is_rows_file
+from cert_store import CertStore
+from gatt_cache import GattCache
+from job_journal import JobJournal
+from sim_peripheral import SimLink, SimulatedPeripheral, SimulatedTransport
+from status_monitor import WAIT_STAGES
+from telemetry import Telemetry
+from wire_codec import ENCODING_MODES, TransferOptions
+
+def load_manifest(path: str) -> List[ProvisionJob]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            d = json.load(f)
+    except ValueError as e:
+        raise ManifestError(f"{path}: invalid JSON ({e}).") from None
+    base = d.get("config", {}) if isinstance(d, dict) else {}
+    devices = d.get("devices", []) if isinstance(d, dict) else d
+    if not isinstance(base, dict):
+        raise ManifestError("'config' must be a JSON object.")
+    if not isinstance(devices, list):
+        raise ManifestError("'devices' must be a list.")
+
+    jobs: List[ProvisionJob] = []
+    for i, entry in enumerate(devices):
+        if not isinstance(entry, dict):
+            raise ManifestError(f"Device #{i + 1}: expected a JSON object.")
+        address = str(entry.get("address", "")).strip()
+        if not address:
+            raise ManifestError(f"Device #{i + 1}: missing 'address'.")
+        overrides = entry.get("config", {})
+        if not isinstance(overrides, dict):
+            raise ManifestError(f"Device #{i + 1} [{address}]: 'config' must be a JSON object.")
+        try:
+            payload = build_payload({**base, **overrides})
+            timeout = entry.get("timeout")
+            timeout_ms = int(float(timeout) * 1000) if timeout is not None else None
+            if timeout_ms is not None and timeout_ms < 1:
+                raise ValueError(f"timeout must be positive, not {timeout}.")
+        except (TypeError, ValueError) as e:
+            raise ManifestError(f"Device #{i + 1} [{address}]: {e}") from None
+        jobs.append(ProvisionJob(address, payload, timeout_ms))
+    return jobs
+
+def fleet_jobs(manifest: FleetManifest) -> Iterable[ProvisionJob]:
+    for entry in manifest:
+        yield ProvisionJob(entry.address, entry.payload, entry.timeout_ms)
+
+# Parses each distinct CA certificate once; `certs` then serves the DER to every session
+def check_der_certs(jobs: Iterable[ProvisionJob], certs: CertStore) -> None:
+    for job in jobs:
+        try:
+            if job.payload["caCertificate"]:
+                certs.add(job.payload["caCertificate"])
+        except ValueError as e:
+            raise ValueError(f"[{job.address}] {e}") from None
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Provision many EnvDataMqtt sensors over Bluetooth without the GUI.")
+    ap.add_argument("manifest", help="JSON manifest with a shared 'config' and a list of 'devices', "
+                                     "or a CSV/JSONL fleet manifest used with --base")
+    ap.add_argument("--base", help="shared config (JSON) for a CSV/JSONL fleet manifest")
+    ap.add_argument("--check", action="store_true", help="validate the manifest and exit without provisioning")
+    ap.add_argument("--timeout", type=float, default=30.0, help="per-device timeout in seconds (default: 30)")
+    ap.add_argument("-j", "--concurrency", type=int, default=4,
+                    help="number of devices provisioned at the same time (default: 4)")
+    ap.add_argument("--framed", action="store_true",
+                    help="use the MTU-sized chunked transfer protocol instead of a single long write")
+    ap.add_argument("--window", type=int, default=8,
+                    help="unacknowledged chunks in flight with --framed (default: 8)")
+    ap.add_argument("--encoding", choices=ENCODING_MODES, default="json",
+                    help="payload encoding; 'auto' negotiates compact encoding and falls back to JSON (default: json)")
+    ap.add_argument("--der-cert", action="store_true",
+                    help="send the CA certificate as DER (compact encoding only; with 'auto' only if supported)")
+    ap.add_argument("--deflate", action="store_true",
+                    help="zlib-compress the payload when that makes it smaller (with 'auto' only if supported)")
+    ap.add_argument("--delta", action="store_true",
+                    help="send only the fields that differ from the device's current config (needs --framed)")
+    ap.add_argument("--cert-ref", action="store_true",
+                    help="ask each sensor whether it already holds the CA certificate and send only its SHA-256 "
+                         "fingerprint if it does (compact encoding only; with 'auto' only if supported)")
+    ap.add_argument("--verify", action="store_true",
+                    help="framed transfer that streams every chunk without acknowledgements and then compares "
+                         "SHA-256/CRC32 digests with the sensor, resending only damaged ranges (implies --framed)")
+    ap.add_argument("--wait-for", choices=WAIT_STAGES, default="applied",
+                    help="status the sensor must report on STAT_UUID before it counts as done: config 'applied', "
+                         "Wi-Fi joined or MQTT connected (default: applied)")
+    ap.add_argument("--no-gatt-cache", action="store_true",
+                    help="always run a full GATT discovery instead of using the per-device layout cache")
+    ap.add_argument("--simulate", metavar="SETTINGS", nargs="?", const="",
+                    help="provision in-process simulated sensors instead of real ones, optionally with link "
+                         "settings such as 'mtu=185,latency=20,loss=0.01,notify=0'")
+    ap.add_argument("--trace", metavar="FILE",
+                    help="append a JSON line per BLE phase (with a per-device correlation ID) to this file")
+    ap.add_argument("--metrics", metavar="FILE", help="write per-phase duration histograms in Prometheus text format")
+    ap.add_argument("--report", help="write per-device results to this JSON file")
+    ap.add_argument("--journal", metavar="FILE",
+                    help="record every device's state in this file as it changes; rerunning with the same file "
+                         "after a crash skips sensors that already confirmed the same config and retries the rest")
+    ap.add_argument("-v", "--verbose", action="store_true", help="print every BLE step")
+    args = ap.parse_args()
+
+    if args.concurrency < 1:
+        ap.error("--concurrency must be at least 1")
+    if args.timeout <= 0:
+        ap.error("--timeout must be positive")
+    if args.window < 1:
+        ap.error("--window must be at least 1")
+    if args.der_cert and args.encoding == "json":
+        ap.error("--der-cert needs --encoding compact or auto")
+    if args.cert_ref and args.encoding == "json":
+        ap.error("--cert-ref needs --encoding compact or auto")
+    args.framed = args.framed or args.verify
+    if args.delta and not args.framed:
+        ap.error("--delta needs --framed")
+
+    jobs: Iterable[ProvisionJob]
+    certs = CertStore()
+    try:
+        if is_rows_file(args.manifest):
+            if not args.base:
+                ap.error("a CSV/JSONL fleet manifest needs --base")
+            fleet = FleetManifest.from_files(args.base, args.manifest)
+            # Validate every row before the first device is touched, then stream them again lazily
+            count, errors = fleet.validate()
+            if errors:
+                raise ManifestError("\n  ".join([f"{len(errors)} problem(s):"] + errors))
+            jobs = fleet_jobs(fleet)
+            if args.der_cert:
+                check_der_certs(fleet_jobs(fleet), certs)
+        else:
+            jobs = load_manifest(args.manifest)
+            count = len(jobs)
+            if args.der_cert:
+                check_der_certs(jobs, certs)
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f"Manifest error: {e}\n")
+        sys.exit(2)
+    if args.check:
+        print(f"Manifest OK: {count} device(s).")
+        sys.exit(0)
+
+    transport_factory = None
+    if args.simulate is not None:
+        try:
+            link = SimLink.parse(args.simulate)
+        except ValueError as e:
+            ap.error(f"--simulate: {e}")
+        transport_factory = lambda address: SimulatedTransport(SimulatedPeripheral(caps=link.caps), link, address)
+
+    telemetry = Telemetry(args.trace or "", args.metrics or "") if args.trace or args.metrics else None
+    journal = None
+    if args.journal:
+        try:
+            journal = JobJournal(args.journal)
+        except OSError as e:
+            ap.error(f"--journal: {e}")
+        if journal.skipped_lines:
+            sys.stderr.write(f"Journal: skipped {journal.skipped_lines} unreadable line(s) in {args.journal}.\n")
+        if len(journal):
+            counts = journal.counts()
+            print("Resuming from journal: " + ", ".join(f"{n} {state}" for state, n in counts.items() if n) + ".")
+
+    app = QCoreApplication(sys.argv[:1])
+    options = TransferOptions(args.framed, args.window, args.encoding, args.der_cert, args.deflate, args.delta,
+                              args.wait_for, args.verify, args.cert_ref)
+    cache = None if args.no_gatt_cache else GattCache()
+    scheduler = ProvisionScheduler(jobs, args.concurrency, int(args.timeout * 1000), options, cache,
+                                   transport_factory, telemetry, journal, certs)
+    if args.verbose:
+        scheduler.logged.connect(lambda address, msg: print(f"[{address}] {msg}", flush=True))
+    scheduler.deviceFinished.connect(
+        lambda address, ok, msg, seconds: print(f"{'OK  ' if ok else 'FAIL'} {address}  {seconds:6.2f}s  {msg}", flush=True))
+    scheduler.jobsFailed.connect(lambda msg: sys.stderr.write(f"{msg}\n"))
+    scheduler.finished.connect(app.quit)
+    QTimer.singleShot(0, scheduler.start)
+    app.exec()
+    if telemetry is not None:
+        telemetry.close()
+    if journal is not None:
+        journal.close()
+
+    results = scheduler.results
+    ok = sum(1 for r in results if r["ok"])
+    skipped = f" ({scheduler.skipped} already confirmed)" if scheduler.skipped else ""
+    print(f"{ok}/{len(results)} devices provisioned{skipped} in {scheduler.elapsed:.1f}s.")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    sys.exit(0 if ok == len(results) and scheduler.job_error is None else 1)
+
+if __name__ == "__main__":
+    main()
@@ -23,15 +23,18 @@
 # EnvDataMqtt_Setup.py
 # Requirements: Python 3.8+, PySide6 (pip pyside6)
 
-import os, sys, pathlib
+import os, sys, time, pathlib
+_STARTED = time.time()
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent))
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QIcon
 
 from main_window import MainWindow
+from startup_probe import StartupProbe
 from utils import resource_path, set_app_user_model_id
 
 def main() -> None:
+    probe = StartupProbe.from_env({"started": _STARTED, "imported": time.time()})
     set_app_user_model_id("EnvDataMqtt_Setup")  # harmless on non-Windows
     app = QApplication(sys.argv)
 
@@ -48,6 +51,8 @@ def main() -> None:
         w.setWindowIcon(QIcon(ico_path))
     elif os.path.exists(png_path):
         w.setWindowIcon(QIcon(png_path))
+    if probe is not None:
+        probe.watch(w)
     w.show()
     sys.exit(app.exec())
 
@@ -18,13 +18,49 @@
 #  SOFTWARE.
 
 from constants import SVC_UUID, CTRL_UUID, DATA_UUID, STAT_UUID
-from utils import make_ip_validator, resource_path, set_app_user_model_id
+from utils import make_ip_validator, resource_path, set_app_user_model_id, app_data_path
 from device_picker import DevicePicker
 from config_form import ConfigForm
 from main_window import MainWindow
+from sensor_config import DEFAULT_CONFIG, ConfigError, SensorConfig, build_payload
+from ble_session import ProvisionSession
+from transport import Transport, QtTransport, ConnectionProfile, LinkParams, device_info_for
+from scheduler import ProvisionJob, ProvisionScheduler
+from job_journal import JobJournal
+from framing import ChunkedTransfer, chunk_size_for_mtu
+from framed_writer import FramedWriter
+from wire_codec import TransferOptions, encode_payload, decode_payload, pack_payload, unpack_payload
+from cert_utils import pem_to_der, der_to_pem
+from negotiation import CtrlQuery, DigestReader
+from cert_store import CertStore
+from config_bundle import BundleError, ConfigBundle
+from config_delta import diff_config, field_digest
+from fleet_manifest import FleetManifest, ManifestError
+from gatt_cache import GattCache
+from device_registry import DeviceRegistry
+from device_model import DeviceListModel, DeviceFilterProxy
+from scan_policy import ScanPolicy, ScanTracker
+from sim_peripheral import SimLink, SimulatedPeripheral, SimulatedTransport
+from telemetry import Telemetry, Trace
+from log_sink import LogSink
+from status_monitor import StatusEvent, StatusTracker, parse_status
+from reconnect import Backoff
+from async_ble import AsyncLink, LinkError, ProvisionError, provision
 
 __all__ = [
     "SVC_UUID", "CTRL_UUID", "DATA_UUID", "STAT_UUID",
-    "make_ip_validator", "resource_path", "set_app_user_model_id",
+    "make_ip_validator", "resource_path", "set_app_user_model_id", "app_data_path",
     "DevicePicker", "ConfigForm", "MainWindow",
+    "DEFAULT_CONFIG", "ConfigError", "SensorConfig", "build_payload", "ConfigBundle", "BundleError",
+    "ProvisionSession", "device_info_for", "Transport", "QtTransport", "ConnectionProfile", "LinkParams",
+    "ProvisionJob", "ProvisionScheduler", "JobJournal",
+    "ChunkedTransfer", "chunk_size_for_mtu", "FramedWriter",
+    "encode_payload", "decode_payload", "CtrlQuery",
+    "TransferOptions", "pack_payload", "unpack_payload", "pem_to_der", "der_to_pem",
+    "DigestReader", "CertStore", "diff_config", "field_digest", "GattCache",
+    "DeviceRegistry", "DeviceListModel", "DeviceFilterProxy",
+    "ScanPolicy", "ScanTracker", "FleetManifest", "ManifestError",
+    "SimLink", "SimulatedPeripheral", "SimulatedTransport", "Telemetry", "Trace",
+    "LogSink", "StatusEvent", "StatusTracker", "parse_status", "Backoff",
+    "AsyncLink", "LinkError", "ProvisionError", "provision",
 ]
@@ -0,0 +1,248 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Coroutines over Transport and ProvisionSession, so scripts can overlap several devices with
+# asyncio.gather() instead of writing signal callbacks. Qt only delivers the BLE signals while its
+# event loop runs, so the coroutines must run on PySide6's QtAsyncio loop, which is asyncio on top
+# of the Qt event loop (async_ble.run() starts it). Every coroutine can be cancelled and takes a
+# timeout in seconds that raises asyncio.TimeoutError; left out it is the link's timeout, and None
+# waits forever.
+#
+#   async def main():
+#       results = await asyncio.gather(*(provision(SimulatedTransport(...), payload) for ...),
+#                                      return_exceptions=True)
+#   async_ble.run(main())
+
+from __future__ import annotations
+import asyncio
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, TypeVar
+from PySide6.QtBluetooth import QBluetoothUuid
+from PySide6.QtCore import QCoreApplication, SignalInstance
+
+from cert_store import CertStore
+from constants import SVC_UUID, STAT_UUID
+from gatt_cache import GattCache
+from ble_session import ProvisionSession
+from status_monitor import EV_APPLIED, StatusTracker
+from telemetry import Telemetry
+from transport import BULK_PROFILE, LinkParams, Transport
+from wire_codec import TransferOptions
+
+T = TypeVar("T")
+
+class LinkError(RuntimeError):
+    pass
+
+# A provisioning run that ended without success; message is what the session logged last
+class ProvisionError(RuntimeError):
+    def __init__(self, address: str, message: str) -> None:
+        super().__init__(f"[{address}] {message}")
+        self.address = address
+        self.message = message
+
+# Runs `coro` on the QtAsyncio loop and returns its result; creates the QCoreApplication if needed
+def run(coro: Coroutine[Any, Any, T]) -> T:
+    from PySide6 import QtAsyncio
+    if QCoreApplication.instance() is None:
+        QCoreApplication([])
+    return QtAsyncio.run(coro, keep_running=False)
+
+# Default of the per-call timeouts, so that None can mean no limit
+_LINK_TIMEOUT: Any = object()
+
+class AsyncLink:
+    def __init__(self, transport: Transport, timeout: Optional[float] = 30.0) -> None:
+        self.transport = transport
+        self.timeout = timeout      # default for every call that does not pass its own
+
+    @property
+    def address(self) -> str:
+        return self.transport.address
+
+    async def __aenter__(self) -> "AsyncLink":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *_exc: Any) -> None:
+        self.transport.disconnect_device()
+
+    def _timeout(self, timeout: Optional[float]) -> Optional[float]:
+        return self.timeout if timeout is _LINK_TIMEOUT else timeout
+
+    # Subscribes right away: the future resolves with the first emission of `signal` that `accept`
+    # returns a value (not None) for, and fails when the link reports an error or drops in the
+    # meantime. The returned function unsubscribes.
+    def _listen(self, signal: SignalInstance, accept: Callable[..., Any], what: str,
+                fail_on_drop: bool = True) -> Tuple[asyncio.Future, Callable[[], None]]:
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+
+        def on_signal(*args: Any) -> None:
+            value = accept(*args)
+            if value is not None and not fut.done():
+                fut.set_result(value)
+
+        def on_error(msg: str) -> None:
+            if not fut.done():
+                fut.set_exception(LinkError(f"{what}: {msg}"))
+
+        def on_drop() -> None:
+            on_error("device disconnected")
+
+        handlers: List[Tuple[SignalInstance, Callable[..., None]]] = [(signal, on_signal),
+                                                                     (self.transport.errorOccurred, on_error)]
+        if fail_on_drop:
+            handlers.append((self.transport.disconnected, on_drop))
+        for sig, handler in handlers:
+            sig.connect(handler)
+
+        def close() -> None:
+            for sig, handler in handlers:
+                sig.disconnect(handler)
+        return fut, close
+
+    # _listen() around `start`, which runs once subscribed
+    async def _wait(self, signal: SignalInstance, accept: Callable[..., Any], start: Callable[[], Any],
+                    timeout: Optional[float], what: str, fail_on_drop: bool = True) -> Any:
+        fut, close = self._listen(signal, accept, what, fail_on_drop)
+        try:
+            if start() is False:
+                raise LinkError(f"{what}: could not be started")
+            return await asyncio.wait_for(fut, self._timeout(timeout))
+        finally:
+            close()
+
+    # A cancelled or timed-out call drops the connect attempt as well
+    async def connect(self, timeout: Optional[float] = _LINK_TIMEOUT) -> LinkParams:
+        try:
+            await self._wait(self.transport.connected, lambda: True, self.transport.connect_device, timeout,
+                             "Connect")
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            self.transport.disconnect_device()
+            raise
+        self.transport.request_connection_update(BULK_PROFILE)
+        return self.transport.link_params()
+
+    async def disconnect(self, timeout: Optional[float] = _LINK_TIMEOUT) -> None:
+        await self._wait(self.transport.disconnected, lambda: True, self.transport.disconnect_device, timeout,
+                         "Disconnect", fail_on_drop=False)
+
+    # Discovers SVC_UUID and its characteristics; returns {uuid: GATT property bits}.
+    # skip_values: the layout is already known, as with GattCache
+    async def discover(self, skip_values: bool = False, timeout: Optional[float] = _LINK_TIMEOUT) -> Dict[str, int]:
+        found = await self._wait(self.transport.discoveryFinished, lambda ok: ok,
+                                 self.transport.discover_services, timeout, "Service discovery")
+        if not found:
+            raise LinkError(f"Service discovery: {SVC_UUID.toString()} not found on device")
+        await self._wait(self.transport.serviceReady, lambda: True,
+                         lambda: self.transport.open_service(skip_values), timeout, "Service details")
+        return self.transport.characteristics()
+
+    # WriteWithResponse waits for the confirmation; WriteWithoutResponse returns once queued
+    async def write(self, uuid: QBluetoothUuid, data: bytes, with_response: bool = True,
+                    timeout: Optional[float] = _LINK_TIMEOUT) -> None:
+        if not self.transport.has(uuid):
+            raise LinkError(f"Write: {uuid.toString()} is not on the device")
+        if not with_response:
+            self.transport.write(uuid, data, with_response=False); return
+        await self._wait(self.transport.characteristicWritten, lambda ch, _value: True if ch == uuid else None,
+                         lambda: self.transport.write(uuid, data), timeout, "Write")
+
+    async def read(self, uuid: QBluetoothUuid, timeout: Optional[float] = _LINK_TIMEOUT) -> bytes:
+        if not self.transport.has(uuid):
+            raise LinkError(f"Read: {uuid.toString()} is not on the device")
+        return await self._wait(self.transport.characteristicRead, lambda ch, value: value if ch == uuid else None,
+                                lambda: self.transport.read(uuid), timeout, "Read")
+
+    # Next notification of `uuid`
+    async def notification(self, uuid: QBluetoothUuid, timeout: Optional[float] = _LINK_TIMEOUT) -> bytes:
+        return await self._wait(self.transport.characteristicChanged,
+                                lambda ch, value: value if ch == uuid else None,
+                                lambda: self.transport.enable_notifications(uuid), timeout, "Notification")
+
+    # Follows STAT_UUID until the sensor reports `wait_for` (applied, wifi or mqtt). Subscribes before
+    # returning, so call it before the write and await the result afterwards; the future resolves
+    # with the status text. Each stage still has its own timeout (STAGE_TIMEOUT_MS) unless timeout
+    # is None, which waits as long as the sensor takes:
+    #   status = link.watch_status()
+    #   await link.write(DATA_UUID, data); await status
+    def watch_status(self, wait_for: str = EV_APPLIED,
+                     timeout: Optional[float] = _LINK_TIMEOUT) -> "asyncio.Future[str]":
+        tracker = StatusTracker(wait_for)
+        tracker.stage_timeouts = timeout is not None
+        feed = lambda uuid, value: tracker.feed(value) if uuid == STAT_UUID else None
+        self.transport.characteristicChanged.connect(feed)
+        fut, close = self._listen(tracker.finished, lambda ok, msg: (ok, msg), "Status")
+
+        def release() -> None:
+            tracker.stop()
+            close()
+            self.transport.characteristicChanged.disconnect(feed)
+            tracker.deleteLater()
+        if not self.transport.enable_notifications(STAT_UUID):
+            release()
+            raise LinkError("Status: could not be started")
+        tracker.start()
+
+        async def follow() -> str:
+            try:
+                ok, msg = await asyncio.wait_for(fut, self._timeout(timeout))
+            finally:
+                release()
+            if not ok:
+                raise LinkError(f"Status: {msg}")
+            return msg
+        return asyncio.ensure_future(follow())
+
+    async def wait_for_status(self, wait_for: str = EV_APPLIED, timeout: Optional[float] = _LINK_TIMEOUT) -> str:
+        return await self.watch_status(wait_for, timeout)
+
+# The whole provisioning sequence (ProvisionSession, with framing, negotiation, reconnects and
+# status tracking) as one coroutine. Returns the final message or raises ProvisionError; a
+# cancelled or timed-out call aborts the session and disconnects. A shared `cache` is written
+# only by cache.save(), once the caller is done with all devices.
+async def provision(transport: Transport, payload: Dict[str, Any], options: TransferOptions = TransferOptions(),
+                    timeout: Optional[float] = 30.0, cache: Optional[GattCache] = None,
+                    telemetry: Optional[Telemetry] = None, certs: Optional[CertStore] = None,
+                    log: Optional[Callable[[str, str], None]] = None) -> str:
+    # The session keeps its own deadline as well, so it reports "Timed out." like the batch tool
+    session_ms = int(timeout * 1000) if timeout is not None else 24 * 3600 * 1000
+    session = ProvisionSession(transport, payload, session_ms, options, cache, telemetry, certs)
+    fut: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def on_finished(_address: str, ok: bool, msg: str) -> None:
+        if not fut.done():
+            fut.set_result((ok, msg))
+
+    session.finished.connect(on_finished)
+    if log is not None:
+        session.logged.connect(log)
+    session.start()
+    try:
+        ok, msg = await asyncio.wait_for(fut, timeout + 1 if timeout is not None else None)
+    except asyncio.TimeoutError:
+        session.abort("Timed out.")
+        raise
+    except asyncio.CancelledError:
+        session.abort("Cancelled.")
+        raise
+    finally:
+        session.deleteLater()
+    if not ok:
+        raise ProvisionError(session.address, msg)
+    return msg
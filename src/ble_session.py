@@ -0,0 +1,468 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+from __future__ import annotations
+from typing import Any, Dict, Optional, Tuple
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from cert_store import CertStore
+from constants import SVC_UUID, CTRL_UUID, DATA_UUID, STAT_UUID
+from framed_writer import FramedWriter
+from framing import FLAG_STREAM, ChunkedTransfer
+from config_delta import diff_config
+from gatt_cache import GattCache
+from negotiation import CtrlQuery, DigestReader
+from reconnect import Backoff
+from status_monitor import EV_APPLIED, EV_INFO, WAIT_STAGES, StatusEvent, StatusTracker
+from telemetry import Telemetry, Trace
+from transport import ATT_WRITE_OVERHEAD, BULK_PROFILE, LinkParams, PROP_WRITE, PROP_WRITE_NO_RESPONSE, Transport
+from wire_codec import CAP_RESUME, TransferOptions, describe_flags, pack_payload, resolve_options
+
+# Same connect/discover/write sequence as MainWindow, for a single device and without any widgets
+class ProvisionSession(QObject):
+    logged: Signal = Signal(str, str)           # address, message
+    finished: Signal = Signal(str, bool, str)   # address, ok, message
+    written: Signal = Signal(str)               # address; the sensor has accepted the payload bytes
+
+    # Grace period before disconnecting after a WriteWithoutResponse, so the stack can flush it
+    WNR_FLUSH_MS = 500
+
+    # payload is a normalized config dict (sensor_config.build_payload); the session takes
+    # ownership of the transport
+    def __init__(self, transport: Transport, payload: Dict[str, Any], timeout_ms: int = 30000,
+                 options: TransferOptions = TransferOptions(), cache: Optional[GattCache] = None,
+                 telemetry: Optional[Telemetry] = None, certs: Optional[CertStore] = None,
+                 parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.transport = transport
+        self.transport.setParent(self)
+        self.address = transport.address
+        self.payload = payload
+        self.options = options
+        self.data = b""
+        self.cache = cache
+        self._cached_layout = cache.get(self.address) if cache is not None else None
+        self.trace = Trace(telemetry, self.address)
+        self.link = LinkParams()
+
+        self.writer: Optional[FramedWriter] = None
+        self.probe: Optional[CtrlQuery] = None
+        self.digest_reader: Optional[DigestReader] = None
+        self.cert_query: Optional[CtrlQuery] = None
+        self.certs = certs if certs is not None else CertStore()
+        self._service_open = False
+        self._resolved = options
+        self._done = False
+        self._subscribed = False
+        self._write_confirmed = False
+        self._unconfirmed = False
+        self._written = False
+        self.confirmed = False      # finished with the sensor confirming the write or applying the config
+
+        # A dropped link is retried until the backoff runs out or the session times out; a framed
+        # transfer then continues where the device left off if it supports CAP_RESUME
+        self.backoff = Backoff()
+        self._reconnecting = False      # a reconnect is in progress and has not connected yet
+        self._retry_due = False         # a reconnect is scheduled
+        self._packed: Optional[Tuple[bytes, int, TransferOptions]] = None     # data, flags, options
+        self._caps: Optional[int] = None
+        self._resume: Optional[ChunkedTransfer] = None
+
+        # Follows the firmware's status messages once the payload is on its way
+        self.status = StatusTracker(options.wait_for, self)
+        self.status.changed.connect(self._on_status_changed)
+        self.status.finished.connect(self._on_status_finished)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(timeout_ms)
+        self._timer.timeout.connect(self._on_timeout)
+
+    def login(self, msg: str) -> None:
+        self.logged.emit(self.address, msg)
+
+    def is_done(self) -> bool:
+        return self._done
+
+    @Slot()
+    def start(self) -> None:
+        self._timer.start()
+        self.trace.start("session")
+        self.trace.start("connect")
+        self.login("Connecting…")
+        self.transport.connected.connect(self._on_connected)
+        self.transport.disconnected.connect(self._on_disconnected)
+        self.transport.errorOccurred.connect(self._on_error)
+        self.transport.serviceDiscovered.connect(self._on_service_found)
+        self.transport.discoveryFinished.connect(self._on_service_scan_done)
+        self.transport.serviceReady.connect(self._on_service_ready)
+        self.transport.characteristicWritten.connect(self._on_chr_written)
+        self.transport.linkChanged.connect(self._on_link_changed)
+        if not self.transport.connect_device():
+            self._finish(False, "Could not create Bluetooth controller.")
+
+    def abort(self, reason: str = "Aborted.") -> None:
+        self._finish(False, reason)
+
+    @Slot()
+    def _on_timeout(self) -> None:
+        self._finish(False, "Timed out.")
+
+    @Slot()
+    def _on_connected(self) -> None:
+        if self._done: return
+        self._reconnecting = False
+        self.trace.end("connect")
+        # Discovery goes ahead at once; the new parameters apply whenever the sensor accepts them
+        if self.transport.request_connection_update(BULK_PROFILE):
+            self.trace.event("profile", min_interval_ms=BULK_PROFILE.min_interval_ms,
+                             max_interval_ms=BULK_PROFILE.max_interval_ms, latency=BULK_PROFILE.latency)
+        self.trace.start("discover")
+        self.login("Connected. Discovering services…")
+        self.transport.discover_services()
+
+    @Slot(object)
+    def _on_link_changed(self, link: LinkParams) -> None:
+        if link == self.link: return
+        self.link = link
+        self.trace.event("link", **link._asdict())
+        self.login(f"Link: {link.describe()}.")
+
+    @Slot()
+    def _on_disconnected(self) -> None:
+        if self._done or self._retry_due: return
+        # Once the config is applied there is nothing left to resume
+        if self.status.stage in WAIT_STAGES:
+            self._finish(False, "Disconnected."); return
+        self._retry("Link lost", "Disconnected.")
+
+    def _retry(self, reason: str, failure: str) -> None:
+        delay = self.backoff.next_delay_ms()
+        if delay is None:
+            self._finish(False, failure); return
+        self._suspend()
+        self._reconnecting = False
+        self._retry_due = True
+        self.trace.event("reconnect", attempt=self.backoff.attempt, delay_ms=delay)
+        self.login(f"{reason}; reconnecting in {delay} ms "
+                   f"(attempt {self.backoff.attempt}/{self.backoff.attempts})…")
+        QTimer.singleShot(delay, self, self._reconnect)
+
+    # Drops everything tied to the old link and keeps what a resume needs
+    def _suspend(self) -> None:
+        if self.writer is not None:
+            if self.writer.suspend():
+                self._resume = self.writer.transfer
+            self.writer.deleteLater()
+            self.writer = None
+        for helper in (self.probe, self.digest_reader, self.cert_query):
+            if helper is not None:
+                helper.blockSignals(True)
+                helper.deleteLater()
+        self.probe = self.digest_reader = self.cert_query = None
+        self.status.stop()
+        if self._subscribed:
+            self.transport.characteristicChanged.disconnect(self._on_chr_changed)
+            self._subscribed = False
+        self._service_open = False
+        self._write_confirmed = self._unconfirmed = False
+        for phase in ("connect", "discover", "details", "negotiate", "write"):
+            self.trace.end(phase, False)
+
+    def _reconnect(self) -> None:
+        self._retry_due = False
+        if self._done: return
+        self._reconnecting = True
+        self.trace.start("connect", attempt=self.backoff.attempt)
+        self.login("Reconnecting…")
+        if not self.transport.connect_device():
+            self._finish(False, "Could not create Bluetooth controller.")
+
+    @Slot(str)
+    def _on_error(self, msg: str) -> None:
+        if self._done or self._retry_due: return
+        # A reconnect that never comes up is one more backoff step, not the end of the session
+        if self._reconnecting:
+            self._retry(f"Reconnect failed ({msg})", msg); return
+        self._finish(False, msg)
+
+    @Slot(object)
+    def _on_service_found(self, uuid: object) -> None:
+        # Known layout: no need to wait for the remaining services to be enumerated
+        if uuid == SVC_UUID and self._cached_layout is not None and not self._service_open and not self._done:
+            self.login("Target service found (cached layout).")
+            self._open_service(skip_values=True)
+
+    @Slot(bool)
+    def _on_service_scan_done(self, found: bool) -> None:
+        if self._done or self._service_open: return
+        if not found:
+            if self.cache is not None:
+                self.cache.invalidate(self.address)
+            self.trace.end("discover", False)
+            self._finish(False, "Target service not found on device."); return
+        self._open_service(skip_values=False)
+
+    def _open_service(self, skip_values: bool) -> None:
+        self._service_open = True
+        self.trace.end("discover", cached=skip_values)
+        self.trace.start("details", cached=skip_values)
+        if not self.transport.open_service(skip_values):
+            self._finish(False, "Could not create service object.")
+
+    @Slot()
+    def _on_service_ready(self) -> None:
+        if self._done: return
+        self.trace.end("details")
+
+        self.login("Service discovered.")
+        if self.cache is not None and self.cache.put(self.address, self.transport.characteristics()):
+            if self._cached_layout is not None:
+                self.login("Cached GATT layout was stale; refreshed.")
+
+        needs_ctrl = self.options.framed or self.options.needs_caps()
+        missing = [name for name, uuid in (("DATA_UUID", DATA_UUID), ("CTRL_UUID", CTRL_UUID),
+                                           ("STAT_UUID", STAT_UUID))
+                   if not self.transport.has(uuid) and (needs_ctrl or name == "DATA_UUID")]
+        if missing:
+            self._finish(False, "Missing characteristics: " + ", ".join(missing)); return
+
+        if self.transport.has(STAT_UUID) and self.transport.enable_notifications(STAT_UUID):
+            self._subscribed = True
+            self.transport.characteristicChanged.connect(self._on_chr_changed)
+
+        if self._packed is not None:
+            self._rewrite(); return
+        if self.options.needs_caps():
+            self.trace.start("negotiate")
+            self.probe = CtrlQuery.caps(self.transport, self)
+            self.probe.finished.connect(self._on_caps)
+            self.probe.start()
+        else:
+            self._send(self.options)
+
+    @Slot(int)
+    def _on_caps(self, caps: int) -> None:
+        if self._done: return
+        self._caps = caps
+        self._resolved = resolve_options(self.options, caps)
+        if self.options.delta and not self._resolved.delta:
+            self.login("Device cannot merge partial configs; sending everything.")
+        if self.options.verify and not self._resolved.verify:
+            self.login("Device cannot verify digests; using acknowledged chunks.")
+        if self.options.cert_ref and not self._resolved.cert_ref:
+            self.login("Device cannot look up CA certificates; sending the certificate in full."
+                       if self._resolved.encoding == "compact" else
+                       "CA certificate fingerprints need the compact encoding; sending the certificate in full.")
+        if not self._resolved.delta:
+            self._send(self._resolved); return
+
+        self.login("Reading device config digests…")
+        self.digest_reader = DigestReader(self.transport, self)
+        self.digest_reader.finished.connect(self._on_digests)
+        self.digest_reader.start()
+
+    @Slot(object)
+    def _on_digests(self, digests: Optional[Dict[str, bytes]]) -> None:
+        if self._done: return
+        if digests is None:
+            self.login("Device did not report its config; sending everything.")
+            self._send(self._resolved); return
+        patch = diff_config(self.payload, digests, self.certs)
+        if not patch:
+            self.trace.end("negotiate", up_to_date=True)
+            self._finish(True, "Device config already up to date."); return
+        self.login(f"Changed fields: {', '.join(patch)}.")
+        self._send(self._resolved, patch)
+
+    def _send(self, options: TransferOptions, patch: Optional[Dict[str, Any]] = None) -> None:
+        fields = self.payload if patch is None else patch
+        if options.cert_ref and fields.get("caCertificate"):
+            try:
+                fingerprint = self.certs.add(fields["caCertificate"])
+            except ValueError as e:
+                self._finish(False, str(e)); return
+            self.cert_query = CtrlQuery.cert(self.transport, fingerprint, self)
+            self.cert_query.finished.connect(lambda held: self._on_cert_held(options, patch, fingerprint, held))
+            self.cert_query.start(); return
+        self._pack(options, fields, patch is not None)
+
+    def _on_cert_held(self, options: TransferOptions, patch: Optional[Dict[str, Any]], fingerprint: bytes,
+                      held: Optional[bool]) -> None:
+        if self._done: return
+        fields = self.payload if patch is None else patch
+        self.trace.event("cert", fingerprint=fingerprint.hex()[:16], held=held)
+        if held:
+            self.login(f"Device already holds CA certificate {fingerprint.hex()[:16]}; sending its fingerprint.")
+            fields = {**{k: v for k, v in fields.items() if k != "caCertificate"}, "caCertificateRef": fingerprint}
+        else:
+            self.login(f"Device does not hold CA certificate {fingerprint.hex()[:16]}; sending it in full.")
+        self._pack(options, fields, patch is not None)
+
+    def _pack(self, options: TransferOptions, fields: Dict[str, Any], patch: bool) -> None:
+        try:
+            self.data, flags = pack_payload(fields, options, patch, self.certs)
+        except ValueError as e:
+            self._finish(False, str(e)); return
+        self._packed = (self.data, flags, options)
+        self.login(f"Using {describe_flags(flags)} encoding ({len(self.data)} bytes).")
+        self.trace.end("negotiate", encoding=describe_flags(flags))
+        self._start_write(None)
+
+    # After a reconnect: the payload is already packed, only the transfer starts again
+    def _rewrite(self) -> None:
+        if self._resume is not None and self._caps is None:
+            self.probe = CtrlQuery.caps(self.transport, self)
+            self.probe.finished.connect(self._on_resume_caps)
+            self.probe.start(); return
+        resume = self._resume if self._caps is not None and self._caps & CAP_RESUME else None
+        if self._resume is not None and resume is None:
+            self.login("Device cannot resume transfers; sending everything again.")
+        self._resume = None
+        self._start_write(resume)
+
+    @Slot(int)
+    def _on_resume_caps(self, caps: int) -> None:
+        if self._done: return
+        self._caps = caps
+        self._rewrite()
+
+    def _start_write(self, resume: Optional[ChunkedTransfer]) -> None:
+        assert self._packed is not None
+        _, flags, options = self._packed
+        self.link = self.transport.link_params()
+        self.trace.start("write", bytes=len(self.data), encoding=describe_flags(flags), framed=options.framed,
+                         verify=options.verify, mtu=self.link.mtu, interval_ms=self.link.interval_ms,
+                         resumed=resume is not None)
+        if self._subscribed:
+            self.status.start()
+        if options.framed:
+            self._write_framed(flags | (FLAG_STREAM if options.verify else 0), resume)
+        else:
+            self._write()
+
+    def _write_framed(self, flags: int, resume: Optional[ChunkedTransfer] = None) -> None:
+        mtu = self.link.mtu
+        try:
+            self.writer = FramedWriter(self.transport, self.data, mtu, self.options.window, flags, parent=self,
+                                       resume=resume)
+        except ValueError as e:
+            self._finish(False, str(e)); return
+        self.writer.finished.connect(self._on_framed_finished)
+        t = self.writer.transfer
+        if self.writer.resuming:
+            self.login(f"Resuming framed write of {len(self.data)} bytes where the device left off…")
+        else:
+            pacing = "verified stream" if t.stream else f"window {self.options.window}"
+            self.login(f"Framed write: {len(self.data)} bytes in {t.total_chunks} chunks "
+                       f"of {t.chunk_size} (MTU {mtu}, {pacing})…")
+        self.writer.start()
+
+    def _write(self) -> None:
+        props = self.transport.properties(DATA_UUID)
+        can_write = bool(props & PROP_WRITE)
+        can_wnr   = bool(props & PROP_WRITE_NO_RESPONSE)
+        if not (can_write or can_wnr):
+            self._finish(False, "DATA_UUID not writable on this device."); return
+        if not can_write and len(self.data) > self.link.mtu - ATT_WRITE_OVERHEAD:
+            self._finish(False, f"{len(self.data)} bytes do not fit one WriteWithoutResponse at MTU {self.link.mtu}; "
+                                "use the framed transfer."); return
+
+        # Unlike the GUI, prefer WriteWithResponse so every device gets a confirmed result
+        self.login(f"Writing {len(self.data)} bytes to DATA_UUID…")
+        self._unconfirmed = not can_write
+        self.transport.write(DATA_UUID, self.data, with_response=can_write)
+        if not can_write:
+            self._mark_written()
+        if not can_write and not self.status.is_active():
+            QTimer.singleShot(self.WNR_FLUSH_MS, self, self._finish_unconfirmed)
+
+    @Slot(object, bytes)
+    def _on_chr_written(self, uuid: object, _value: bytes) -> None:
+        if uuid != DATA_UUID or self.options.framed or self._done: return
+        self._mark_written()
+        if not self.status.is_active():
+            self._finish(True, "Write confirmed."); return
+        self._write_confirmed = True
+        self.login("Write confirmed, waiting for the device status…")
+
+    @Slot(bool, str)
+    def _on_framed_finished(self, ok: bool, msg: str) -> None:
+        # RESULT is the firmware's own "applied"
+        if ok:
+            self._mark_written()
+        if ok and self.status.is_active():
+            self.status.on_event(StatusEvent(EV_APPLIED, msg))
+        else:
+            self._finish(ok, msg)
+
+    @Slot(object, bytes)
+    def _on_chr_changed(self, uuid: object, value: bytes) -> None:
+        if uuid != STAT_UUID or self._done: return
+        was_active = self.status.is_active()
+        event = self.status.feed(value)
+        if event is not None and (not was_active or event.kind == EV_INFO):
+            self.login(f"Status: {event.text}")
+
+    @Slot(str, str)
+    def _on_status_changed(self, stage: str, text: str) -> None:
+        self.trace.event("status", stage=stage, text=text[:120])
+        if stage != "sent":
+            self._mark_written()
+        if text and stage != self.status.wait_for:   # the final status is logged by _finish()
+            self.login(f"Status: {text}")
+
+    @Slot(bool, str)
+    def _on_status_finished(self, ok: bool, msg: str) -> None:
+        if (not ok and self.status.timed_out and self.status.stage == "sent" and not self.options.framed
+                and (self._write_confirmed or self._unconfirmed)):
+            # Firmware that sends no status messages at all
+            if not self._write_confirmed:
+                self._finish_unconfirmed(); return
+            ok, msg = True, "Write confirmed."
+        self._finish(ok, msg)
+
+    # Success as far as this side can tell: the bytes went out without the sensor acknowledging them
+    def _finish_unconfirmed(self) -> None:
+        self._finish(True, "Write requested (unconfirmed).", confirmed=False)
+
+    def _mark_written(self) -> None:
+        if self._written or self._done: return
+        self._written = True
+        self.written.emit(self.address)
+
+    @Slot(bool, str)
+    def _finish(self, ok: bool, msg: str, confirmed: bool = True) -> None:
+        if self._done: return
+        self._done = True
+        self.confirmed = ok and confirmed
+        self._timer.stop()
+        self.status.stop()
+        if self.writer is not None and not ok:
+            self.writer.abort(msg)
+        self.login(msg)
+        self.trace.end("write", ok)
+        self.trace.end("session", ok, message=msg)
+        self.trace.close(ok, msg)
+        try:
+            self.transport.disconnected.disconnect(self._on_disconnected)
+        except (RuntimeError, TypeError):
+            pass    # never started
+        self.transport.disconnect_device()
+        self.finished.emit(self.address, ok, msg)
@@ -0,0 +1,60 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Content-addressed CA certificates. Each distinct PEM text is parsed once; its DER is kept under
+# its SHA-256 fingerprint (cert_utils.cert_fingerprint), so a fleet that trusts two or three CAs
+# holds two or three entries no matter how many sensors are provisioned. The fingerprint is what
+# the app offers on CTRL_UUID (CERT) before deciding whether the certificate body has to be sent.
+
+from __future__ import annotations
+from typing import Dict, Optional
+
+from cert_utils import cert_fingerprint, der_to_pem, pem_to_der
+
+class CertStore:
+    def __init__(self) -> None:
+        self._by_text: Dict[str, bytes] = {}    # PEM text -> fingerprint
+        self._der: Dict[bytes, bytes] = {}      # fingerprint -> DER
+
+    def __len__(self) -> int:
+        return len(self._der)
+
+    def __contains__(self, fingerprint: object) -> bool:
+        return fingerprint in self._der
+
+    # Returns the fingerprint; raises ValueError for malformed PEM
+    def add(self, pem: str) -> bytes:
+        fingerprint = self._by_text.get(pem)
+        if fingerprint is None:
+            der = pem_to_der(pem)
+            fingerprint = cert_fingerprint(der)
+            self._der.setdefault(fingerprint, der)
+            self._by_text[pem] = fingerprint
+        return fingerprint
+
+    # DER of `pem`, parsed the first time only; raises ValueError for malformed PEM
+    def der_of(self, pem: str) -> bytes:
+        return self._der[self.add(pem)]
+
+    def der(self, fingerprint: bytes) -> Optional[bytes]:
+        return self._der.get(fingerprint)
+
+    def pem(self, fingerprint: bytes) -> Optional[str]:
+        der = self._der.get(fingerprint)
+        return der_to_pem(der) if der is not None else None
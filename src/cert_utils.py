@@ -0,0 +1,92 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+from __future__ import annotations
+import base64, binascii, hashlib, re
+from typing import List, Tuple
+
+_PEM_RX = re.compile(r"-----BEGIN CERTIFICATE-----(.*?)-----END CERTIFICATE-----", re.S)
+
+def _read_tlv(der: bytes, pos: int) -> Tuple[int, int, int]:
+    # Returns (tag, content start, content end) of the DER element at pos
+    if pos + 2 > len(der):
+        raise ValueError("Truncated DER element.")
+    tag, first = der[pos], der[pos + 1]
+    pos += 2
+    if first < 0x80:
+        size = first
+    else:
+        n = first & 0x7F
+        if n == 0 or n > 4 or pos + n > len(der):
+            raise ValueError("Invalid DER length.")
+        size = int.from_bytes(der[pos:pos + n], "big")
+        pos += n
+    if pos + size > len(der):
+        raise ValueError("Truncated DER element.")
+    return tag, pos, pos + size
+
+def split_der(der: bytes) -> List[bytes]:
+    # A certificate is SEQUENCE { tbsCertificate SEQUENCE, signatureAlgorithm SEQUENCE, signature BIT STRING }
+    certs: List[bytes] = []
+    pos = 0
+    while pos < len(der):
+        tag, start, end = _read_tlv(der, pos)
+        if tag != 0x30:
+            raise ValueError("DER data is not a certificate.")
+        tbs_tag, _, tbs_end = _read_tlv(der, start)
+        alg_tag, _, alg_end = _read_tlv(der, tbs_end)
+        sig_tag, _, sig_end = _read_tlv(der, alg_end)
+        if (tbs_tag, alg_tag, sig_tag) != (0x30, 0x30, 0x03) or sig_end != end:
+            raise ValueError("DER data is not a certificate.")
+        certs.append(der[pos:end])
+        pos = end
+    if not certs:
+        raise ValueError("Empty certificate.")
+    return certs
+
+def pem_to_der(pem: str) -> bytes:
+    # Concatenated DER of every certificate in the PEM text; raises ValueError if any is malformed
+    blocks = _PEM_RX.findall(pem)
+    if not blocks:
+        raise ValueError("No PEM certificate found.")
+    out = bytearray()
+    for i, body in enumerate(blocks):
+        try:
+            der = base64.b64decode("".join(body.split()), validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError(f"Certificate #{i + 1}: invalid base64 ({e}).") from None
+        try:
+            split_der(der)
+        except ValueError as e:
+            raise ValueError(f"Certificate #{i + 1}: {e}") from None
+        out += der
+    return bytes(out)
+
+def der_to_pem(der: bytes) -> str:
+    blocks = []
+    for cert in split_der(der):
+        b64 = base64.b64encode(cert).decode("ascii")
+        lines = [b64[i:i + 64] for i in range(0, len(b64), 64)]
+        blocks.append("-----BEGIN CERTIFICATE-----\n" + "\n".join(lines) + "\n-----END CERTIFICATE-----\n")
+    return "".join(blocks)
+
+# SHA-256 of pem_to_der()'s output: the usual certificate fingerprint, and for a bundle the
+# fingerprint of the whole chain. Independent of PEM line wrapping and comments.
+def cert_fingerprint(der: bytes) -> bytes:
+    return hashlib.sha256(der).digest()
@@ -0,0 +1,167 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Many sensor configs in one SQLite file, keyed by (sensorId, configName). Lookups go through the
+# primary key, so loading one config out of a 50,000-entry bundle touches a few pages instead of
+# the whole file, and nothing but the requested row is ever held in memory. Configs are stored
+# normalized (sensor_config.build_payload) as compact JSON; saving a key again replaces it.
+# Import/export use JSONL (one config per line) and stream row by row.
+
+from __future__ import annotations
+import json, sqlite3, time
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+from sensor_config import build_payload
+
+Key = Tuple[str, str]   # sensorId, configName
+
+BUNDLE_SUFFIX = ".cfgdb"
+CONFIG_FILTER = "JSON (*.json);;Config bundle (*.cfgdb)"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS configs (
+    sensor_id   TEXT NOT NULL,
+    config_name TEXT NOT NULL,
+    config      TEXT NOT NULL,
+    updated     INTEGER NOT NULL,
+    PRIMARY KEY (sensor_id, config_name)
+)"""
+
+class BundleError(ValueError):
+    pass
+
+def config_key(config: Dict[str, Any]) -> Key:
+    return str(config.get("sensorId", "")), str(config.get("configName", ""))
+
+class ConfigBundle:
+    BATCH = 1000    # rows per INSERT when importing
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        try:
+            self._db = sqlite3.connect(path)
+            self._db.execute(_SCHEMA)
+        except sqlite3.DatabaseError as e:
+            raise BundleError(f"{path}: {e}") from None
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "ConfigBundle":
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM configs").fetchone()[0]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, tuple) and self._db.execute(
+            "SELECT 1 FROM configs WHERE sensor_id = ? AND config_name = ?", key).fetchone() is not None
+
+    def keys(self) -> Iterator[Key]:
+        return iter(self._db.execute("SELECT sensor_id, config_name FROM configs ORDER BY sensor_id, config_name"))
+
+    def config_names(self, sensor_id: str) -> List[str]:
+        rows = self._db.execute("SELECT config_name FROM configs WHERE sensor_id = ? ORDER BY config_name",
+                                (sensor_id,))
+        return [name for (name,) in rows]
+
+    def get(self, sensor_id: str, config_name: str = "") -> Optional[Dict[str, Any]]:
+        row = self._db.execute("SELECT config FROM configs WHERE sensor_id = ? AND config_name = ?",
+                               (sensor_id, config_name)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    # Stores every config in one transaction, BATCH rows at a time so a large import stays out of memory;
+    # any invalid config rolls the whole call back. Returns the keys.
+    def put(self, configs: Iterable[Any]) -> List[Key]:
+        keys: List[Key] = []
+        batch: List[Tuple[str, str, str, int]] = []
+        with self._db:
+            for n, config in enumerate(configs, 1):
+                if not isinstance(config, dict):
+                    raise BundleError(f"Config #{n}: expected a JSON object, not {type(config).__name__}.")
+                try:
+                    payload = build_payload(config)
+                except ValueError as e:
+                    raise BundleError(f"Config #{n}: {e}") from None
+                key = config_key(payload)
+                if not key[0]:
+                    raise BundleError(f"Config #{n}: a bundle entry needs a sensorId.")
+                batch.append((*key, json.dumps(payload, separators=(",", ":"), ensure_ascii=False),
+                              int(time.time())))
+                keys.append(key)
+                if len(batch) >= self.BATCH:
+                    self._write(batch)
+                    batch = []
+            if batch:
+                self._write(batch)
+        return keys
+
+    def _write(self, rows: List[Tuple[str, str, str, int]]) -> None:
+        self._db.executemany("INSERT OR REPLACE INTO configs VALUES (?, ?, ?, ?)", rows)
+
+    def remove(self, sensor_id: str, config_name: str = "") -> bool:
+        with self._db:
+            cur = self._db.execute("DELETE FROM configs WHERE sensor_id = ? AND config_name = ?",
+                                   (sensor_id, config_name))
+        return cur.rowcount > 0
+
+    # Every config (or those of the given sensors), sorted by key, one row in memory at a time
+    def iter_configs(self, sensor_ids: Optional[Iterable[str]] = None) -> Iterator[Dict[str, Any]]:
+        if sensor_ids is None:
+            for (text,) in self._db.execute("SELECT config FROM configs ORDER BY sensor_id, config_name"):
+                yield json.loads(text)
+            return
+        for sensor_id in sensor_ids:
+            for (text,) in self._db.execute("SELECT config FROM configs WHERE sensor_id = ? ORDER BY config_name",
+                                            (sensor_id,)):
+                yield json.loads(text)
+
+    # Writes JSONL to `out` (a path or a text file); returns the number of configs
+    def export(self, out: Any, sensor_ids: Optional[Iterable[str]] = None) -> int:
+        if isinstance(out, str):
+            with open(out, "w", encoding="utf-8", newline="\n") as f:
+                return self.export(f, sensor_ids)
+        target: IO[str] = out
+        count = 0
+        for config in self.iter_configs(sensor_ids):
+            target.write(json.dumps(config, separators=(",", ":"), ensure_ascii=False) + "\n")
+            count += 1
+        return count
+
+    # Reads JSONL (or a JSON file with one config) line by line
+    def import_file(self, path: str) -> int:
+        def configs() -> Iterator[Any]:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                if not path.lower().endswith((".jsonl", ".ndjson")):
+                    try:
+                        config = json.load(f)
+                    except ValueError as e:
+                        raise BundleError(f"{path}: invalid JSON ({e}).") from None
+                    yield config; return
+                for n, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        raise BundleError(f"Line {n}: invalid JSON ({e}).") from None
+        return len(self.put(configs()))
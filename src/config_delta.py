@@ -0,0 +1,77 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Delta pushes: the device reports a short digest per stored field (STAT_DIGESTS, see framing.py)
+# and only fields whose digest differs from the new config are sent, as a FLAG_PATCH payload.
+# Passwords are never digested: an unsalted 8-byte hash readable by anyone in BLE range is an
+# offline dictionary oracle, so the device leaves them out and every delta push sends them.
+
+from __future__ import annotations
+import hashlib
+from typing import Any, Dict, Optional
+
+from cert_store import CertStore
+from cert_utils import pem_to_der
+from framing import STAT_DIGESTS
+from wire_codec import FIELD_TAGS
+
+DIGEST_LEN = 8
+_RECORD_LEN = 1 + DIGEST_LEN
+_TAG_FIELDS = {tag: key for key, tag in FIELD_TAGS.items() if key not in ("caCertificateDer", "caCertificateRef")}
+ALWAYS_SENT = ("wifiPassword", "mqttPassword")
+
+def field_digest(key: str, value: Any, certs: Optional[CertStore] = None) -> bytes:
+    raw = str(value).encode("utf-8")
+    if key == "caCertificate" and value:
+        # Hash the DER so PEM and DER transfers of the same certificate compare equal
+        try:
+            raw = certs.der_of(str(value)) if certs is not None else pem_to_der(str(value))
+        except ValueError:
+            pass
+    return hashlib.sha256(raw).digest()[:DIGEST_LEN]
+
+def config_digests(config: Dict[str, Any]) -> Dict[str, bytes]:
+    return {key: field_digest(key, value) for key, value in config.items()
+            if key in FIELD_TAGS and key not in ALWAYS_SENT}
+
+def digests_frame(config: Dict[str, Any]) -> bytes:
+    out = bytearray((STAT_DIGESTS,))
+    for key, digest in config_digests(config).items():
+        out.append(FIELD_TAGS[key])
+        out += digest
+    return bytes(out)
+
+def parse_digests_frame(value: bytes) -> Dict[str, bytes]:
+    if not value or value[0] != STAT_DIGESTS or (len(value) - 1) % _RECORD_LEN:
+        raise ValueError("Malformed digest frame.")
+    digests: Dict[str, bytes] = {}
+    for pos in range(1, len(value), _RECORD_LEN):
+        key = _TAG_FIELDS.get(value[pos])
+        if key is not None and key not in ALWAYS_SENT:
+            digests[key] = bytes(value[pos + 1:pos + _RECORD_LEN])
+    return digests
+
+def diff_config(config: Dict[str, Any], device_digests: Dict[str, bytes],
+                certs: Optional[CertStore] = None) -> Dict[str, Any]:
+    # Fields the device did not report are treated as changed
+    return {key: value for key, value in config.items()
+            if key in ALWAYS_SENT or device_digests.get(key) != field_digest(key, value, certs)}
+
+def apply_patch(config: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    return {**config, **patch}
@@ -18,13 +18,14 @@
 #  SOFTWARE.
 
 from __future__ import annotations
-from typing import Optional, cast
-from PySide6.QtGui import QValidator
+import json
+from typing import Any, Dict, Optional, cast
 from PySide6.QtWidgets import (
     QWidget, QFormLayout, QHBoxLayout, QGroupBox, QLineEdit, QPlainTextEdit,
     QSpinBox, QRadioButton, QButtonGroup
 )
 
+from sensor_config import MAX_LENGTHS, SensorConfig
 from utils import make_ip_validator
 from zero_padded_spinner import ZeroPaddedSpinBox
 
@@ -53,15 +54,6 @@ class ConfigForm(QWidget):
 
         self.form_layout.addRow("Change Bluetooth PIN?", change_pin_row)
 
-        self.bluetooth_group = QGroupBox("Bluetooth configuration", cast(QGroupBox, self))
-        bluetooth_form = QFormLayout(self.bluetooth_group)
-        bluetooth_form.setContentsMargins(9, 9, 9, 9)
-
-        # Pad the spinner box value with 0's
-        self.sp_pin = ZeroPaddedSpinBox(6); self.sp_pin.setValue(0)
-        bluetooth_form.addRow("Bluetooth PIN", self.sp_pin)
-        self.form_layout.addRow(self.bluetooth_group)
-
         # Use DHCP?
         self.rb_dhcp_yes = QRadioButton("Yes")
         self.rb_dhcp_no = QRadioButton("No")
@@ -80,15 +72,61 @@ class ConfigForm(QWidget):
 
         self.form_layout.addRow("Use DHCP?", dhcp_row)
 
+        # Rest of the setup fields
+        self.ed_ssid = QLineEdit(); self.ed_ssid.setMaxLength(MAX_LENGTHS["wifiSsid"])
+        self.ed_wifi_pwd = QLineEdit(); self.ed_wifi_pwd.setMaxLength(MAX_LENGTHS["wifiPassword"]); self.ed_wifi_pwd.setEchoMode(QLineEdit.EchoMode.Password)
+        self.ed_sensor_id = QLineEdit(); self.ed_sensor_id.setMaxLength(MAX_LENGTHS["sensorId"])
+        self.ed_cfg_name  = QLineEdit(); self.ed_cfg_name.setMaxLength(MAX_LENGTHS["configName"])
+        self.ed_http_url  = QLineEdit(); self.ed_http_url.setMaxLength(MAX_LENGTHS["httpConfigURL"])
+        self.ed_mqtt_srv  = QLineEdit(); self.ed_mqtt_srv.setMaxLength(MAX_LENGTHS["mqttServer"])
+
+        self.sp_mqtt_port = QSpinBox(); self.sp_mqtt_port.setRange(1, 65535); self.sp_mqtt_port.setValue(1883)
+
+        self.ed_mqtt_user = QLineEdit(); self.ed_mqtt_user.setMaxLength(MAX_LENGTHS["mqttUsername"])
+        self.ed_mqtt_pwd  = QLineEdit(); self.ed_mqtt_pwd.setMaxLength(MAX_LENGTHS["mqttPassword"]); self.ed_mqtt_pwd.setEchoMode(QLineEdit.EchoMode.Password)
+        self.ed_mqtt_topic = QLineEdit(); self.ed_mqtt_topic.setMaxLength(MAX_LENGTHS["mqttTopic"])
+
+        add = self.form_layout.addRow
+        add("WiFi SSID", self.ed_ssid)
+        add("WiFi Password", self.ed_wifi_pwd)
+        add("Sensor ID", self.ed_sensor_id)
+        add("Config Name", self.ed_cfg_name)
+        add("HTTP Config URL", self.ed_http_url)
+        add("MQTT Server", self.ed_mqtt_srv)
+        add("MQTT Port", self.sp_mqtt_port)
+        add("MQTT Username", self.ed_mqtt_user)
+        add("MQTT Password", self.ed_mqtt_pwd)
+        add("MQTT Topic", self.ed_mqtt_topic)
+
+        # The PIN and static IP groups start hidden and the CA certificate is at the bottom, so they are
+        # built in a second stage (complete()) once the window has painted, or on first use
+        self._complete = False
+
+    def is_complete(self) -> bool:
+        return self._complete
+
+    def complete(self) -> None:
+        if self._complete: return
+        self._complete = True
+
+        self.bluetooth_group = QGroupBox("Bluetooth configuration", cast(QGroupBox, self))
+        bluetooth_form = QFormLayout(self.bluetooth_group)
+        bluetooth_form.setContentsMargins(9, 9, 9, 9)
+
+        # Pad the spinner box value with 0's
+        self.sp_pin = ZeroPaddedSpinBox(6); self.sp_pin.setValue(0)
+        bluetooth_form.addRow("Bluetooth PIN", self.sp_pin)
+        self.form_layout.insertRow(1, self.bluetooth_group)
+
         self.ip_group = QGroupBox("Static IP configuration", cast(QGroupBox, self))
         ip_form = QFormLayout(self.ip_group)
         ip_form.setContentsMargins(9, 9, 9, 9)
 
-        self.ed_local_ip = QLineEdit(); self.ed_local_ip.setMaxLength(15)
-        self.ed_subnet   = QLineEdit(); self.ed_subnet.setMaxLength(15)
-        self.ed_dns1     = QLineEdit(); self.ed_dns1.setMaxLength(15)
-        self.ed_dns2     = QLineEdit(); self.ed_dns2.setMaxLength(15)
-        self.ed_gateway  = QLineEdit(); self.ed_gateway.setMaxLength(15)
+        self.ed_local_ip = QLineEdit(); self.ed_local_ip.setMaxLength(MAX_LENGTHS["localIp"])
+        self.ed_subnet   = QLineEdit(); self.ed_subnet.setMaxLength(MAX_LENGTHS["subnet"])
+        self.ed_dns1     = QLineEdit(); self.ed_dns1.setMaxLength(MAX_LENGTHS["dns1Ip"])
+        self.ed_dns2     = QLineEdit(); self.ed_dns2.setMaxLength(MAX_LENGTHS["dns2Ip"])
+        self.ed_gateway  = QLineEdit(); self.ed_gateway.setMaxLength(MAX_LENGTHS["gatewayIp"])
 
         v_ip = make_ip_validator()
         for w in (self.ed_local_ip, self.ed_subnet, self.ed_dns1, self.ed_dns2, self.ed_gateway):
@@ -100,37 +138,11 @@ class ConfigForm(QWidget):
         ip_form.addRow("DNS 2", self.ed_dns2)
         ip_form.addRow("Gateway", self.ed_gateway)
 
-        self.form_layout.addRow(self.ip_group)
-
-        # Rest of the setup fields
-        self.ed_ssid = QLineEdit(); self.ed_ssid.setMaxLength(32)
-        self.ed_wifi_pwd = QLineEdit(); self.ed_wifi_pwd.setMaxLength(64); self.ed_wifi_pwd.setEchoMode(QLineEdit.EchoMode.Password)
-        self.ed_sensor_id = QLineEdit(); self.ed_sensor_id.setMaxLength(36)
-        self.ed_cfg_name  = QLineEdit(); self.ed_cfg_name.setMaxLength(36)
-        self.ed_http_url  = QLineEdit(); self.ed_http_url.setMaxLength(1024)
-        self.ed_mqtt_srv  = QLineEdit(); self.ed_mqtt_srv.setMaxLength(256)
-
-        self.sp_mqtt_port = QSpinBox(); self.sp_mqtt_port.setRange(0, 65535); self.sp_mqtt_port.setValue(1883)
-
-        self.ed_mqtt_user = QLineEdit(); self.ed_mqtt_user.setMaxLength(24)
-        self.ed_mqtt_pwd  = QLineEdit(); self.ed_mqtt_pwd.setMaxLength(1024); self.ed_mqtt_pwd.setEchoMode(QLineEdit.EchoMode.Password)
-        self.ed_mqtt_topic = QLineEdit(); self.ed_mqtt_topic.setMaxLength(1024)
+        self.form_layout.insertRow(3, self.ip_group)
 
         self.te_ca_cert = QPlainTextEdit()
-        self.te_ca_cert.setPlaceholderText("Paste PEM CA certificate here… (max 3072 chars)")
-
-        add = self.form_layout.addRow
-        add("WiFi SSID", self.ed_ssid)
-        add("WiFi Password", self.ed_wifi_pwd)
-        add("Sensor ID", self.ed_sensor_id)
-        add("Config Name", self.ed_cfg_name)
-        add("HTTP Config URL", self.ed_http_url)
-        add("MQTT Server", self.ed_mqtt_srv)
-        add("MQTT Port", self.sp_mqtt_port)
-        add("MQTT Username", self.ed_mqtt_user)
-        add("MQTT Password", self.ed_mqtt_pwd)
-        add("MQTT Topic", self.ed_mqtt_topic)
-        add("CA Certificate (PEM)", self.te_ca_cert)
+        self.te_ca_cert.setPlaceholderText(f"Paste PEM CA certificate here… (max {MAX_LENGTHS['caCertificate']} chars)")
+        self.form_layout.addRow("CA Certificate (PEM)", self.te_ca_cert)
 
         self.rb_change_pin_no.toggled.connect(self._update_bluetooth_visibility)
         self._update_bluetooth_visibility()
@@ -150,82 +162,68 @@ class ConfigForm(QWidget):
             self.ed_local_ip.clear(); self.ed_subnet.clear()
             self.ed_dns1.clear(); self.ed_dns2.clear(); self.ed_gateway.clear()
 
-    def build_json(self) -> str:
-        use_dhcp = self.rb_dhcp_yes.isChecked()
-
-        def is_valid_ip(widget: QLineEdit) -> bool:
-            state, _, _ = widget.validator().validate(widget.text().strip(), 0)  # type: ignore[union-attr]
-            return state == QValidator.State.Acceptable
-
-        if not use_dhcp:
-            for le, label in (
-                (self.ed_local_ip, "localIp"),
-                (self.ed_subnet,   "subnet"),
-                (self.ed_dns1,     "dns1Ip"),
-                (self.ed_dns2,     "dns2Ip"),
-                (self.ed_gateway,  "gatewayIp"),
-            ):
-                txt = le.text().strip()
-                if txt and not is_valid_ip(le):
-                    raise ValueError(f"Invalid IPv4 address in {label}: '{txt}'")
-
-        ca_text = self.te_ca_cert.toPlainText()
-        if len(ca_text) > 3072:
-            raise ValueError("CA certificate exceeds 3072 characters.")
-
-        payload = {
-            "blePasskey": int(self.sp_pin.text().strip()),
-            "localIp": "" if use_dhcp else self.ed_local_ip.text().strip(),
-            "subnet": "" if use_dhcp else self.ed_subnet.text().strip(),
-            "dns1Ip": "" if use_dhcp else self.ed_dns1.text().strip(),
-            "dns2Ip": "" if use_dhcp else self.ed_dns2.text().strip(),
-            "gatewayIp": "" if use_dhcp else self.ed_gateway.text().strip(),
-            "wifiSsid": self.ed_ssid.text().strip(),
+    # Raw widget values; SensorConfig does the stripping, the DHCP rule and all validation
+    def _widget_values(self) -> Dict[str, Any]:
+        self.complete()
+        return {
+            "blePasskey": self.sp_pin.text(),
+            "localIp": "" if self.rb_dhcp_yes.isChecked() else self.ed_local_ip.text(),
+            "subnet": self.ed_subnet.text(),
+            "dns1Ip": self.ed_dns1.text(),
+            "dns2Ip": self.ed_dns2.text(),
+            "gatewayIp": self.ed_gateway.text(),
+            "wifiSsid": self.ed_ssid.text(),
             "wifiPassword": self.ed_wifi_pwd.text(),
-            "sensorId": self.ed_sensor_id.text().strip(),
-            "configName": self.ed_cfg_name.text().strip(),
-            "httpConfigURL": self.ed_http_url.text().strip(),
-            "mqttServer": self.ed_mqtt_srv.text().strip(),
-            "mqttPort": int(self.sp_mqtt_port.value()),
-            "mqttUsername": self.ed_mqtt_user.text().strip(),
+            "sensorId": self.ed_sensor_id.text(),
+            "configName": self.ed_cfg_name.text(),
+            "httpConfigURL": self.ed_http_url.text(),
+            "mqttServer": self.ed_mqtt_srv.text(),
+            "mqttPort": self.sp_mqtt_port.value(),
+            "mqttUsername": self.ed_mqtt_user.text(),
             "mqttPassword": self.ed_mqtt_pwd.text(),
-            "mqttTopic": self.ed_mqtt_topic.text().strip(),
-            "caCertificate": ca_text,
+            "mqttTopic": self.ed_mqtt_topic.text(),
+            "caCertificate": self.te_ca_cert.toPlainText(),
         }
-        import json
-        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
-
-    def to_dict(self) -> dict:
-        import json
-        return json.loads(self.build_json())
-
-    def load_from_dict(self, d: dict) -> None:
-        # Uses camelCase keys to match build_json()
-        self.sp_pin.setValue(int(d.get("blePasskey", 0)))
-        self.ed_local_ip.setText(d.get("localIp", ""))
-        self.ed_subnet.setText(d.get("subnet", ""))
-        self.ed_dns1.setText(d.get("dns1Ip", ""))
-        self.ed_dns2.setText(d.get("dns2Ip", ""))
-        self.ed_gateway.setText(d.get("gatewayIp", ""))
-
-        self.ed_ssid.setText(d.get("wifiSsid", ""))
-        self.ed_wifi_pwd.setText(d.get("wifiPassword", ""))
-        self.ed_sensor_id.setText(d.get("sensorId", ""))
-        self.ed_cfg_name.setText(d.get("configName", ""))
-        self.ed_http_url.setText(d.get("httpConfigURL", ""))
-        self.ed_mqtt_srv.setText(d.get("mqttServer", ""))
-        self.sp_mqtt_port.setValue(int(d.get("mqttPort", 1883)))
-        self.ed_mqtt_user.setText(d.get("mqttUsername", ""))
-        self.ed_mqtt_pwd.setText(d.get("mqttPassword", ""))
-        self.ed_mqtt_topic.setText(d.get("mqttTopic", ""))
-        self.te_ca_cert.setPlainText(d.get("caCertificate", ""))
-
-        use_dhcp = not d.get("localIp", "").strip()
+
+    # Raises sensor_config.ConfigError listing every invalid field
+    def to_config(self) -> SensorConfig:
+        return SensorConfig.from_dict(self._widget_values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.to_config().to_dict()
+
+    def build_json(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"), ensure_ascii=False)
+
+    def load_from_dict(self, d: Dict[str, Any]) -> None:
+        # Uses camelCase keys to match to_dict(); values are normalized but not validated, so a
+        # config with mistakes still loads and shows them on the next send
+        self.complete()
+        cfg = SensorConfig.from_dict(d, check=False)
+        self.sp_pin.setValue(cfg.blePasskey)
+        self.ed_local_ip.setText(cfg.localIp)
+        self.ed_subnet.setText(cfg.subnet)
+        self.ed_dns1.setText(cfg.dns1Ip)
+        self.ed_dns2.setText(cfg.dns2Ip)
+        self.ed_gateway.setText(cfg.gatewayIp)
+
+        self.ed_ssid.setText(cfg.wifiSsid)
+        self.ed_wifi_pwd.setText(cfg.wifiPassword)
+        self.ed_sensor_id.setText(cfg.sensorId)
+        self.ed_cfg_name.setText(cfg.configName)
+        self.ed_http_url.setText(cfg.httpConfigURL)
+        self.ed_mqtt_srv.setText(cfg.mqttServer)
+        self.sp_mqtt_port.setValue(cfg.mqttPort)
+        self.ed_mqtt_user.setText(cfg.mqttUsername)
+        self.ed_mqtt_pwd.setText(cfg.mqttPassword)
+        self.ed_mqtt_topic.setText(cfg.mqttTopic)
+        self.te_ca_cert.setPlainText(cfg.caCertificate)
+
+        use_dhcp = not cfg.localIp
         self.rb_dhcp_yes.setChecked(use_dhcp)
         self.rb_dhcp_no.setChecked(not use_dhcp)
         self._update_ip_visibility()
 
-
 class PaddedSpinBox(QSpinBox):
     def __init__(self, digits=6, parent=None):
         super().__init__(parent)
@@ -0,0 +1,174 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+from __future__ import annotations
+import time
+from typing import Any, Dict, List, Optional
+from PySide6.QtCore import (
+    Qt, QAbstractListModel, QModelIndex, QPersistentModelIndex, QObject, QSortFilterProxyModel, QTimer, Slot
+)
+from PySide6.QtBluetooth import QBluetoothDeviceInfo
+
+from transport import device_address
+from constants import SVC_UUID
+
+NO_RSSI = -128  # sorts below any real reading
+
+class DeviceRecord:
+    __slots__ = ("address", "name", "rssi", "has_service", "info", "last_seen")
+
+    def __init__(self, info: QBluetoothDeviceInfo) -> None:
+        self.address = device_address(info)
+        self.name = ""
+        self.rssi = NO_RSSI
+        self.has_service = False
+        self.info = info
+        self.last_seen = 0.0
+        self.update(info)
+
+    # Advertisements and scan responses carry different parts; keep what we already know
+    def update(self, info: QBluetoothDeviceInfo) -> None:
+        self.info = info
+        if info.name():
+            self.name = info.name()
+        if info.rssi():
+            self.rssi = info.rssi()
+        self.has_service = self.has_service or SVC_UUID in info.serviceUuids()
+        self.last_seen = time.monotonic()
+
+    def label(self) -> str:
+        text = f"{self.name or '(unnamed)'}  [{self.address}]"
+        if self.rssi != NO_RSSI:
+            text += f"  {self.rssi} dBm"
+        return ("★ " + text) if self.has_service else text
+
+# One row per device address. Rows are inserted once; repeated advertisements only update the
+# record, and the resulting dataChanged notifications are coalesced so a busy floor with thousands
+# of advertisements per scan repaints a few times per second instead of once per packet.
+class DeviceListModel(QAbstractListModel):
+    InfoRole = int(Qt.ItemDataRole.UserRole)
+    RssiRole = int(Qt.ItemDataRole.UserRole) + 1
+    HasServiceRole = int(Qt.ItemDataRole.UserRole) + 2
+    AddressRole = int(Qt.ItemDataRole.UserRole) + 3
+
+    FLUSH_MS = 250
+
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._records: List[DeviceRecord] = []
+        self._rows: Dict[str, int] = {}
+        self._targets = 0       # records with has_service, kept up to date by upsert()
+        self._dirty_lo = -1
+        self._dirty_hi = -1
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(self.FLUSH_MS)
+        self._flush_timer.timeout.connect(self._flush)
+
+    def rowCount(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._records)
+
+    def data(self, index: QModelIndex | QPersistentModelIndex, role: int = int(Qt.ItemDataRole.DisplayRole)) -> Any:
+        if not index.isValid() or not 0 <= index.row() < len(self._records):
+            return None
+        rec = self._records[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return rec.label()
+        if role == self.InfoRole:
+            return rec.info
+        if role == self.RssiRole:
+            return rec.rssi
+        if role == self.HasServiceRole:
+            return rec.has_service
+        if role == self.AddressRole:
+            return rec.address
+        return None
+
+    def record(self, row: int) -> DeviceRecord:
+        return self._records[row]
+
+    def target_count(self) -> int:
+        return self._targets
+
+    # Returns True when the address was not in the model yet
+    def upsert(self, info: QBluetoothDeviceInfo) -> bool:
+        address = device_address(info)
+        row = self._rows.get(address)
+        if row is None:
+            row = len(self._records)
+            self.beginInsertRows(QModelIndex(), row, row)
+            rec = DeviceRecord(info)
+            self._records.append(rec)
+            self._rows[address] = row
+            self._targets += rec.has_service
+            self.endInsertRows()
+            return True
+
+        rec = self._records[row]
+        had_service = rec.has_service
+        rec.update(info)
+        self._targets += rec.has_service and not had_service
+        self._dirty_lo = row if self._dirty_lo < 0 else min(self._dirty_lo, row)
+        self._dirty_hi = max(self._dirty_hi, row)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+        return False
+
+    def clear(self) -> None:
+        self._flush_timer.stop()
+        self._dirty_lo = self._dirty_hi = -1
+        self.beginResetModel()
+        self._records.clear()
+        self._rows.clear()
+        self._targets = 0
+        self.endResetModel()
+
+    @Slot()
+    def _flush(self) -> None:
+        if self._dirty_lo < 0: return
+        lo, hi = self._dirty_lo, self._dirty_hi
+        self._dirty_lo = self._dirty_hi = -1
+        self.dataChanged.emit(self.index(lo), self.index(hi))
+
+# "Target service only" / text filter and strongest-signal-first sorting on top of DeviceListModel
+class DeviceFilterProxy(QSortFilterProxyModel):
+    def __init__(self, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self._target_only = False
+        self._text = ""
+        self.setSortRole(DeviceListModel.RssiRole)
+        self.setDynamicSortFilter(True)
+
+    def set_target_only(self, on: bool) -> None:
+        self._target_only = on
+        self.invalidateFilter()
+
+    def set_text(self, text: str) -> None:
+        self._text = text.strip().lower()
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex | QPersistentModelIndex) -> bool:
+        model = self.sourceModel()
+        if not isinstance(model, DeviceListModel):
+            return True
+        rec = model.record(source_row)
+        if self._target_only and not rec.has_service:
+            return False
+        return not self._text or self._text in rec.name.lower() or self._text in rec.address.lower()
@@ -19,29 +19,67 @@
 
 from __future__ import annotations
 from typing import Optional
-from PySide6.QtCore import Qt, Slot, Signal
+from PySide6.QtCore import Qt, QTimer, Slot, Signal
 from PySide6.QtWidgets import (
-    QDialog, QListWidget, QListWidgetItem, QLabel, QPushButton,
+    QDialog, QListView, QLabel, QPushButton, QCheckBox, QLineEdit,
     QHBoxLayout, QVBoxLayout, QWidget
 )
 from PySide6.QtBluetooth import (
     QBluetoothDeviceInfo, QBluetoothDeviceDiscoveryAgent
 )
 
+from transport import device_address, device_info_for, is_device_address
 from constants import SVC_UUID
+from device_model import DeviceListModel, DeviceFilterProxy
+from device_registry import DeviceRegistry
+from scan_policy import ScanPolicy, ScanTracker
 
 class DevicePicker(QDialog):
     deviceSelected: Signal = Signal(QBluetoothDeviceInfo)
 
-    def __init__(self, parent: Optional[QWidget] = None) -> None:
+    EARLY_STOP_QUIET_MS = 2000
+
+    def __init__(self, parent: Optional[QWidget] = None, registry: Optional[DeviceRegistry] = None,
+                 policy: ScanPolicy = ScanPolicy()) -> None:
         super().__init__(parent)
         self.setWindowTitle("Select Bluetooth Device")
-        self.resize(520, 380)
+        self.resize(520, 420)
+
+        self.registry = registry if registry is not None else DeviceRegistry()
+        self._direct: Optional[QBluetoothDeviceInfo] = None
 
+        self.policy = policy
+        self.tracker = ScanTracker(policy)
         self.agent = QBluetoothDeviceDiscoveryAgent(self)
-        self.agent.setLowEnergyDiscoveryTimeout(8000)
+        self.agent.setLowEnergyDiscoveryTimeout(policy.timeout_ms)
+
+        self._quiet_timer = QTimer(self)
+        self._quiet_timer.setSingleShot(True)
+        self._quiet_timer.timeout.connect(self._on_quiet)
+
+        self.model = DeviceListModel(self)
+        self.proxy = DeviceFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+
+        self.list = QListView()
+        self.list.setModel(self.proxy)
+        self.list.setUniformItemSizes(True)
+        self.list.setSelectionMode(QListView.SelectionMode.SingleSelection)
+
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter by name or address…")
+        self.target_only = QCheckBox("Sensors only")
+        self.target_only.setToolTip("Only show devices advertising the sensor setup service")
+        self.sort_rssi = QCheckBox("Strongest first"); self.sort_rssi.setChecked(True)
+        self.stop_early = QCheckBox("Stop early"); self.stop_early.setChecked(True)
+        self.stop_early.setToolTip("Stop scanning once the typed address or name is seen, "
+                                   f"or {self.EARLY_STOP_QUIET_MS / 1000:g} s after the last new sensor")
+
+        self.address_edit = QLineEdit()
+        self.address_edit.setPlaceholderText("AA:BB:CC:DD:EE:FF")
+        self.direct_btn = QPushButton("Connect Directly")
+        self.direct_btn.setToolTip("Use this address without scanning")
 
-        self.list = QListWidget()
         self.status = QLabel("Click 'Scan' to discover devices…")
         self.scan_btn = QPushButton("Scan")
         self.stop_btn = QPushButton("Stop"); self.stop_btn.setEnabled(False)
@@ -55,8 +93,21 @@ class DevicePicker(QDialog):
         buttons.addWidget(self.ok_btn)
         buttons.addWidget(self.cancel_btn)
 
+        filters = QHBoxLayout()
+        filters.addWidget(self.filter_edit, 1)
+        filters.addWidget(self.target_only)
+        filters.addWidget(self.sort_rssi)
+        filters.addWidget(self.stop_early)
+
+        direct = QHBoxLayout()
+        direct.addWidget(QLabel("Address:"))
+        direct.addWidget(self.address_edit, 1)
+        direct.addWidget(self.direct_btn)
+
         layout = QVBoxLayout(self)
+        layout.addLayout(filters)
         layout.addWidget(self.list)
+        layout.addLayout(direct)
         layout.addWidget(self.status)
         layout.addLayout(buttons)
 
@@ -64,20 +115,60 @@ class DevicePicker(QDialog):
         self.stop_btn.clicked.connect(self.agent.stop)
         self.ok_btn.clicked.connect(self.accept)
         self.cancel_btn.clicked.connect(self.reject)
-        self.list.itemSelectionChanged.connect(self._on_sel)
+        self.direct_btn.clicked.connect(self._on_direct)
+        self.address_edit.returnPressed.connect(self._on_direct)
+        self.list.selectionModel().selectionChanged.connect(self._on_sel)
+        self.list.doubleClicked.connect(self.accept)
+        self.filter_edit.textChanged.connect(self.proxy.set_text)
+        self.target_only.toggled.connect(self.proxy.set_target_only)
+        self.sort_rssi.toggled.connect(self._apply_sort)
+        self._apply_sort(self.sort_rssi.isChecked())
 
         self.agent.deviceDiscovered.connect(self._on_found)
+        self.agent.deviceUpdated.connect(self._on_updated)
         self.agent.errorOccurred.connect(self._on_error)
         self.agent.finished.connect(self._on_finished)
         self.agent.canceled.connect(self._on_finished)
 
+        self._load_known()
+        if self.model.rowCount():
+            self.status.setText(f"{self.model.rowCount()} known sensors. Pick one, or click 'Scan' to refresh…")
+
+    # Sensors from earlier sessions, shown before (and without) any scan
+    def _load_known(self) -> None:
+        for entry in self.registry.entries():
+            info = device_info_for(entry["address"], entry.get("name", ""))
+            if entry.get("rssi"):
+                info.setRssi(int(entry["rssi"]))
+            info.setServiceUuids([SVC_UUID])
+            self.model.upsert(info)
+
     @Slot()
     def _on_sel(self) -> None:
-        self.ok_btn.setEnabled(bool(self.list.selectedItems()))
+        self.ok_btn.setEnabled(self.list.selectionModel().hasSelection())
+
+    @Slot(bool)
+    def _apply_sort(self, by_rssi: bool) -> None:
+        # Column -1 restores the source (discovery) order
+        self.proxy.sort(0 if by_rssi else -1, Qt.SortOrder.DescendingOrder)
+
+    # The dialog's policy, tightened by the "Stop early" box and a complete address the user typed.
+    # The filter box is a substring filter ("env" also shows "env-outdoor"), so it never becomes
+    # the exact name the policy stops on.
+    def _effective_policy(self) -> ScanPolicy:
+        if not self.stop_early.isChecked():
+            return self.policy
+        address = self.address_edit.text().strip()
+        return self.policy._replace(
+            address=address if is_device_address(address) else self.policy.address,
+            quiet_ms=self.policy.quiet_ms or self.EARLY_STOP_QUIET_MS)
 
     @Slot()
     def start_scan(self) -> None:
-        self.list.clear()
+        self.tracker = ScanTracker(self._effective_policy())
+        self.tracker.start()
+        self.model.clear()
+        self._load_known()
         self.ok_btn.setEnabled(False)
         self.status.setText("Scanning…")
         self.scan_btn.setEnabled(False)
@@ -88,29 +179,61 @@ class DevicePicker(QDialog):
     def _on_found(self, info: QBluetoothDeviceInfo) -> None:
         if not (info.coreConfigurations() & QBluetoothDeviceInfo.CoreConfiguration.LowEnergyCoreConfiguration):
             return
-        has_service = SVC_UUID in info.serviceUuids()
-        label = f"{info.name()}  [{info.address().toString()}]"
-        if has_service:
-            label = "★ " + label
-        item = QListWidgetItem(label)
-        item.setData(int(Qt.ItemDataRole.UserRole), info)
-        self.list.addItem(item)
+        address = device_address(info)
+        is_target = SVC_UUID in info.serviceUuids()
+        if is_target:
+            self.registry.record(address, info.name(), info.rssi())
+        if self.model.upsert(info):
+            self.status.setText(f"Scanning… {self.model.rowCount()} devices, {self.model.target_count()} sensors")
+
+        if not self.agent.isActive() or self.tracker.stop_reason is not None: return
+        known = len(self.tracker.targets)
+        if self.tracker.observe(address, info.name(), is_target) is not None:
+            self.agent.stop()
+        elif len(self.tracker.targets) > known and self.tracker.policy.quiet_ms:
+            self._quiet_timer.start(self.tracker.policy.quiet_ms)
+
+    @Slot()
+    def _on_quiet(self) -> None:
+        if self.agent.isActive() and self.tracker.check_quiet() is not None:
+            self.agent.stop()
+
+    @Slot(QBluetoothDeviceInfo, QBluetoothDeviceInfo.Field)
+    def _on_updated(self, info: QBluetoothDeviceInfo, _fields: QBluetoothDeviceInfo.Field) -> None:
+        self._on_found(info)
 
     @Slot()
     def _on_error(self) -> None:
         self.status.setText(f"Scan error: {self.agent.errorString()}")
 
+    @Slot()
+    def _on_direct(self) -> None:
+        address = self.address_edit.text().strip()
+        if not is_device_address(address):
+            self.status.setText(f"Not a Bluetooth address: '{address}'"); return
+        known = self.registry.get(address)
+        self._direct = device_info_for(address, known.get("name", "") if known else "")
+        self.accept()
+
     @Slot()
     def _on_finished(self) -> None:
+        self._quiet_timer.stop()
+        self.registry.save()
         self.scan_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
-        self.status.setText("Select a device and click OK." if self.list.count() else "No Bluetooth devices found.")
+        self.status.setText(f"{self.model.rowCount()} devices, {self.tracker.summary()}. "
+                            "Select a device and click OK." if self.model.rowCount() else "No Bluetooth devices found.")
+
+    def scan_summary(self) -> str:
+        return self.tracker.summary()
 
     def selected_device(self) -> Optional[QBluetoothDeviceInfo]:
-        item = self.list.currentItem()
-        if not item:
+        if self._direct is not None:
+            return self._direct
+        index = self.list.currentIndex()
+        if not index.isValid() or not self.list.selectionModel().hasSelection():
             return None
-        data = item.data(int(Qt.ItemDataRole.UserRole))
+        data = index.data(DeviceListModel.InfoRole)
         return data if isinstance(data, QBluetoothDeviceInfo) else None
 
     def accept(self) -> None:
@@ -118,3 +241,9 @@ class DevicePicker(QDialog):
         if dev is not None:
             self.deviceSelected.emit(dev)
         super().accept()
+
+    def done(self, r: int) -> None:
+        if self.agent.isActive():
+            self.agent.stop()
+        self.registry.save()
+        super().done(r)
@@ -0,0 +1,91 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Every device seen advertising SVC_UUID (or successfully provisioned) with its last name, RSSI
+# and time seen. Lets the picker offer known sensors immediately and connect without a scan.
+# Entries not seen for MAX_AGE_DAYS are dropped when the registry is loaded.
+
+from __future__ import annotations
+import json, os, time
+from typing import Any, Dict, List, Optional
+
+from utils import app_data_path
+
+class DeviceRegistry:
+    MAX_AGE_DAYS = 180
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or app_data_path("devices.json")
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._entries = data
+        except (OSError, ValueError):
+            pass    # first run or unreadable registry: start empty
+        self._expire(time.time() - self.MAX_AGE_DAYS * 86400)
+
+    def _expire(self, before: float) -> None:
+        stale = [address for address, e in self._entries.items()
+                 if not isinstance(e, dict) or not isinstance(e.get("lastSeen"), (int, float))
+                 or e["lastSeen"] < before]
+        for address in stale:
+            del self._entries[address]
+        self._dirty = self._dirty or bool(stale)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, address: str) -> bool:
+        return address.upper() in self._entries
+
+    def get(self, address: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(address.upper())
+
+    # Most recently seen first
+    def entries(self) -> List[Dict[str, Any]]:
+        return sorted(({"address": a, **e} for a, e in self._entries.items()),
+                      key=lambda e: e.get("lastSeen", 0), reverse=True)
+
+    # In memory only; call save() once a scan or session is over
+    def record(self, address: str, name: str = "", rssi: Optional[int] = None) -> None:
+        entry = self._entries.setdefault(address.upper(), {"name": "", "rssi": None, "lastSeen": 0})
+        if name:
+            entry["name"] = name
+        if rssi:
+            entry["rssi"] = rssi
+        entry["lastSeen"] = int(time.time())
+        self._dirty = True
+
+    def forget(self, address: str) -> None:
+        if self._entries.pop(address.upper(), None) is not None:
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty: return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=1, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError:
+            pass    # losing a registry update only costs a scan next time
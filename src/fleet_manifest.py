@@ -0,0 +1,176 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Fleet manifests: one shared base config plus one row per sensor, read from CSV (header = column
+# names) or JSONL (one flat object per line). Row columns named like config keys override the base
+# (an empty CSV cell keeps the base value); every column is also a template variable, so base
+# values such as "sensors/{sensorId}/data" are expanded per row with str.format syntax ({{ and }}
+# for literal braces). Passwords and the CA certificate are never templates, so braces in them are
+# kept as they are. Any other column must be used by a template, which catches a mistyped column
+# name. Rows are read and expanded lazily, so a 2,000-sensor rollout never needs more than one
+# payload in memory at a time.
+
+from __future__ import annotations
+import csv, json, string
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from sensor_config import DEFAULT_CONFIG, SECRET_KEYS, build_payload
+
+ADDRESS_COLUMN = "address"
+TIMEOUT_COLUMN = "timeout"
+_RESERVED = {ADDRESS_COLUMN, TIMEOUT_COLUMN}
+
+class FleetEntry(NamedTuple):
+    line: int                   # 1-based line in the rows file (header is line 1 for CSV)
+    address: str
+    payload: Dict[str, Any]     # normalized, see sensor_config.build_payload
+    timeout_ms: Optional[int]
+
+class ManifestError(ValueError):
+    pass
+
+def _template_fields(text: str) -> List[str]:
+    return [field for _, field, _, _ in string.Formatter().parse(text) if field]
+
+def is_rows_file(path: str) -> bool:
+    return path.lower().endswith((".csv", ".jsonl", ".ndjson"))
+
+def iter_rows(path: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    try:
+        yield from _read_rows(path)
+    except UnicodeDecodeError as e:
+        raise ManifestError(f"{path}: not UTF-8 text ({e.reason} at byte {e.start}).") from None
+    except csv.Error as e:
+        raise ManifestError(f"{path}: malformed CSV ({e}).") from None
+
+def _read_rows(path: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, {k.strip(): (v or "").strip() for k, v in row.items() if k}
+        else:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    raise ManifestError(f"Line {n}: invalid JSON ({e}).") from None
+                if not isinstance(row, dict):
+                    raise ManifestError(f"Line {n}: expected a JSON object.")
+                yield n, {str(k): "" if v is None else str(v) for k, v in row.items()}
+
+class FleetManifest:
+    def __init__(self, base: Dict[str, Any], rows_path: str) -> None:
+        unknown = set(base) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ManifestError("Unknown config keys in base: " + ", ".join(sorted(unknown)))
+        self.base = dict(base)
+        self.rows_path = rows_path
+        # Templates are parsed once; plain values are copied as they are
+        self._templates = {k: v for k, v in self.base.items()
+                           if isinstance(v, str) and "{" in v and k not in SECRET_KEYS}
+        self._variables: Set[str] = set()
+        for key, text in self._templates.items():
+            try:
+                self._variables.update(_template_fields(text))
+            except ValueError as e:
+                raise ManifestError(f"Base {key}: bad template ({e}).") from None
+
+    @classmethod
+    def from_files(cls, base_path: str, rows_path: str) -> "FleetManifest":
+        try:
+            with open(base_path, "r", encoding="utf-8") as f:
+                base = json.load(f)
+        except ValueError as e:
+            raise ManifestError(f"{base_path}: invalid JSON ({e}).") from None
+        if isinstance(base, dict) and "config" in base:
+            base = base["config"]
+        if not isinstance(base, dict):
+            raise ManifestError(f"{base_path}: expected a JSON object.")
+        return cls(base, rows_path)
+
+    def expand(self, row: Dict[str, str]) -> Dict[str, Any]:
+        unused = sorted(k for k in row if k not in DEFAULT_CONFIG and k not in self._variables)
+        if unused:
+            raise ManifestError("Columns that are neither config keys nor used by a template: "
+                                + ", ".join(unused))
+        config = dict(self.base)
+        for key, value in row.items():
+            if key in DEFAULT_CONFIG and value != "":
+                config[key] = value
+        context = {**{k: v for k, v in config.items() if k not in self._templates}, **row}
+        for key, text in self._templates.items():
+            if key in row and row[key] != "":
+                continue    # explicit per-row value wins over the base template
+            try:
+                config[key] = text.format_map(context)
+            except KeyError as e:
+                raise ManifestError(f"{key}: no value for template variable {e}.") from None
+            except (IndexError, AttributeError, ValueError) as e:
+                raise ManifestError(f"{key}: cannot expand template ({e}).") from None
+        return build_payload(config)
+
+    def __iter__(self) -> Iterator[FleetEntry]:
+        for line, row in iter_rows(self.rows_path):
+            yield self._entry(line, row)
+
+    def _entry(self, line: int, row: Dict[str, str]) -> FleetEntry:
+        address = row.get(ADDRESS_COLUMN, "")
+        if not address:
+            raise ManifestError(f"Line {line}: missing '{ADDRESS_COLUMN}'.")
+        extra = {k: v for k, v in row.items() if k not in _RESERVED}
+        try:
+            payload = self.expand(extra)
+            timeout = row.get(TIMEOUT_COLUMN, "")
+            timeout_ms = int(float(timeout) * 1000) if timeout else None
+            if timeout_ms is not None and timeout_ms < 1:
+                raise ValueError(f"timeout must be positive, not {timeout}.")
+        except ValueError as e:
+            raise ManifestError(f"Line {line} [{address}]: {e}") from None
+        return FleetEntry(line, address, payload, timeout_ms)
+
+    # Streams the whole manifest once and returns every problem instead of stopping at the first
+    def validate(self, max_errors: int = 100) -> Tuple[int, List[str]]:
+        errors: List[str] = []
+        addresses: Set[str] = set()
+        sensor_ids: Set[str] = set()
+        count = 0
+        try:
+            for line, row in iter_rows(self.rows_path):
+                count += 1
+                try:
+                    entry = self._entry(line, row)
+                except ManifestError as e:
+                    errors.append(str(e))
+                else:
+                    if entry.address.upper() in addresses:
+                        errors.append(f"Line {line}: duplicate address {entry.address}.")
+                    addresses.add(entry.address.upper())
+                    sid = entry.payload["sensorId"]
+                    if sid and sid in sensor_ids:
+                        errors.append(f"Line {line}: duplicate sensorId '{sid}'.")
+                    sensor_ids.add(sid)
+                if len(errors) >= max_errors:
+                    errors.append("Too many errors; stopped validating.")
+                    break
+        except (OSError, ManifestError) as e:
+            errors.append(str(e))
+        return count, errors
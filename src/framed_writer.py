@@ -0,0 +1,211 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+from __future__ import annotations
+from typing import Optional
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from constants import CTRL_UUID, DATA_UUID, STAT_UUID
+from framing import (
+    ChunkedTransfer, STAT_ACK, STAT_NAK, STAT_RESULT, STAT_VERIFIED, chunk_size_for_mtu, parse_stat_frame,
+    parse_verified
+)
+from transport import PROP_READ, PROP_WRITE_NO_RESPONSE, Transport
+
+# Drives a ChunkedTransfer over a transport whose service is already discovered:
+# BEGIN on CTRL_UUID -> windowed WriteWithoutResponse chunks on DATA_UUID -> COMMIT -> RESULT on STAT_UUID
+# With FLAG_STREAM all chunks go out at once, followed by VERIFY on CTRL_UUID and VERIFIED on STAT_UUID
+# (notified, or read when too long for the MTU); damaged ranges are resent until the digests match,
+# then COMMIT as usual.
+# Passing the ChunkedTransfer of an interrupted writer as `resume` sends BEGIN with FLAG_RESUME and
+# continues from the chunk the device reports instead of starting over.
+class FramedWriter(QObject):
+    progress: Signal = Signal(int, int)     # acknowledged bytes, total bytes
+    finished: Signal = Signal(bool, str)    # ok, message
+
+    STALL_MS = 1500     # no ACK for this long -> resend the unacknowledged window
+    MAX_STALLS = 5
+    MAX_VERIFY_ROUNDS = 5
+
+    _IDLE, _BEGIN, _STREAM, _VERIFY, _COMMIT, _RESULT, _DONE = range(7)
+
+    def __init__(self, transport: Transport, payload: bytes, mtu: int, window: int = 8, flags: int = 0,
+                 parent: Optional[QObject] = None, resume: Optional[ChunkedTransfer] = None) -> None:
+        super().__init__(parent)
+        self.transport = transport
+        # The device matches a partial transfer by chunk size as well, so keep it while it still fits
+        self.resuming = resume is not None and resume.payload == payload and resume.chunk_size <= chunk_size_for_mtu(mtu)
+        self.transfer = resume if self.resuming and resume is not None else ChunkedTransfer(payload, mtu, window, flags)
+        self._verify_read = self.transfer.stream and not self.transfer.verified_notifies(mtu)
+
+        self._data_with_response = not (transport.properties(DATA_UUID) & PROP_WRITE_NO_RESPONSE)
+        self._state = self._IDLE
+        self._stalls = 0
+
+        self._stall_timer = QTimer(self)
+        self._stall_timer.setSingleShot(True)
+        self._stall_timer.setInterval(self.STALL_MS)
+        self._stall_timer.timeout.connect(self._on_stall)
+
+    @Slot()
+    def start(self) -> None:
+        if self._state != self._IDLE: return
+        if not self.transport.enable_notifications(STAT_UUID):
+            self._finish(False, "Framed transfer needs notifications on STAT_UUID."); return
+        if self.transfer.stream and not (self.transport.properties(STAT_UUID) & PROP_READ):
+            self._finish(False, "Verified transfer needs a readable STAT_UUID."); return
+
+        self.transport.characteristicChanged.connect(self._on_chr_changed)
+        self.transport.characteristicWritten.connect(self._on_chr_written)
+        if self.transfer.stream:
+            self.transport.characteristicRead.connect(self._on_chr_read)
+
+        self._state = self._BEGIN
+        self._stall_timer.start()
+        self.transport.write(CTRL_UUID, self.transfer.begin_frame(self.resuming))
+
+    def abort(self, reason: str = "Transfer aborted.") -> None:
+        if self._state in (self._IDLE, self._DONE): return
+        self.transport.write(CTRL_UUID, ChunkedTransfer.abort_frame())
+        self._finish(False, reason)
+
+    # The link is gone: stop quietly and leave the device's partial transfer alone for a resume.
+    # Returns False when no transfer was in flight.
+    def suspend(self) -> bool:
+        if self._state in (self._IDLE, self._DONE): return False
+        self._release()
+        self._state = self._DONE
+        return True
+
+    def _stream(self) -> None:
+        self._state = self._STREAM
+        self._stall_timer.start()
+        self._pump()
+        if self.transfer.stream:
+            self._send_verify()
+
+    def _pump(self) -> None:
+        for frame in self.transfer.next_frames():
+            self.transport.write(DATA_UUID, frame, self._data_with_response)
+
+    @Slot(object, bytes)
+    def _on_chr_written(self, uuid: object, _value: bytes) -> None:
+        if uuid != CTRL_UUID: return
+        if self._state == self._BEGIN and not self.resuming:
+            self._stream()
+        elif self._state == self._VERIFY and self._verify_read:
+            self.transport.read(STAT_UUID)
+        elif self._state == self._COMMIT:
+            self._state = self._RESULT
+            self._stall_timer.start()
+
+    @Slot(object, bytes)
+    def _on_chr_changed(self, uuid: object, value: bytes) -> None:
+        if uuid != STAT_UUID: return
+        if self._state == self._VERIFY and not self._verify_read and value[:1] == bytes((STAT_VERIFIED,)):
+            self._on_chr_read(uuid, value); return
+        frame = parse_stat_frame(value)
+        if frame is None: return
+        op, arg = frame
+
+        if op == STAT_ACK and self._state == self._BEGIN and self.resuming:
+            # Where the device left off
+            self._stalls = 0
+            self.transfer.resume_at(arg)
+            self.progress.emit(self.transfer.acked_bytes(), len(self.transfer.payload))
+            self._stream(); return
+
+        if op == STAT_RESULT and self._state in (self._COMMIT, self._RESULT):
+            if arg == 0:
+                verified = f", verified in {self.transfer.verify_rounds} round(s)" if self.transfer.stream else ""
+                self._finish(True, f"Framed transfer complete ({len(self.transfer.payload)} bytes, "
+                                   f"{self.transfer.total_chunks} chunks, {self.transfer.retransmits} resent{verified}).")
+            else:
+                self._finish(False, f"Device rejected payload (code {arg}).")
+            return
+        if self._state != self._STREAM: return
+
+        self._stalls = 0
+        self._stall_timer.start()
+        if op == STAT_ACK:
+            self.transfer.on_ack(arg)
+        elif op == STAT_NAK:
+            self.transfer.on_nak(arg)
+        self.progress.emit(self.transfer.acked_bytes(), len(self.transfer.payload))
+
+        if self.transfer.is_complete():
+            self._state = self._COMMIT
+            self.transport.write(CTRL_UUID, self.transfer.commit_frame())
+        else:
+            self._pump()
+
+    def _send_verify(self) -> None:
+        self._state = self._VERIFY
+        self._stall_timer.start()
+        self.transport.write(CTRL_UUID, self.transfer.verify_frame())
+
+    @Slot(object, bytes)
+    def _on_chr_read(self, uuid: object, value: bytes) -> None:
+        if uuid != STAT_UUID or self._state != self._VERIFY: return
+        digests = parse_verified(value)
+        if digests is None:
+            self._finish(False, "Device did not report the digests of the received payload."); return
+        self._stalls = 0
+        intact = self.transfer.on_verified(*digests)
+        self.progress.emit(self.transfer.acked_bytes(), len(self.transfer.payload))
+        if intact:
+            self._state = self._COMMIT
+            self._stall_timer.start()
+            self.transport.write(CTRL_UUID, self.transfer.commit_frame())
+        elif self.transfer.verify_rounds >= self.MAX_VERIFY_ROUNDS:
+            self.abort(f"Payload still damaged after {self.transfer.verify_rounds} verify rounds.")
+        else:
+            self._state = self._STREAM
+            self._pump()
+            self._send_verify()
+
+    @Slot()
+    def _on_stall(self) -> None:
+        self._stalls += 1
+        if self._stalls > self.MAX_STALLS:
+            self.abort("Framed transfer stalled."); return
+        if self._state == self._STREAM:
+            self.transfer.rewind()
+            self._pump()
+        elif self._state == self._VERIFY:
+            self._send_verify()
+        elif self._state == self._BEGIN and self.resuming:
+            self.transport.write(CTRL_UUID, self.transfer.begin_frame(True))
+        self._stall_timer.start()
+
+    def _release(self) -> None:
+        self._stall_timer.stop()
+        self.transport.characteristicChanged.disconnect(self._on_chr_changed)
+        self.transport.characteristicWritten.disconnect(self._on_chr_written)
+        if self.transfer.stream:
+            self.transport.characteristicRead.disconnect(self._on_chr_read)
+
+    def _finish(self, ok: bool, msg: str) -> None:
+        if self._state == self._DONE: return
+        prev = self._state
+        self._state = self._DONE
+        self._stall_timer.stop()
+        if prev != self._IDLE:
+            self._release()
+        self.finished.emit(ok, msg)
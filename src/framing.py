@@ -0,0 +1,278 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Framed transfer protocol for large DATA_UUID payloads.
+#
+#   CTRL_UUID  BEGIN   <B op=0x01><B flags><I total_len><H chunk_size><H window><I crc32>
+#              COMMIT  <B op=0x02><I crc32>
+#              ABORT   <B op=0x03>
+#              HELLO   <B op=0x05><B caps>[<B caps>]  capability bitmask of the app, high byte only when set
+#              DIGEST  <B op=0x07>                    ask for per-field digests, then read STAT_UUID
+#              VERIFY  <B op=0x08><H range_chunks>    ask for the digests of what arrived, then read STAT_UUID
+#              CERT    <B op=0x09><32s fingerprint>   does the device hold this CA certificate (SHA-256 of its DER)?
+#   DATA_UUID  CHUNK   <H seq><chunk bytes>          (WriteWithoutResponse, seq = chunk index)
+#   STAT_UUID  ACK     <B op=0x06><H next_seq>        cumulative: every chunk below next_seq arrived
+#              NAK     <B op=0x15><H next_seq>        gap detected: resend starting at next_seq
+#              RESULT  <B op=0x04><B code>            answer to COMMIT, 0 = payload accepted
+#              CAPS    <B op=0x05><B caps>[<B caps>]  answer to HELLO, capabilities of the firmware
+#              DIGESTS <B op=0x07>{<B tag><8s digest>} value of STAT_UUID after DIGEST (config_delta.py);
+#                                                     the passwords are left out
+#              VERIFIED <B op=0x08><32s sha256>{<I crc32>} value of STAT_UUID after VERIFY: SHA-256 of the
+#                                                     received payload and a CRC32 per range of range_chunks chunks
+#              CERT    <B op=0x09><B held>            answer to CERT, 1 = stored on the device
+#
+# The low nibble of BEGIN's flags carries the payload encoding (see wire_codec.py).
+#
+# With FLAG_STREAM in BEGIN the device neither ACKs nor NAKs: it stores every chunk at its seq and
+# the app streams the whole payload, sends VERIFY and compares the digests. Missing chunks read as
+# zero bytes, so their ranges mismatch and only those are sent again before COMMIT. VERIFIED is
+# also notified when it fits in one notification (MTU - 3), which saves the read.
+#
+# With FLAG_RESUME in BEGIN (firmware with CAP_RESUME) the device keeps a partial transfer with the
+# same length, chunk size and CRC across a disconnect and answers with ACK <chunks it holds from 0>,
+# or ACK 0 after starting over. The app continues from there instead of resending everything.
+#
+# Binary STAT frames start with a control byte (< 0x20), so they never collide with the
+# UTF-8 text status messages the firmware already sends.
+
+from __future__ import annotations
+import hashlib, struct, zlib
+from typing import List, Optional, Tuple
+
+CTRL_BEGIN  = 0x01
+CTRL_COMMIT = 0x02
+CTRL_ABORT  = 0x03
+CTRL_HELLO  = 0x05
+CTRL_DIGEST = 0x07
+CTRL_VERIFY = 0x08
+CTRL_CERT   = 0x09
+
+STAT_RESULT = 0x04
+STAT_CAPS   = 0x05
+STAT_ACK    = 0x06
+STAT_DIGESTS = 0x07
+STAT_VERIFIED = 0x08
+STAT_CERT   = 0x09
+STAT_NAK    = 0x15
+
+FLAG_STREAM = 0x80      # BEGIN flags: unacknowledged chunks, verified before COMMIT
+FLAG_RESUME = 0x40      # BEGIN flags: continue a matching partial transfer
+
+ATT_HEADER_LEN = 3      # opcode + handle of an ATT write
+SEQ_LEN = 2
+MIN_MTU = 23            # BLE default ATT MTU
+MAX_CHUNKS = 0xFFFF
+MAX_RANGES = 64         # keeps the VERIFIED value within a few long-read packets
+
+_BEGIN = struct.Struct("<BBIHHI")
+_COMMIT = struct.Struct("<BI")
+_SEQ = struct.Struct("<H")
+_STAT = struct.Struct("<BH")
+_VERIFY = struct.Struct("<BH")
+_CRC = struct.Struct("<I")
+SHA256_LEN = 32
+
+def chunk_size_for_mtu(mtu: int) -> int:
+    return max(mtu, MIN_MTU) - ATT_HEADER_LEN - SEQ_LEN
+
+def is_stat_frame(value: bytes) -> bool:
+    return bool(value) and value[0] in (STAT_ACK, STAT_NAK, STAT_RESULT, STAT_CAPS, STAT_DIGESTS, STAT_VERIFIED,
+                                        STAT_CERT)
+
+def parse_stat_frame(value: bytes) -> Optional[Tuple[int, int]]:
+    # Returns (op, arg) or None for text status messages / malformed frames
+    if not is_stat_frame(value) or value[0] in (STAT_DIGESTS, STAT_VERIFIED):
+        return None
+    if value[0] == STAT_CAPS and len(value) >= 3:
+        return value[0], value[1] | value[2] << 8
+    if value[0] in (STAT_RESULT, STAT_CAPS, STAT_CERT):
+        return (value[0], value[1]) if len(value) >= 2 else None
+    if len(value) < _STAT.size:
+        return None
+    return _STAT.unpack_from(value)
+
+def ack_frame(next_seq: int) -> bytes:
+    return _STAT.pack(STAT_ACK, next_seq)
+
+def nak_frame(next_seq: int) -> bytes:
+    return _STAT.pack(STAT_NAK, next_seq)
+
+def result_frame(code: int) -> bytes:
+    return bytes((STAT_RESULT, code))
+
+def _caps_bytes(caps: int) -> bytes:
+    # Firmware that only knows the first byte still reads it correctly
+    return bytes((caps & 0xFF, caps >> 8)) if caps > 0xFF else bytes((caps,))
+
+def hello_frame(caps: int) -> bytes:
+    return bytes((CTRL_HELLO,)) + _caps_bytes(caps)
+
+def caps_frame(caps: int) -> bytes:
+    return bytes((STAT_CAPS,)) + _caps_bytes(caps)
+
+def digest_request_frame() -> bytes:
+    return bytes((CTRL_DIGEST,))
+
+def cert_query_frame(fingerprint: bytes) -> bytes:
+    return bytes((CTRL_CERT,)) + fingerprint
+
+def parse_cert_query(value: bytes) -> bytes:
+    if len(value) != 1 + SHA256_LEN:
+        raise ValueError("Malformed CERT request.")
+    return value[1:]
+
+def cert_frame(held: bool) -> bytes:
+    return bytes((STAT_CERT, 1 if held else 0))
+
+def verify_frame(range_chunks: int) -> bytes:
+    return _VERIFY.pack(CTRL_VERIFY, range_chunks)
+
+def parse_verify(value: bytes) -> int:
+    return _VERIFY.unpack_from(value)[1]
+
+def range_crcs(payload: bytes, range_bytes: int) -> List[int]:
+    return [zlib.crc32(payload[i:i + range_bytes]) & 0xFFFFFFFF for i in range(0, max(len(payload), 1), range_bytes)]
+
+def verified_frame(payload: bytes, range_bytes: int) -> bytes:
+    return (bytes((STAT_VERIFIED,)) + hashlib.sha256(payload).digest()
+            + b"".join(_CRC.pack(c) for c in range_crcs(payload, range_bytes)))
+
+def verified_len(ranges: int) -> int:
+    return 1 + SHA256_LEN + _CRC.size * ranges
+
+def parse_verified(value: bytes) -> Optional[Tuple[bytes, List[int]]]:
+    # Returns (sha256, range crc32s) or None when malformed
+    body = value[1 + SHA256_LEN:]
+    if not value or value[0] != STAT_VERIFIED or len(value) < 1 + SHA256_LEN or len(body) % _CRC.size:
+        return None
+    return value[1:1 + SHA256_LEN], [c for (c,) in _CRC.iter_unpack(body)]
+
+def parse_begin(value: bytes) -> Tuple[int, int, int, int, int]:
+    # Returns (flags, total_len, chunk_size, window, crc32)
+    _, flags, total, chunk, window, crc = _BEGIN.unpack_from(value)
+    return flags, total, chunk, window, crc
+
+def split_chunk(value: bytes) -> Tuple[int, bytes]:
+    return _SEQ.unpack_from(value)[0], value[_SEQ.size:]
+
+# Sender side of the protocol: slices the payload into MTU-sized chunks and keeps at most
+# `window` of them unacknowledged (go-back-N), or with FLAG_STREAM sends them all and resends the
+# ranges VERIFY found damaged. Pure Python so it can be driven by any transport.
+class ChunkedTransfer:
+    def __init__(self, payload: bytes, mtu: int, window: int = 8, flags: int = 0) -> None:
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.payload = bytes(payload)
+        self.flags = flags
+        self.window = window
+        self.chunk_size = chunk_size_for_mtu(mtu)
+        self.total_chunks = max(1, -(-len(self.payload) // self.chunk_size))
+        if self.total_chunks > MAX_CHUNKS:
+            raise ValueError(f"Payload too large for framed transfer ({len(self.payload)} bytes).")
+        self.crc32 = zlib.crc32(self.payload) & 0xFFFFFFFF
+        self.stream = bool(flags & FLAG_STREAM)
+        self.sha256 = hashlib.sha256(self.payload).digest()
+        self.range_chunks = -(-self.total_chunks // min(self.total_chunks, MAX_RANGES))
+
+        self.acked = 0      # chunks [0, acked) confirmed by the device
+        self.next_seq = 0   # next chunk to put on air
+        self.retransmits = 0
+        self.verify_rounds = 0
+        self._resend: List[int] = []
+
+    def begin_frame(self, resume: bool = False) -> bytes:
+        return _BEGIN.pack(CTRL_BEGIN, self.flags | (FLAG_RESUME if resume else 0), len(self.payload),
+                           self.chunk_size, self.window, self.crc32)
+
+    def commit_frame(self) -> bytes:
+        return _COMMIT.pack(CTRL_COMMIT, self.crc32)
+
+    @staticmethod
+    def abort_frame() -> bytes:
+        return bytes((CTRL_ABORT,))
+
+    def chunk(self, seq: int) -> bytes:
+        start = seq * self.chunk_size
+        return _SEQ.pack(seq) + self.payload[start:start + self.chunk_size]
+
+    def verify_frame(self) -> bytes:
+        return verify_frame(self.range_chunks)
+
+    def verified_notifies(self, mtu: int) -> bool:
+        return verified_len(-(-self.total_chunks // self.range_chunks)) <= max(mtu, MIN_MTU) - ATT_HEADER_LEN
+
+    def next_frames(self) -> List[bytes]:
+        if self.stream:
+            seqs = self._resend + list(range(self.next_seq, self.total_chunks))
+            self._resend = []
+            self.next_seq = self.total_chunks
+            return [self.chunk(seq) for seq in seqs]
+        frames: List[bytes] = []
+        limit = min(self.acked + self.window, self.total_chunks)
+        while self.next_seq < limit:
+            frames.append(self.chunk(self.next_seq))
+            self.next_seq += 1
+        return frames
+
+    def on_ack(self, next_seq: int) -> None:
+        if self.acked < next_seq <= self.total_chunks:
+            self.acked = next_seq
+            self.next_seq = max(self.next_seq, next_seq)
+
+    # Stream mode: True when the device holds the exact payload, otherwise the chunks of every
+    # mismatching range are queued for the next next_frames()
+    def on_verified(self, sha256: bytes, crcs: List[int]) -> bool:
+        self.verify_rounds += 1
+        if sha256 == self.sha256:
+            self.acked = self.total_chunks
+            return True
+        expected = range_crcs(self.payload, self.range_chunks * self.chunk_size)
+        bad = [i for i, crc in enumerate(expected) if i >= len(crcs) or crcs[i] != crc] or list(range(len(expected)))
+        self.acked = bad[0] * self.range_chunks
+        for r in bad:
+            first = r * self.range_chunks
+            self._resend.extend(range(first, min(first + self.range_chunks, self.total_chunks)))
+        self.retransmits += len(self._resend)
+        return False
+
+    # After a reconnect: the device holds chunks [0, next_seq), everything after that goes out again
+    def resume_at(self, next_seq: int) -> None:
+        next_seq = min(max(next_seq, 0), self.total_chunks)
+        self.retransmits += max(0, self.next_seq - next_seq)
+        self.acked = self.next_seq = next_seq
+        self._resend = []
+
+    def on_nak(self, next_seq: int) -> None:
+        self.on_ack(next_seq)
+        self.rewind()
+
+    def rewind(self) -> None:
+        # Go-back-N: resend everything after the last cumulative ACK
+        if self.next_seq > self.acked:
+            self.retransmits += self.next_seq - self.acked
+            self.next_seq = self.acked
+
+    def in_flight(self) -> int:
+        return self.next_seq - self.acked
+
+    def acked_bytes(self) -> int:
+        return min(self.acked * self.chunk_size, len(self.payload))
+
+    def is_complete(self) -> bool:
+        return self.acked >= self.total_chunks
@@ -0,0 +1,84 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Remembers the characteristic layout of SVC_UUID per device address. With a cached layout the
+# session creates the service client as soon as SVC_UUID is seen (instead of after every service
+# has been discovered) and discovers its details with SkipValueDiscovery. The layout fingerprint
+# doubles as the attribute-database version: when the device reports a different layout, the
+# entry is refreshed, and when SVC_UUID disappears it is dropped. Changes stay in memory until
+# save(), so a batch writes the file once instead of once per device.
+
+from __future__ import annotations
+import hashlib, json, os, time
+from typing import Any, Dict, Optional
+
+from utils import app_data_path
+
+def layout_fingerprint(characteristics: Dict[str, int]) -> str:
+    text = ";".join(f"{uuid.lower()}={props}" for uuid, props in sorted(characteristics.items()))
+    return hashlib.sha1(text.encode("ascii")).hexdigest()
+
+class GattCache:
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or app_data_path("gatt_cache.json")
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._entries = data
+        except (OSError, ValueError):
+            pass    # first run or unreadable cache: start empty
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, address: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(address.upper())
+
+    # Stores the layout; returns True when it differs from what was cached (stale or new entry)
+    def put(self, address: str, characteristics: Dict[str, int]) -> bool:
+        fingerprint = layout_fingerprint(characteristics)
+        old = self.get(address)
+        if old is not None and old.get("fingerprint") == fingerprint:
+            return False
+        self._entries[address.upper()] = {
+            "fingerprint": fingerprint,
+            "characteristics": dict(characteristics),
+            "updated": int(time.time()),
+        }
+        self._dirty = True
+        return True
+
+    def invalidate(self, address: str) -> None:
+        if self._entries.pop(address.upper(), None) is not None:
+            self._dirty = True
+
+    # Writes the file if anything changed since the last save
+    def save(self) -> None:
+        if not self._dirty: return
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=1)
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except OSError:
+            pass    # the cache is an optimization only
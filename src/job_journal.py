@@ -0,0 +1,154 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Write-ahead journal of a batch run, so a crash or a sleeping laptop does not lose track of which
+# sensors are done. Every state change is appended as one JSON line and flushed to disk before
+# the scheduler acts on it:
+#
+#   {"address": "AA:BB:CC:DD:EE:01", "config": "<sha256 of the payload>", "state": "connecting", "t": ...}
+#
+# States: pending (queued behind another job for the same sensor; jobs not reached yet have no
+# record), connecting, written (the sensor took the bytes, or the session ended without it
+# confirming them), confirmed (the sensor confirmed the write or reported the config applied) and
+# failed. Replaying the journal gives the last state per address; a pending record never hides a
+# session that is under way for the same sensor. A run started with the same journal skips
+# sensors that confirmed the same payload and retries the rest. A final line torn by a crash is
+# cut off on open, other unreadable lines are skipped and counted, and a journal much longer than
+# its device list is rewritten with one line per device.
+
+from __future__ import annotations
+import hashlib, json, os, time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+ST_PENDING    = "pending"
+ST_CONNECTING = "connecting"
+ST_WRITTEN    = "written"
+ST_CONFIRMED  = "confirmed"
+ST_FAILED     = "failed"
+STATES = (ST_PENDING, ST_CONNECTING, ST_WRITTEN, ST_CONFIRMED, ST_FAILED)
+
+def payload_digest(payload: Dict[str, Any]) -> str:
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class JobJournal:
+    COMPACT_RATIO = 4   # lines per device before the journal is rewritten on open
+
+    def __init__(self, path: str, sync: bool = True) -> None:
+        self.path = path
+        self.sync = sync    # fsync every record
+        self.skipped_lines = 0
+        self._last: Dict[str, Dict[str, Any]] = {}
+        lines = self._replay()
+        if lines > self.COMPACT_RATIO * max(len(self._last), 1):
+            self.compact()
+        self._f = open(self.path, "a", encoding="utf-8", newline="\n")
+
+    def _replay(self) -> int:
+        lines = good = 0
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break   # only the last line can lack its newline
+                lines += 1
+                good += len(raw)
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    record = None
+                if (not isinstance(record, dict) or record.get("state") not in STATES
+                        or not isinstance(record.get("address"), str) or not record["address"]):
+                    self.skipped_lines += 1
+                    continue
+                self._apply(record)
+            end = f.seek(0, os.SEEK_END)
+        if good < end:
+            # The last record was being written when the run stopped
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+        return lines
+
+    @staticmethod
+    def _key(address: str) -> str:
+        return address.strip().upper()
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        key = self._key(record["address"])
+        old = self._last.get(key)
+        if (record["state"] == ST_PENDING and old is not None
+                and old["state"] in (ST_CONNECTING, ST_WRITTEN)):
+            return
+        self._last[key] = record
+
+    def __len__(self) -> int:
+        return len(self._last)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        return ((address, record["state"]) for address, record in self._last.items())
+
+    def state(self, address: str) -> Optional[str]:
+        record = self._last.get(self._key(address))
+        return record["state"] if record is not None else None
+
+    # True when the sensor already confirmed exactly this payload
+    def is_confirmed(self, address: str, payload: Dict[str, Any]) -> bool:
+        record = self._last.get(self._key(address))
+        return (record is not None and record["state"] == ST_CONFIRMED
+                and record.get("config") == payload_digest(payload))
+
+    def record(self, address: str, state: str, payload: Dict[str, Any], message: str = "") -> None:
+        if state not in STATES:
+            raise ValueError(f"Unknown job state '{state}'.")
+        entry: Dict[str, Any] = {"address": address, "state": state, "config": payload_digest(payload),
+                                 "t": round(time.time(), 3)}
+        if message:
+            entry["message"] = message
+        self._apply(entry)
+        self._f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._f.flush()
+        if self.sync:
+            os.fsync(self._f.fileno())
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(STATES, 0)
+        for _address, state in self:
+            counts[state] += 1
+        return counts
+
+    # Rewrites the journal with only the last record per device
+    def compact(self) -> None:
+        reopen = hasattr(self, "_f")
+        if reopen:
+            self._f.close()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+            for entry in self._last.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        if reopen:
+            self._f = open(self.path, "a", encoding="utf-8", newline="\n")
+
+    def close(self) -> None:
+        self._f.close()
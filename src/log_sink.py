@@ -0,0 +1,95 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Log pipeline for the GUI. Messages go into a bounded ring buffer that a timer flushes into the
+# log widget as one batch (one repaint instead of one per line), and every message is also handed
+# to a QueueHandler whose listener thread writes the rotating log file, so disk I/O never runs on
+# the UI thread. The widget keeps only the last lines; the files keep everything for post-mortems.
+
+from __future__ import annotations
+import logging, logging.handlers, queue
+from collections import deque
+from typing import Deque, Optional
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtWidgets import QPlainTextEdit
+
+from utils import app_data_path
+
+class LogSink(QObject):
+    FLUSH_MS = 100
+    CAPACITY = 2000                 # lines waiting for the widget; older ones are skipped in a burst
+    MAX_BYTES = 1024 * 1024
+    BACKUPS = 5
+
+    def __init__(self, widget: QPlainTextEdit, path: Optional[str] = None,
+                 parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.widget = widget
+        self.path = path or app_data_path("EnvDataMqtt_Setup.log")
+        self._pending: Deque[str] = deque(maxlen=self.CAPACITY)
+        self._skipped = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.FLUSH_MS)
+        self._timer.timeout.connect(self.flush)
+
+        self._logger = logging.getLogger("EnvDataMqtt_Setup")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._handler: Optional[logging.Handler] = None
+        try:
+            file_handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=self.MAX_BYTES, backupCount=self.BACKUPS, encoding="utf-8", delay=True)
+        except OSError:
+            return  # no log file; the widget still works
+        file_handler.setFormatter(logging.Formatter("%(asctime)s.%(msecs)03d %(message)s", "%Y-%m-%d %H:%M:%S"))
+        q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        self._handler = logging.handlers.QueueHandler(q)
+        self._logger.addHandler(self._handler)
+        self._listener = logging.handlers.QueueListener(q, file_handler)
+        self._listener.start()
+
+    def write(self, msg: str) -> None:
+        if len(self._pending) == self._pending.maxlen:
+            self._skipped += 1
+        self._pending.append(msg)
+        self._logger.info(msg)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self) -> None:
+        self._timer.stop()
+        if not self._pending: return
+        lines = list(self._pending)
+        self._pending.clear()
+        if self._skipped:
+            lines.insert(0, f"… {self._skipped} lines skipped, see {self.path}")
+            self._skipped = 0
+        self.widget.appendPlainText("\n".join(lines))
+
+    def close(self) -> None:
+        self.flush()
+        if self._listener is not None:
+            self._listener.stop()   # drains the queue
+            self._listener = None
+        if self._handler is not None:
+            self._logger.removeHandler(self._handler)
+            self._handler = None
@@ -18,22 +18,40 @@
 #  SOFTWARE.
 
 from __future__ import annotations
-from typing import Optional, cast
-from PySide6.QtCore import Slot, QByteArray
+from typing import TYPE_CHECKING, Any, Dict, Optional, cast
+from PySide6.QtCore import QTimer, Signal, Slot
+from PySide6.QtGui import QCloseEvent, QPaintEvent
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QFileDialog, QMessageBox, QPlainTextEdit
-)
-from PySide6.QtBluetooth import (
-    QBluetoothUuid, QBluetoothDeviceInfo, QLowEnergyController,
-    QLowEnergyService, QLowEnergyCharacteristic
+    QFileDialog, QMessageBox, QPlainTextEdit, QCheckBox, QComboBox, QInputDialog
 )
 
-from device_picker import DevicePicker
+from cert_store import CertStore
+from config_bundle import CONFIG_FILTER, BUNDLE_SUFFIX, ConfigBundle
 from config_form import ConfigForm
-from constants import SVC_UUID, CTRL_UUID, DATA_UUID, STAT_UUID
+from framing import FLAG_STREAM, is_stat_frame
+from config_delta import diff_config
+from gatt_cache import GattCache
+from device_registry import DeviceRegistry
+from telemetry import Telemetry, Trace
+from log_sink import LogSink
+from reconnect import Backoff
+from status_monitor import EV_APPLIED, EV_ERROR, EV_INFO, StatusEvent, StatusTracker
+from wire_codec import CAP_JSON, CAP_RESUME, TransferOptions, describe_flags, pack_payload, resolve_options
+
+# PySide6.QtBluetooth and everything built on it (constants, transport, the picker, the protocol
+# helpers) is imported on first use inside the handlers, so it stays out of the startup path
+if TYPE_CHECKING:
+    from PySide6.QtBluetooth import QBluetoothDeviceInfo, QBluetoothUuid
+    from framed_writer import FramedWriter
+    from framing import ChunkedTransfer
+    from negotiation import CtrlQuery, DigestReader
+    from transport import LinkParams, Transport
 
 class MainWindow(QMainWindow):
+    ready: Signal = Signal()    # the deferred part of the UI is built and the window is interactive
+    METRICS_MS = 30000          # how often metrics.prom is rewritten while traces close
+
     def __init__(self) -> None:
         super().__init__()
         self.setWindowTitle("Env Sensor Setup (Bluetooth)")
@@ -46,11 +64,33 @@ class MainWindow(QMainWindow):
         self.log = QPlainTextEdit(central)
         self.log.setReadOnly(True)
         self.log.setMaximumBlockCount(1500)
+        self.log_sink = LogSink(self.log, parent=self)
 
         self.btn_pick = QPushButton("Pick Device…", central)
         self.btn_connect = QPushButton("Connect", central); self.btn_connect.setEnabled(False)
         self.btn_send = QPushButton("Send Config", central); self.btn_send.setEnabled(False)
         self.btn_read_stat = QPushButton("Read Status", central); self.btn_read_stat.setEnabled(False)
+        self.lbl_status = QLabel("", central)
+        self.lbl_status.setToolTip("Device progress reported on STAT_UUID after the last send")
+        self.cb_framed = QCheckBox("Framed transfer", central)
+        self.cb_framed.setToolTip("Send the config in MTU-sized, acknowledged chunks (needs CTRL_UUID and STAT_UUID)")
+        self.cmb_encoding = QComboBox(central)
+        self.cmb_encoding.addItem("JSON", "json")
+        self.cmb_encoding.addItem("Compact", "compact")
+        self.cmb_encoding.addItem("Compact if supported", "auto")
+        self.cmb_encoding.setToolTip("Payload encoding on DATA_UUID")
+        self.cb_der_cert = QCheckBox("CA cert as DER", central)
+        self.cb_der_cert.setToolTip("Send the CA certificate as binary DER instead of PEM text (compact encoding only)")
+        self.cb_deflate = QCheckBox("Deflate", central)
+        self.cb_deflate.setToolTip("Compress the payload when that makes it smaller")
+        self.cb_delta = QCheckBox("Changed fields only", central)
+        self.cb_delta.setToolTip("Compare with the device's current config and send only what differs (framed transfer only)")
+        self.cb_verify = QCheckBox("Verified fast write", central)
+        self.cb_verify.setToolTip("Stream all chunks without acknowledgements, then compare SHA-256/CRC32 digests "
+                                  "with the device and resend only damaged ranges (uses the framed transfer)")
+        self.cb_cert_ref = QCheckBox("CA cert by fingerprint", central)
+        self.cb_cert_ref.setToolTip("Ask the device whether it already holds the CA certificate and, if so, send only "
+                                    "its SHA-256 fingerprint (compact encoding only)")
         self.btn_save = QPushButton("Save Config…", central)
         self.btn_load = QPushButton("Load Config…", central)
 
@@ -59,22 +99,57 @@ class MainWindow(QMainWindow):
         topbar.addWidget(self.btn_connect)
         topbar.addWidget(self.btn_send)
         topbar.addWidget(self.btn_read_stat)
+        topbar.addWidget(self.lbl_status)
         topbar.addStretch()
         topbar.addWidget(self.btn_load)
         topbar.addWidget(self.btn_save)
 
+        transfer_row = QHBoxLayout()
+        transfer_row.addWidget(QLabel("Transfer:", central))
+        transfer_row.addWidget(self.cb_framed)
+        transfer_row.addWidget(self.cmb_encoding)
+        transfer_row.addWidget(self.cb_der_cert)
+        transfer_row.addWidget(self.cb_deflate)
+        transfer_row.addWidget(self.cb_delta)
+        transfer_row.addWidget(self.cb_verify)
+        transfer_row.addWidget(self.cb_cert_ref)
+        transfer_row.addStretch()
+
         v = QVBoxLayout(central)
         v.addLayout(topbar)
+        v.addLayout(transfer_row)
         v.addWidget(cast(QWidget,self.form_widget), 4)
         v.addWidget(QLabel("Log:", central))
         v.addWidget(self.log, 2)
 
         self.device_info: Optional[QBluetoothDeviceInfo] = None
-        self.controller: Optional[QLowEnergyController] = None
-        self.service: Optional[QLowEnergyService] = None
-        self.chr_ctrl: Optional[QLowEnergyCharacteristic] = None
-        self.chr_data: Optional[QLowEnergyCharacteristic] = None
-        self.chr_stat: Optional[QLowEnergyCharacteristic] = None
+        self.transport: Optional[Transport] = None
+        self._service_open = False
+        self._subscribed = False     # STAT_UUID notifications enabled, so statuses can be followed
+        self.writer: Optional[FramedWriter] = None
+        self.probe: Optional[CtrlQuery] = None
+        self.digest_reader: Optional[DigestReader] = None
+        self.cert_query: Optional[CtrlQuery] = None
+        self.certs = CertStore()
+        # A framed transfer cut off by a dropped link is resumed after an automatic reconnect
+        self.backoff = Backoff()
+        self._interrupted: Optional[ChunkedTransfer] = None
+        self._reconnecting = False
+        self._retry_due = False
+        self._caps: Optional[int] = None
+        self.status = StatusTracker(parent=self)
+        self.status.changed.connect(self._on_status_changed)
+        self.status.finished.connect(self._on_status_finished)
+        self.gatt_cache = GattCache()
+        self.registry = DeviceRegistry()
+        self.telemetry = Telemetry(max_bytes=LogSink.MAX_BYTES, backups=LogSink.BACKUPS)
+        self._metrics_timer = QTimer(self)
+        self._metrics_timer.setInterval(self.METRICS_MS)
+        self._metrics_timer.timeout.connect(self.telemetry.write_prometheus)
+        self._metrics_timer.start()
+        self.trace = Trace(None, "")
+        self._cached_layout: Optional[Dict[str, Any]] = None
+        self._startup_scheduled = False
 
         self.btn_pick.clicked.connect(self.on_pick_device)
         self.btn_connect.clicked.connect(self.on_connect)
@@ -83,14 +158,45 @@ class MainWindow(QMainWindow):
         self.btn_save.clicked.connect(self.on_save)
         self.btn_load.clicked.connect(self.on_load)
 
+    def paintEvent(self, event: QPaintEvent) -> None:
+        super().paintEvent(event)
+        if not self.form_widget.is_complete() and not self._startup_scheduled:
+            self._startup_scheduled = True
+            QTimer.singleShot(0, self._finish_startup)
+
+    @Slot()
+    def _finish_startup(self) -> None:
+        self.form_widget.complete()
+        self.ready.emit()
+
+    def closeEvent(self, event: QCloseEvent) -> None:
+        self.trace.close(reason="window closed")
+        self.telemetry.close()
+        self.log_sink.close()
+        super().closeEvent(event)
+
     def login(self, msg: str) -> None:
-        self.log.appendPlainText(msg)
+        self.log_sink.write(msg)
+
+    def transfer_options(self) -> TransferOptions:
+        return TransferOptions(framed=self.cb_framed.isChecked() or self.cb_verify.isChecked(),
+                               encoding=self.cmb_encoding.currentData(),
+                               der_cert=self.cb_der_cert.isChecked(),
+                               deflate=self.cb_deflate.isChecked(),
+                               delta=self.cb_delta.isChecked(),
+                               verify=self.cb_verify.isChecked(),
+                               cert_ref=self.cb_cert_ref.isChecked())
 
     @Slot()
     def on_save(self) -> None:
-        path, _ = QFileDialog.getSaveFileName(self, "Save Config", "sensor_config.json", "JSON (*.json)")
+        path, _ = QFileDialog.getSaveFileName(self, "Save Config", "sensor_config.json", CONFIG_FILTER)
         if not path: return
         try:
+            if path.lower().endswith(BUNDLE_SUFFIX):
+                with ConfigBundle(path) as bundle:
+                    sensor_id, name = bundle.put([self.form_widget.to_dict()])[0]
+                    self.login(f"Saved config '{sensor_id}/{name}' to bundle: {path} ({len(bundle)} configs)")
+                return
             import json
             with open(path, "w", encoding="utf-8") as f:
                 json.dump(self.form_widget.to_dict(), f, indent=2, ensure_ascii=False)
@@ -100,9 +206,12 @@ class MainWindow(QMainWindow):
 
     @Slot()
     def on_load(self) -> None:
-        path, _ = QFileDialog.getOpenFileName(self, "Load Config", "", "JSON (*.json)")
+        path, _ = QFileDialog.getOpenFileName(self, "Load Config", "", CONFIG_FILTER)
         if not path: return
         try:
+            if path.lower().endswith(BUNDLE_SUFFIX):
+                self._load_from_bundle(path)
+                return
             import json
             with open(path, "r", encoding="utf-8") as f:
                 d = json.load(f)
@@ -111,15 +220,36 @@ class MainWindow(QMainWindow):
         except Exception as e:
             QMessageBox.critical(self, "Load Error", str(e))
 
+    def _load_from_bundle(self, path: str) -> None:
+        with ConfigBundle(path) as bundle:
+            sensor_id, ok = QInputDialog.getText(self, "Load Config", f"Sensor ID ({len(bundle)} configs in bundle):",
+                                                 text=self.form_widget.ed_sensor_id.text().strip())
+            if not ok or not sensor_id: return
+            names = bundle.config_names(sensor_id)
+            if not names:
+                raise ValueError(f"No config for sensor '{sensor_id}' in {path}.")
+            name = names[0]
+            if len(names) > 1:
+                name, ok = QInputDialog.getItem(self, "Load Config", "Config name:", names, 0, False)
+                if not ok: return
+            self.form_widget.load_from_dict(bundle.get(sensor_id, name) or {})
+        self.login(f"Loaded config '{sensor_id}/{name}' from bundle: {path}")
+
     @Slot()
     def on_pick_device(self) -> None:
-        dlg = DevicePicker(cast(QWidget, self))
-        if dlg.exec() == dlg.DialogCode.Accepted:
+        from device_picker import DevicePicker
+        from transport import device_address
+        dlg = DevicePicker(cast(QWidget, self), self.registry)
+        accepted = dlg.exec() == dlg.DialogCode.Accepted
+        if dlg.tracker.started:
+            self.login(f"Scan: {dlg.scan_summary()}")
+        if accepted:
             sel = dlg.selected_device()
             if sel is None:
                 self.login("No device selected."); return
             self.device_info = sel
-            self.login(f"Selected device: {sel.name()} [{sel.address().toString()}]")
+            # macOS identifies devices by UUID; their MAC address reads as all zeros
+            self.login(f"Selected device: {sel.name()} [{device_address(sel)}]")
             self.btn_connect.setEnabled(True)
         else:
             self.login("Device selection canceled.")
@@ -129,151 +259,410 @@ class MainWindow(QMainWindow):
         if self.device_info is None:
             QMessageBox.warning(self, "No device", "Pick a device first.")
             return
-
-        if self.controller is not None:
-            self.controller.disconnectFromDevice()
-            self.controller.deleteLater()
-            self.controller = None
-
+        from transport import QtTransport
+        self.connect_transport(QtTransport(self.device_info, self))
+
+    def connect_transport(self, transport: Transport) -> None:
+        if self.transport is not None:
+            self.transport.disconnected.disconnect(self._on_disconnected)
+            self.transport.disconnect_device()
+            self.transport.deleteLater()
+        self.transport = transport
+        self._service_open = False
+        self._subscribed = False
+        self._interrupted = None
+        self._reconnecting = self._retry_due = False
+        self._caps = None
+        self.backoff.reset()
+        self._cached_layout = self.gatt_cache.get(transport.address)
+        self.status.stop()
+        self.lbl_status.setText("")
+        self.trace.close(reason="reconnect")
+        self.trace = self.telemetry.trace(transport.address)
+
+        self.trace.start("connect")
         self.login("Connecting…")
-        self.controller = QLowEnergyController.createCentral(self.device_info, self)
-        if self.controller is None:
+        transport.connected.connect(self._on_connected)
+        transport.disconnected.connect(self._on_disconnected)
+        transport.errorOccurred.connect(self._on_transport_error)
+        transport.serviceDiscovered.connect(self._on_service_found)
+        transport.discoveryFinished.connect(self._on_service_scan_done)
+        transport.serviceReady.connect(self._on_service_ready)
+        transport.characteristicChanged.connect(self._on_chr_changed)
+        transport.characteristicRead.connect(self._on_chr_changed)
+        transport.linkChanged.connect(self._on_link_changed)
+        if not transport.connect_device():
             self.login("Failed to create Bluetooth controller.")
             QMessageBox.critical(self, "Bluetooth Error", "Could not create Bluetooth controller.")
-            return
-
-        self.controller.connected.connect(self._on_connected)
-        self.controller.disconnected.connect(self._on_disconnected)
-        self.controller.errorOccurred.connect(self._on_ctl_error)
-        self.controller.serviceDiscovered.connect(self._on_service_found)
-        self.controller.discoveryFinished.connect(self._on_service_scan_done)
-        self.controller.connectToDevice()
 
     @Slot()
     def _on_connected(self) -> None:
-        if self.controller is None:
-            self.login("Connected signal received but controller is None."); return
+        if self.transport is None:
+            self.login("Connected signal received but transport is None."); return
+        self._reconnecting = False
+        self.trace.end("connect")
+        from transport import BULK_PROFILE
+        if self.transport.request_connection_update(BULK_PROFILE):
+            self.trace.event("profile", min_interval_ms=BULK_PROFILE.min_interval_ms,
+                             max_interval_ms=BULK_PROFILE.max_interval_ms, latency=BULK_PROFILE.latency)
+        self.trace.start("discover")
         self.login("Connected. Discovering services…")
-        self.controller.discoverServices()
+        self.transport.discover_services()
+
+    @Slot(object)
+    def _on_link_changed(self, link: LinkParams) -> None:
+        self.trace.event("link", **link._asdict())
+        self.login(f"Link: {link.describe()}.")
 
     @Slot()
     def _on_disconnected(self) -> None:
-        self.login("Disconnected.")
+        if self._retry_due: return
+        # A reconnect that never came up counts as one more backoff step
+        if self._reconnecting:
+            self.trace.end("connect", False)
+        self.login("Reconnect failed." if self._reconnecting else "Disconnected.")
+        self._reconnecting = False
+        self._service_open = False
+        self._subscribed = False
         self.btn_send.setEnabled(False)
         self.btn_read_stat.setEnabled(False)
+        if self.writer is not None and (self._interrupted is not None or self.writer.suspend()):
+            delay = self.backoff.next_delay_ms()
+            if delay is not None:
+                self._interrupted = self.writer.transfer
+                self.trace.end("send", False, reason="link lost")
+                self.trace.event("reconnect", attempt=self.backoff.attempt, delay_ms=delay)
+                self.login(f"Framed transfer interrupted; reconnecting in {delay} ms "
+                           f"(attempt {self.backoff.attempt}/{self.backoff.attempts})…")
+                self._retry_due = True
+                QTimer.singleShot(delay, self._reconnect); return
+            self._interrupted = None
+            self.login("Disconnected during framed transfer.")
+        self.status.stop()
+        self.trace.close(reason="disconnected")
+
+    def _reconnect(self) -> None:
+        self._retry_due = False
+        if self.transport is None or self._interrupted is None: return
+        self._reconnecting = True
+        self.trace.start("connect", attempt=self.backoff.attempt)
+        self.login("Reconnecting…")
+        if not self.transport.connect_device():
+            self._interrupted = None
+            self.login("Failed to create Bluetooth controller.")
 
-    @Slot()
-    def _on_ctl_error(self) -> None:
-        if self.controller is None:
-            self.login("Controller error but controller is None."); return
-        self.login(f"Controller error: {self.controller.errorString()}")
+    @Slot(str)
+    def _on_transport_error(self, msg: str) -> None:
+        self.trace.event("error", message=msg)
+        self.login(msg)
+        if self._reconnecting:
+            self._on_disconnected()
 
-    @Slot(QBluetoothUuid)
+    @Slot(object)
     def _on_service_found(self, uuid: QBluetoothUuid) -> None:
+        from constants import SVC_UUID
         self.login(f"Found service: {uuid.toString()}")
-
-    @Slot()
-    def _on_service_scan_done(self) -> None:
-        if self.controller is None:
-            self.login("Service discovery finished but controller is None."); return
-
-        if SVC_UUID not in self.controller.services():
+        # Known layout: no need to wait for the remaining services to be enumerated
+        if uuid == SVC_UUID and self._cached_layout is not None and not self._service_open:
+            self.login("Target service found (cached layout). Creating service client…")
+            self._open_service(skip_values=True)
+
+    @Slot(bool)
+    def _on_service_scan_done(self, found: bool) -> None:
+        if self.transport is None:
+            self.login("Service discovery finished but transport is None."); return
+
+        if not found:
+            self.trace.end("discover", False)
+            self.gatt_cache.invalidate(self.transport.address)
+            self.gatt_cache.save()
             self.login("Target service not found on device.")
             QMessageBox.warning(self, "Service Missing", "The target service UUID was not found.")
             return
+        if self._service_open:
+            return  # already created from the cached layout
 
         self.login("Target service found. Creating service client…")
-        if self.service is not None:
-            self.service.deleteLater()
-            self.service = None
-
-        self.service = self.controller.createServiceObject(SVC_UUID, self)
-        if self.service is None:
+        self._open_service(skip_values=False)
+
+    def _open_service(self, skip_values: bool) -> None:
+        if self.transport is None: return
+        self._service_open = True
+        self.trace.end("discover", cached=skip_values)
+        self.trace.start("details", cached=skip_values)
+        if not self.transport.open_service(skip_values):
             self.login("Failed to create service object.")
             QMessageBox.critical(self, "Bluetooth Error", "Could not create service object.")
-            return
-
-        self.service.stateChanged.connect(self._on_service_state)
-        self.service.characteristicChanged.connect(self._on_chr_changed)
-        self.service.errorOccurred.connect(self._on_service_error)
-        self.service.discoverDetails()
 
-    @Slot(QLowEnergyService.ServiceError)
-    def _on_service_error(self, _err: QLowEnergyService.ServiceError) -> None:
-        if self.service is None:
-            self.login("Service error but service is None."); return
-        self.login(f"Service error: {self.service.error()}")
-
-    @Slot(QLowEnergyService.ServiceState)
-    def _on_service_state(self, state: QLowEnergyService.ServiceState) -> None:
-        if state != QLowEnergyService.ServiceState.ServiceDiscovered:
-            return
-        if self.service is None:
-            self.login("Service state changed but service is None."); return
+    @Slot()
+    def _on_service_ready(self) -> None:
+        from constants import CTRL_UUID, DATA_UUID, STAT_UUID
+        from transport import PROP_READ
+        if self.transport is None:
+            self.login("Service discovered but transport is None."); return
 
+        self.trace.end("details")
         self.login("Service discovered.")
-        self.chr_ctrl = self.service.characteristic(CTRL_UUID)
-        self.chr_data = self.service.characteristic(DATA_UUID)
-        self.chr_stat = self.service.characteristic(STAT_UUID)
+        address = self.transport.address
+        self.registry.record(address, self.transport.name)
+        self.registry.save()
+        stale = self.gatt_cache.put(address, self.transport.characteristics())
+        self.gatt_cache.save()
+        if stale and self._cached_layout is not None:
+            self.login("Cached GATT layout was stale; refreshed.")
 
         missing = []
-        if self.chr_data is None or not self.chr_data.isValid(): missing.append("DATA_UUID")
-        if self.chr_ctrl is None or not self.chr_ctrl.isValid(): missing.append("CTRL_UUID")
-        if self.chr_stat is None or not self.chr_stat.isValid():
+        if not self.transport.has(DATA_UUID): missing.append("DATA_UUID")
+        if not self.transport.has(CTRL_UUID): missing.append("CTRL_UUID")
+        if not self.transport.has(STAT_UUID):
             self.login("STAT_UUID not present (status read disabled).")
+        elif self.transport.enable_notifications(STAT_UUID):
+            self._subscribed = True
+            self.login("Subscribed to status notifications.")
+        else:
+            self.login("STAT_UUID cannot notify; the device status will not be followed.")
 
         if missing:
             self.login("Missing characteristics: " + ", ".join(missing))
         else:
             self.login("All characteristics present.")
 
-        self.btn_send.setEnabled(self.chr_data is not None and self.chr_data.isValid())
-        self.btn_read_stat.setEnabled(self.chr_stat is not None and self.chr_stat.isValid())
-
-    @Slot(QLowEnergyCharacteristic, QByteArray)
-    def _on_chr_changed(self, ch: QLowEnergyCharacteristic, value: QByteArray) -> None:
-        if ch is None or not ch.isValid(): return
-        if ch.uuid() != STAT_UUID: return
-        try:
-            txt = value.data().decode("utf-8", errors="replace")
-        except Exception as e:
-            txt = f"<decode error: {e}>"
-        self.login(f"Status update: {txt}")
+        self.btn_send.setEnabled(self.transport.has(DATA_UUID))
+        self.btn_read_stat.setEnabled(bool(self.transport.properties(STAT_UUID) & PROP_READ))
+        if self._interrupted is not None and not missing:
+            self._resume_interrupted()
+
+    def _resume_interrupted(self) -> None:
+        from negotiation import CtrlQuery
+        if self.transport is None or self._interrupted is None: return
+        if self._caps is None:
+            self.probe = CtrlQuery.caps(self.transport, self)
+            self.probe.finished.connect(self._on_resume_caps)
+            self.probe.finished.connect(self.probe.deleteLater)
+            self.probe.start(); return
+        transfer, self._interrupted = self._interrupted, None
+        resume = transfer if self._caps & CAP_RESUME else None
+        if resume is None:
+            self.login("Device cannot resume transfers; sending everything again.")
+        self.trace.start("send", framed=True, resumed=resume is not None)
+        self._send_framed(transfer.payload, transfer.flags, resume)
+
+    @Slot(int)
+    def _remember_caps(self, caps: int) -> None:
+        self._caps = caps
+
+    @Slot(int)
+    def _on_resume_caps(self, caps: int) -> None:
+        self._remember_caps(caps)
+        self._resume_interrupted()
+
+    @Slot(object, bytes)
+    def _on_chr_changed(self, uuid: QBluetoothUuid, value: bytes) -> None:
+        from constants import STAT_UUID
+        if uuid != STAT_UUID: return
+        if is_stat_frame(value): return  # framed transfer ACK/NAK, handled by FramedWriter
+        was_active = self.status.is_active()
+        event = self.status.feed(value)
+        if event is not None and (not was_active or event.kind == EV_INFO):
+            self.trace.event("status", text=event.text[:120])
+            self.login(f"Status update: {event.text}")
+
+    @Slot(str, str)
+    def _on_status_changed(self, stage: str, text: str) -> None:
+        self.lbl_status.setText(f"Device: {stage}")
+        if text:
+            self.trace.event("status", stage=stage, text=text[:120])
+            self.login(f"Status update: {text}")
+
+    @Slot(bool, str)
+    def _on_status_finished(self, ok: bool, msg: str) -> None:
+        self.trace.end("ack", ok, message=msg)
+        if not ok:
+            self.lbl_status.setText(f"Device: {'no status' if self.status.timed_out else 'error'}")
+            self.login(f"Device status: {msg}")
+
+    def _ready(self) -> bool:
+        from constants import DATA_UUID
+        return self.transport is not None and self._service_open and self.transport.has(DATA_UUID)
 
     @Slot()
     def on_send(self) -> None:
-        if self.service is None or self.chr_data is None or not self.chr_data.isValid():
+        from constants import CTRL_UUID, STAT_UUID
+        from negotiation import CtrlQuery
+        if not self._ready():
             QMessageBox.warning(self, "Not Ready", "Bluetooth service/characteristic not ready."); return
+        assert self.transport is not None
 
         try:
-            json_str = self.form_widget.build_json()
+            payload = self.form_widget.to_dict()
         except Exception as e:
             QMessageBox.critical(self, "Validation Error", str(e)); return
 
-        data = json_str.encode("utf-8")
-        props = self.chr_data.properties()
-        can_write = bool(props & QLowEnergyCharacteristic.PropertyType.Write)
-        can_wnr   = bool(props & QLowEnergyCharacteristic.PropertyType.WriteNoResponse)
+        options = self.transfer_options()
+        if options.delta and not options.framed:
+            QMessageBox.warning(self, "Not Supported", "Sending changed fields only needs the framed transfer."); return
+        self.trace.end("ack", False, reason="superseded")
+        self.trace.start("send", framed=options.framed, delta=options.delta)
+        if not options.needs_caps():
+            self._send_payload(payload, options); return
+        if not (self.transport.has(CTRL_UUID) and self.transport.has(STAT_UUID)):
+            self._send_payload(payload, resolve_options(options, CAP_JSON)); return
+
+        self.login("Negotiating payload encoding…")
+        self.trace.start("negotiate")
+        self.probe = CtrlQuery.caps(self.transport, self)
+        self.probe.finished.connect(self._remember_caps)
+        self.probe.finished.connect(lambda caps: self._on_caps(payload, resolve_options(options, caps)))
+        self.probe.finished.connect(self.probe.deleteLater)
+        self.probe.start()
+
+    def _on_caps(self, payload: Dict[str, Any], options: TransferOptions) -> None:
+        if self.cb_verify.isChecked() and not options.verify:
+            self.login("Device cannot verify digests; using acknowledged chunks.")
+        if self.cb_cert_ref.isChecked() and not options.cert_ref:
+            self.login("Device cannot look up CA certificates; sending the certificate in full."
+                       if options.encoding == "compact" else
+                       "CA certificate fingerprints need the compact encoding; sending the certificate in full.")
+        if not options.delta:
+            if self.cb_delta.isChecked():
+                self.login("Device cannot merge partial configs; sending everything.")
+            self._send_payload(payload, options); return
+        if self.transport is None: return
+        from negotiation import DigestReader
+
+        self.login("Reading device config digests…")
+        self.digest_reader = DigestReader(self.transport, self)
+        self.digest_reader.finished.connect(lambda digests: self._on_digests(payload, options, digests))
+        self.digest_reader.finished.connect(self.digest_reader.deleteLater)
+        self.digest_reader.start()
+
+    def _on_digests(self, payload: Dict[str, Any], options: TransferOptions,
+                    digests: Optional[Dict[str, bytes]]) -> None:
+        if digests is None:
+            self.login("Device did not report its config; sending everything.")
+            self._send_payload(payload, options); return
+        patch = diff_config(payload, digests, self.certs)
+        if not patch:
+            self.trace.end("negotiate", up_to_date=True)
+            self.trace.end("send", up_to_date=True)
+            self.login("Device config already up to date."); return
+        self.login(f"Changed fields: {', '.join(patch)}.")
+        self._send_payload(patch, options, patch=True)
+
+    def _send_payload(self, payload: Dict[str, Any], options: TransferOptions, patch: bool = False) -> None:
+        from constants import DATA_UUID
+        from transport import ATT_WRITE_OVERHEAD, PROP_WRITE, PROP_WRITE_NO_RESPONSE
+        if not self._ready(): return
+        assert self.transport is not None
+        if options.cert_ref and payload.get("caCertificate"):
+            self._query_cert(payload, options, patch); return
+        try:
+            data, flags = pack_payload(payload, options, patch, self.certs)
+        except ValueError as e:
+            self.trace.end("send", False, reason=str(e))
+            QMessageBox.critical(self, "Validation Error", str(e)); return
+        self.trace.end("negotiate", encoding=describe_flags(flags))
+        self.login(f"Using {describe_flags(flags)} encoding.")
+        if options.framed:
+            self._send_framed(data, flags | (FLAG_STREAM if options.verify else 0)); return
+
+        props = self.transport.properties(DATA_UUID)
+        can_write = bool(props & PROP_WRITE)
+        can_wnr   = bool(props & PROP_WRITE_NO_RESPONSE)
         if not (can_write or can_wnr):
+            self.trace.end("send", False, reason="DATA_UUID not writable")
             QMessageBox.warning(self, "Write Not Supported", "DATA_UUID not writable on this device."); return
 
-        mode = (QLowEnergyService.WriteMode.WriteWithoutResponse
-                if can_wnr else QLowEnergyService.WriteMode.WriteWithResponse)
-
-        self.login(f"Writing {len(data)} bytes to DATA_UUID…")
-        self.service.writeCharacteristic(self.chr_data, data, mode)
+        # WriteWithoutResponse only while the payload fits one packet at the negotiated MTU
+        link = self.transport.link_params()
+        fits = len(data) <= link.mtu - ATT_WRITE_OVERHEAD
+        if can_wnr and not fits and not can_write:
+            self.trace.end("send", False, reason="payload exceeds MTU")
+            QMessageBox.warning(self, "Payload Too Large",
+                                f"{len(data)} bytes do not fit one write at MTU {link.mtu}; use the framed transfer."); return
+        with_response = not (can_wnr and fits)
+        self.login(f"Writing {len(data)} bytes to DATA_UUID ({link.describe()}, "
+                   f"{'with' if with_response else 'without'} response)…")
+        self.transport.write(DATA_UUID, data, with_response=with_response)
         self.login("Write requested.")
-
+        self.trace.end("send", bytes=len(data), encoding=describe_flags(flags), mtu=link.mtu,
+                       interval_ms=link.interval_ms)
+        # The firmware answers with text statuses on STAT_UUID, see _on_chr_changed()
+        self._track_status()
+
+    # Asks the device for the CA certificate first; the payload then carries either the certificate
+    # or just its fingerprint
+    def _query_cert(self, payload: Dict[str, Any], options: TransferOptions, patch: bool) -> None:
+        from negotiation import CtrlQuery
+        assert self.transport is not None
+        try:
+            fingerprint = self.certs.add(payload["caCertificate"])
+        except ValueError as e:
+            self.trace.end("send", False, reason=str(e))
+            QMessageBox.critical(self, "Validation Error", str(e)); return
+        self.cert_query = CtrlQuery.cert(self.transport, fingerprint, self)
+        self.cert_query.finished.connect(lambda held: self._on_cert_held(payload, options, patch, fingerprint, held))
+        self.cert_query.finished.connect(self.cert_query.deleteLater)
+        self.cert_query.start()
+
+    def _on_cert_held(self, payload: Dict[str, Any], options: TransferOptions, patch: bool, fingerprint: bytes,
+                      held: Optional[bool]) -> None:
+        self.trace.event("cert", fingerprint=fingerprint.hex()[:16], held=held)
+        if held:
+            self.login(f"Device already holds CA certificate {fingerprint.hex()[:16]}; sending its fingerprint.")
+            payload = {**{k: v for k, v in payload.items() if k != "caCertificate"}, "caCertificateRef": fingerprint}
+        else:
+            self.login(f"Device does not hold CA certificate {fingerprint.hex()[:16]}; sending it in full.")
+        self._send_payload(payload, options._replace(cert_ref=False), patch)
+
+    def _send_framed(self, data: bytes, flags: int, resume: Optional[ChunkedTransfer] = None) -> None:
+        from constants import CTRL_UUID, STAT_UUID
+        from framed_writer import FramedWriter
+        if self.transport is None: return
+        if not (self.transport.has(CTRL_UUID) and self.transport.has(STAT_UUID)):
+            self.trace.end("send", False, reason="CTRL_UUID/STAT_UUID missing")
+            QMessageBox.warning(self, "Not Ready", "Framed transfer needs CTRL_UUID and STAT_UUID."); return
+        if self.writer is not None:
+            self.writer.abort("Superseded by a new transfer.")
+            self.writer.deleteLater()
+
+        mtu = self.transport.mtu()
+        try:
+            self.writer = FramedWriter(self.transport, data, mtu, flags=flags, parent=self, resume=resume)
+        except ValueError as e:
+            self.trace.end("send", False, reason=str(e))
+            QMessageBox.critical(self, "Transfer Error", str(e)); return
+        trace = self.trace
+        self.writer.finished.connect(lambda ok, msg: trace.end("send", ok, bytes=len(data), encoding=describe_flags(flags),
+                                                               mtu=mtu, message=msg))
+        self.writer.finished.connect(lambda ok, msg: self.login(msg))
+        self.writer.finished.connect(self._on_framed_finished)
+        self._track_status()
+        if self.writer.resuming:
+            self.login(f"Resuming the {len(data)}-byte transfer where the device left off (MTU {mtu})…")
+        else:
+            self.login(f"Writing {len(data)} bytes in {self.writer.transfer.total_chunks} chunks (MTU {mtu})…")
+        self.writer.start()
+
+    def _track_status(self) -> None:
+        self.status.stop()
+        if not self._subscribed: return
+        self.trace.start("ack")
+        self.status.start()
+
+    @Slot(bool, str)
+    def _on_framed_finished(self, ok: bool, msg: str) -> None:
+        # RESULT is the firmware's own "applied"
+        if ok:
+            self.backoff.reset()
+        self.status.on_event(StatusEvent(EV_APPLIED, "") if ok else StatusEvent(EV_ERROR, msg))
+
+    # Statuses arrive as notifications on their own; this reads the current value once
     @Slot()
     def on_read_status(self) -> None:
-        if self.service is None or self.chr_stat is None or not self.chr_stat.isValid():
+        from constants import STAT_UUID
+        from transport import PROP_READ
+        if self.transport is None or not (self.transport.properties(STAT_UUID) & PROP_READ):
             return
-        props = self.chr_stat.properties()
-        if props & QLowEnergyCharacteristic.PropertyType.Notify:
-            desc = self.chr_stat.descriptor(QBluetoothUuid.DescriptorType.ClientCharacteristicConfiguration)
-            if desc.isValid():
-                self.login("Enabling notifications on STAT_UUID…")
-                self.service.writeDescriptor(desc, QByteArray(b"\x01\x00"))
-        if props & QLowEnergyCharacteristic.PropertyType.Read:
-            self.login("Reading STAT_UUID…")
-            self.service.readCharacteristic(self.chr_stat)
+        self.login("Reading STAT_UUID…")
+        self.transport.read(STAT_UUID)
@@ -0,0 +1,136 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from config_delta import parse_digests_frame
+from constants import CTRL_UUID, STAT_UUID
+from framing import STAT_CAPS, STAT_CERT, cert_query_frame, digest_request_frame, hello_frame, parse_stat_frame
+from transport import PROP_READ, Transport
+from wire_codec import CAP_JSON, SUPPORTED_CAPS
+
+# One request on CTRL_UUID answered by a single STAT_UUID frame. Firmware that does not know the
+# request never answers, which is reported as `fallback` so callers can degrade transparently:
+#   CtrlQuery.caps()  HELLO -> CAPS, emits the device capability bitmask (CAP_JSON without an answer)
+#   CtrlQuery.cert()  CERT <fingerprint> -> CERT, emits True when the device already stores that
+#                     CA certificate, False when it does not, None without an answer
+class CtrlQuery(QObject):
+    finished: Signal = Signal(object)
+
+    TIMEOUT_MS = 1000
+
+    def __init__(self, transport: Transport, request: bytes, answer_op: int, convert: Callable[[int], Any],
+                 fallback: Any, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.transport = transport
+        self.request = request
+        self.answer_op = answer_op
+        self.convert = convert
+        self.fallback = fallback
+        self._done = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.TIMEOUT_MS)
+        self._timer.timeout.connect(lambda: self._finish(self.fallback))
+
+    @classmethod
+    def caps(cls, transport: Transport, parent: Optional[QObject] = None) -> "CtrlQuery":
+        return cls(transport, hello_frame(SUPPORTED_CAPS), STAT_CAPS, lambda caps: caps | CAP_JSON, CAP_JSON, parent)
+
+    @classmethod
+    def cert(cls, transport: Transport, fingerprint: bytes, parent: Optional[QObject] = None) -> "CtrlQuery":
+        return cls(transport, cert_query_frame(fingerprint), STAT_CERT, bool, None, parent)
+
+    @Slot()
+    def start(self) -> None:
+        if not self.transport.enable_notifications(STAT_UUID):
+            self._finish(self.fallback); return
+        self.transport.characteristicChanged.connect(self._on_chr_changed)
+        self._timer.start()
+        self.transport.write(CTRL_UUID, self.request)
+
+    @Slot(object, bytes)
+    def _on_chr_changed(self, uuid: object, value: bytes) -> None:
+        if uuid != STAT_UUID: return
+        frame = parse_stat_frame(value)
+        if frame is not None and frame[0] == self.answer_op:
+            self._finish(self.convert(frame[1]))
+
+    def _finish(self, result: Any) -> None:
+        if self._done: return
+        self._done = True
+        self._timer.stop()
+        try:
+            self.transport.characteristicChanged.disconnect(self._on_chr_changed)
+        except (RuntimeError, TypeError):
+            pass    # never connected
+        self.finished.emit(result)
+
+# Sends DIGEST on CTRL_UUID and then reads STAT_UUID (a long read, the digest list exceeds one
+# notification). Emits None when the firmware does not answer or the answer is malformed.
+class DigestReader(QObject):
+    finished: Signal = Signal(object)   # Optional[Dict[str, bytes]]
+
+    TIMEOUT_MS = 3000
+
+    def __init__(self, transport: Transport, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.transport = transport
+        self._done = False
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.TIMEOUT_MS)
+        self._timer.timeout.connect(lambda: self._finish(None))
+
+    @Slot()
+    def start(self) -> None:
+        if not (self.transport.properties(STAT_UUID) & PROP_READ):
+            self._finish(None); return
+        self.transport.characteristicWritten.connect(self._on_chr_written)
+        self.transport.characteristicRead.connect(self._on_chr_read)
+        self._timer.start()
+        self.transport.write(CTRL_UUID, digest_request_frame())
+
+    @Slot(object, bytes)
+    def _on_chr_written(self, uuid: object, _value: bytes) -> None:
+        if uuid == CTRL_UUID and not self._done:
+            self.transport.read(STAT_UUID)
+
+    @Slot(object, bytes)
+    def _on_chr_read(self, uuid: object, value: bytes) -> None:
+        if uuid != STAT_UUID: return
+        try:
+            self._finish(parse_digests_frame(value))
+        except ValueError:
+            self._finish(None)
+
+    def _finish(self, digests: Optional[Dict[str, bytes]]) -> None:
+        if self._done: return
+        self._done = True
+        self._timer.stop()
+        try:
+            self.transport.characteristicWritten.disconnect(self._on_chr_written)
+            self.transport.characteristicRead.disconnect(self._on_chr_read)
+        except (RuntimeError, TypeError):
+            pass    # never connected
+        self.finished.emit(digests)
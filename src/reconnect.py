@@ -0,0 +1,46 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Delays between reconnect attempts after a dropped link: exponential backoff with "equal jitter"
+# (half the delay fixed, half random), so sensors that dropped together on a congested floor do not
+# all come back in the same instant.
+
+from __future__ import annotations
+import random
+from typing import Optional
+
+class Backoff:
+    def __init__(self, attempts: int = 4, base_ms: int = 500, cap_ms: int = 8000,
+                 rng: Optional[random.Random] = None) -> None:
+        self.attempts = attempts
+        self.base_ms = base_ms
+        self.cap_ms = cap_ms
+        self.attempt = 0
+        self._rng = rng or random.Random()
+
+    # Returns None once every attempt is used up
+    def next_delay_ms(self) -> Optional[int]:
+        if self.attempt >= self.attempts:
+            return None
+        ceiling = min(self.cap_ms, self.base_ms * (1 << self.attempt))
+        self.attempt += 1
+        return int(ceiling / 2 + self._rng.uniform(0, ceiling / 2))
+
+    def reset(self) -> None:
+        self.attempt = 0
@@ -0,0 +1,85 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# When to stop an LE scan before its timeout. Most scans see the wanted sensor within a second and
+# would otherwise sit idle until the 8 s discovery timeout.
+
+from __future__ import annotations
+import time
+from typing import NamedTuple, Optional, Set
+
+class ScanPolicy(NamedTuple):
+    max_targets: int = 0        # stop after this many devices advertising SVC_UUID (0 = no limit)
+    address: str = ""           # stop as soon as this address is seen
+    name: str = ""              # stop as soon as a device with exactly this name is seen
+    quiet_ms: int = 0           # stop when no new target appeared for this long (0 = never)
+    timeout_ms: int = 8000      # LE discovery timeout
+
+class ScanTracker:
+    def __init__(self, policy: ScanPolicy) -> None:
+        self.policy = policy
+        self.targets: Set[str] = set()
+        self.started = 0.0
+        self.first_target_at: Optional[float] = None
+        self.last_target_at: Optional[float] = None
+        self.stop_reason: Optional[str] = None
+
+    def start(self, now: Optional[float] = None) -> None:
+        self.targets.clear()
+        self.started = time.monotonic() if now is None else now
+        self.first_target_at = self.last_target_at = None
+        self.stop_reason = None
+
+    def time_to_first_target(self) -> Optional[float]:
+        return None if self.first_target_at is None else self.first_target_at - self.started
+
+    # Returns a stop reason once the policy is satisfied
+    def observe(self, address: str, name: str, is_target: bool, now: Optional[float] = None) -> Optional[str]:
+        now = time.monotonic() if now is None else now
+        p = self.policy
+        wanted = (p.address and address.upper() == p.address.upper()) or (p.name and name == p.name)
+        if (is_target or wanted) and address.upper() not in self.targets:
+            self.targets.add(address.upper())
+            self.last_target_at = now
+            if self.first_target_at is None:
+                self.first_target_at = now
+
+        if wanted:
+            return self._stop(f"found {p.address or p.name}")
+        if p.max_targets and len(self.targets) >= p.max_targets:
+            return self._stop(f"found {len(self.targets)} sensors")
+        return None
+
+    def check_quiet(self, now: Optional[float] = None) -> Optional[str]:
+        now = time.monotonic() if now is None else now
+        if not self.policy.quiet_ms or self.last_target_at is None:
+            return None
+        if (now - self.last_target_at) * 1000 >= self.policy.quiet_ms:
+            return self._stop(f"no new sensors for {self.policy.quiet_ms / 1000:g} s")
+        return None
+
+    def _stop(self, reason: str) -> str:
+        if self.stop_reason is None:
+            self.stop_reason = reason
+        return self.stop_reason
+
+    def summary(self) -> str:
+        ttf = self.time_to_first_target()
+        first = f"first sensor after {ttf:.2f} s" if ttf is not None else "no sensor found"
+        return f"{first}, {len(self.targets)} total" + (f", stopped: {self.stop_reason}" if self.stop_reason else "")
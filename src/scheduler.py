@@ -0,0 +1,199 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+from __future__ import annotations
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from ble_session import ProvisionSession
+from cert_store import CertStore
+from gatt_cache import GattCache
+from job_journal import ST_CONFIRMED, ST_CONNECTING, ST_FAILED, ST_PENDING, ST_WRITTEN, JobJournal
+from telemetry import Telemetry
+from transport import QtTransport, Transport, address_key, device_info_for
+from wire_codec import TransferOptions
+
+class ProvisionJob(NamedTuple):
+    address: str
+    payload: Dict[str, Any]             # normalized config, see sensor_config.build_payload
+    timeout_ms: Optional[int] = None    # None -> scheduler default; otherwise at least 1
+
+# Runs up to `concurrency` ProvisionSessions at once, each with its own controller/service state,
+# so a batch takes about as long as its slowest devices instead of the sum of all of them.
+# Jobs are pulled from `jobs` only when a slot frees up, so a generator keeps large fleets lazy.
+# With a journal, every state change is on disk before it is acted on, and jobs the journal lists
+# as confirmed with the same payload finish at once without connecting.
+class ProvisionScheduler(QObject):
+    logged: Signal = Signal(str, str)                       # address, message
+    deviceFinished: Signal = Signal(str, bool, str, float)  # address, ok, message, seconds
+    jobsFailed: Signal = Signal(str)                        # message; no further jobs are read
+    finished: Signal = Signal()
+
+    def __init__(self, jobs: Iterable[ProvisionJob], concurrency: int = 4, timeout_ms: int = 30000,
+                 options: TransferOptions = TransferOptions(), cache: Optional[GattCache] = None,
+                 transport_factory: Optional[Callable[[str], Transport]] = None,
+                 telemetry: Optional[Telemetry] = None, journal: Optional[JobJournal] = None,
+                 certs: Optional[CertStore] = None, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if timeout_ms < 1:
+            raise ValueError("timeout_ms must be at least 1")
+        self.concurrency = concurrency
+        self.timeout_ms = timeout_ms
+        self.options = options
+        self.cache = cache
+        self.telemetry = telemetry
+        self.journal = journal
+        self.skipped = 0
+        self.job_error: Optional[str] = None
+        # One parse per distinct CA certificate for the whole batch
+        self.certs = certs if certs is not None else CertStore()
+        self.transport_factory = transport_factory or (lambda address: QtTransport(device_info_for(address)))
+        self.results: List[Dict[str, Any]] = []
+
+        self._jobs = iter(jobs)
+        self._deferred: Deque[ProvisionJob] = deque()
+        self._exhausted = False
+        self._active: Dict[ProvisionSession, float] = {}
+        self._running = False
+        self._started = 0.0
+        self.elapsed = 0.0
+
+    def active_count(self) -> int:
+        return len(self._active)
+
+    def deferred_count(self) -> int:
+        return len(self._deferred)
+
+    @Slot()
+    def start(self) -> None:
+        if self._running: return
+        self._running = True
+        self._started = time.monotonic()
+        self._fill()
+
+    @Slot()
+    def stop(self) -> None:
+        self._deferred.clear()
+        self._exhausted = True
+        for session in list(self._active):
+            session.abort("Batch stopped.")
+
+    # busy holds address_key() of the sensors with a running session
+    def _next_job(self, busy: set) -> Optional[ProvisionJob]:
+        for i, job in enumerate(self._deferred):
+            if address_key(job.address) not in busy:
+                del self._deferred[i]
+                return job
+        while not self._exhausted:
+            try:
+                job = next(self._jobs, None)
+            except Exception as e:
+                # A generator that raised cannot be resumed; finish what is running and stop
+                self._exhausted = True
+                self.job_error = f"Job list failed: {e}"
+                self.jobsFailed.emit(self.job_error)
+                break
+            if job is None:
+                self._exhausted = True
+            elif job.timeout_ms is not None and job.timeout_ms < 1:
+                self._fail(job, f"Invalid timeout: {job.timeout_ms} ms.")
+            elif self.journal is not None and self.journal.is_confirmed(job.address, job.payload):
+                self._skip(job)
+            elif address_key(job.address) in busy:
+                # Never run two sessions against the same sensor at once
+                self._deferred.append(job)
+                if self.journal is not None:
+                    self.journal.record(job.address, ST_PENDING, job.payload)
+            else:
+                return job
+        return None
+
+    def _fill(self) -> None:
+        busy = {address_key(s.address) for s in self._active}
+        while len(self._active) < self.concurrency:
+            job = self._next_job(busy)
+            if job is None:
+                break
+            busy.add(address_key(job.address))
+            self._launch(job)
+
+        if not self._active and not self._deferred and self._exhausted and self._running:
+            self._running = False
+            self.elapsed = time.monotonic() - self._started
+            if self.cache is not None:
+                self.cache.save()
+            self.finished.emit()
+
+    # A job that never got a session
+    def _fail(self, job: ProvisionJob, msg: str) -> None:
+        if self.journal is not None and job.address:
+            self.journal.record(job.address, ST_FAILED, job.payload, msg)
+        self.results.append({"address": job.address, "ok": False, "message": msg, "seconds": 0.0,
+                             "mtu": None, "intervalMs": None})
+        self.logged.emit(job.address, msg)
+        self.deviceFinished.emit(job.address, False, msg, 0.0)
+
+    def _skip(self, job: ProvisionJob) -> None:
+        msg = "Already confirmed (journal); skipped."
+        self.skipped += 1
+        self.results.append({"address": job.address, "ok": True, "message": msg, "seconds": 0.0,
+                             "mtu": None, "intervalMs": None, "skipped": True})
+        self.deviceFinished.emit(job.address, True, msg, 0.0)
+
+    def _launch(self, job: ProvisionJob) -> None:
+        timeout_ms = job.timeout_ms if job.timeout_ms is not None else self.timeout_ms
+        if self.journal is not None:
+            self.journal.record(job.address, ST_CONNECTING, job.payload)
+        session = ProvisionSession(self.transport_factory(job.address), job.payload, timeout_ms,
+                                   self.options, self.cache, self.telemetry, self.certs, parent=self)
+        session.logged.connect(self.logged)
+        session.finished.connect(self._on_session_finished)
+        if self.journal is not None:
+            session.written.connect(self._on_session_written)
+        self._active[session] = time.monotonic()
+        session.start()
+
+    @Slot(str)
+    def _on_session_written(self, address: str) -> None:
+        session = self.sender()
+        if self.journal is not None and isinstance(session, ProvisionSession):
+            self.journal.record(address, ST_WRITTEN, session.payload)
+
+    @Slot(str, bool, str)
+    def _on_session_finished(self, address: str, ok: bool, msg: str) -> None:
+        session = self.sender()
+        started = self._active.pop(session, None)  # type: ignore[arg-type]
+        seconds = time.monotonic() - started if started is not None else 0.0
+        if self.journal is not None and isinstance(session, ProvisionSession):
+            # A write the sensor never acknowledged is retried by the next run
+            state = ST_CONFIRMED if session.confirmed else ST_WRITTEN if ok else ST_FAILED
+            self.journal.record(address, state, session.payload, msg)
+        link = session.link if isinstance(session, ProvisionSession) else None
+        self.results.append({"address": address, "ok": ok, "message": msg, "seconds": round(seconds, 3),
+                             "mtu": link.mtu if link else None,
+                             "intervalMs": link.interval_ms if link and link.interval_ms else None})
+        self.deviceFinished.emit(address, ok, msg, seconds)
+        if session is not None:
+            session.deleteLater()
+        # Defer so the finished session can unwind before the next one starts
+        QTimer.singleShot(0, self._fill)
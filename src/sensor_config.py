@@ -0,0 +1,195 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+from __future__ import annotations
+import json, re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# One dotted-quad octet, 0-255 without leading zeros; utils.make_ip_validator() uses the same pattern.
+# [0-9] rather than \d, which also matches non-ASCII digits in Python.
+_OCTET = r"(?:25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])"
+IPV4_PATTERN = rf"^{_OCTET}(?:\.{_OCTET}){{3}}$"
+_IP_RX = re.compile(IPV4_PATTERN)
+
+STATIC_IP_KEYS = ("localIp", "subnet", "dns1Ip", "dns2Ip", "gatewayIp")
+SECRET_KEYS = ("wifiPassword", "mqttPassword", "caCertificate")     # kept exactly as typed, never stripped
+
+# Wire order matches ConfigForm.build_json()
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "blePasskey": 0,
+    "localIp": "",
+    "subnet": "",
+    "dns1Ip": "",
+    "dns2Ip": "",
+    "gatewayIp": "",
+    "wifiSsid": "",
+    "wifiPassword": "",
+    "sensorId": "",
+    "configName": "",
+    "httpConfigURL": "",
+    "mqttServer": "",
+    "mqttPort": 1883,
+    "mqttUsername": "",
+    "mqttPassword": "",
+    "mqttTopic": "",
+    "caCertificate": "",
+}
+
+# Firmware buffer sizes; ConfigForm uses them as the widgets' maximum lengths
+MAX_LENGTHS: Dict[str, int] = {
+    **{key: 15 for key in STATIC_IP_KEYS},
+    "wifiSsid": 32,
+    "wifiPassword": 64,
+    "sensorId": 36,
+    "configName": 36,
+    "httpConfigURL": 1024,
+    "mqttServer": 256,
+    "mqttUsername": 24,
+    "mqttPassword": 1024,
+    "mqttTopic": 1024,
+    "caCertificate": 3072,
+}
+
+INT_RANGES: Dict[str, Tuple[int, int]] = {
+    "blePasskey": (0, 999999),
+    "mqttPort": (1, 65535),
+}
+
+class ConfigError(ValueError):
+    def __init__(self, errors: List[str]) -> None:
+        super().__init__(errors[0] if len(errors) == 1 else f"{len(errors)} problems: " + "; ".join(errors))
+        self.errors = errors
+
+def ip_to_int(text: str) -> int:
+    a, b, c, d = (int(part) for part in text.split("."))
+    return a << 24 | b << 16 | c << 8 | d
+
+def is_netmask(text: str) -> bool:
+    # Contiguous ones from the top: the inverted mask plus one is a power of two. 0.0.0.0 has no
+    # network part at all, so it is not a usable mask.
+    mask = ip_to_int(text)
+    inverted = ~mask & 0xFFFFFFFF
+    return mask != 0 and inverted & (inverted + 1) == 0
+
+# A validator takes the normalized value and returns an error message, or None
+_Check = Callable[[Any], Optional[str]]
+
+def _compile(key: str) -> Tuple[Callable[[Any], Any], _Check]:
+    default = DEFAULT_CONFIG[key]
+    if isinstance(default, int):
+        low, high = INT_RANGES[key]
+        # bool is an int subclass and int() truncates floats, so both are checked by hand
+        def convert_int(value: Any) -> Any:
+            if isinstance(value, str):
+                return int(value.strip() or 0)
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            if isinstance(value, int) and not isinstance(value, bool):
+                return value
+            raise TypeError(value)
+        def check_int(value: int) -> Optional[str]:
+            return None if low <= value <= high else f"{key} must be between {low} and {high}, not {value}."
+        return convert_int, check_int
+
+    limit = MAX_LENGTHS[key]
+    secret = key in SECRET_KEYS
+    def convert(value: Any) -> Any:
+        if not isinstance(value, str):
+            raise TypeError(value)
+        return value if secret else value.strip()
+    too_long = (f"CA certificate exceeds {limit} characters." if key == "caCertificate"
+                else f"{key} exceeds {limit} characters.")
+    if key in STATIC_IP_KEYS:
+        def check_ip(value: str) -> Optional[str]:
+            if not value: return None
+            if not _IP_RX.match(value):
+                return f"Invalid IPv4 address in {key}: '{value}'"
+            if key == "subnet" and not is_netmask(value):
+                return f"Invalid subnet mask: '{value}'"
+            return None
+        return convert, check_ip
+    def check_length(value: str) -> Optional[str]:
+        return too_long if len(value) > limit else None
+    return convert, check_length
+
+# Built once at import, so validating a record is a flat loop over precompiled functions
+_FIELDS: Tuple[Tuple[str, Callable[[Any], Any], _Check], ...] = tuple(
+    (key, *_compile(key)) for key in DEFAULT_CONFIG)
+
+# Widget-independent config record. from_dict() normalizes (strips text, converts numbers, clears the
+# static IP fields under DHCP) and reports every problem at once through ConfigError.
+class SensorConfig:
+    __slots__ = tuple(DEFAULT_CONFIG)
+
+    def __init__(self, **values: Any) -> None:
+        for key, default in DEFAULT_CONFIG.items():
+            setattr(self, key, values.get(key, default))
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], check: bool = True) -> "SensorConfig":
+        errors: List[str] = []
+        if check:
+            unknown = set(d) - set(DEFAULT_CONFIG)
+            if unknown:
+                errors.append("Unknown config keys: " + ", ".join(sorted(unknown)))
+
+        self = cls.__new__(cls)
+        for key, convert, _ in _FIELDS:
+            value = d.get(key, DEFAULT_CONFIG[key])
+            try:
+                value = convert(value)
+            except (TypeError, ValueError):
+                if check:
+                    kind = "a whole number" if isinstance(DEFAULT_CONFIG[key], int) else "text"
+                    errors.append(f"{key} must be {kind}, not {value!r}.")
+                value = DEFAULT_CONFIG[key]
+            setattr(self, key, value)
+        if not self.localIp:
+            for key in STATIC_IP_KEYS:
+                setattr(self, key, "")
+
+        if check:
+            errors += self.errors()
+            if errors:
+                raise ConfigError(errors)
+        return self
+
+    # Every problem with the current values, field checks first and then the static IP plan as a whole
+    def errors(self) -> List[str]:
+        errors = [msg for msg in (check(getattr(self, key)) for key, _, check in _FIELDS) if msg]
+        if errors or not (self.localIp and self.subnet):
+            return errors
+        mask = ip_to_int(self.subnet)
+        local = ip_to_int(self.localIp)
+        host = local & ~mask & 0xFFFFFFFF
+        if mask < 0xFFFFFFFE and host in (0, ~mask & 0xFFFFFFFF):
+            errors.append(f"localIp {self.localIp} is the network or broadcast address of subnet {self.subnet}.")
+        if self.gatewayIp and ip_to_int(self.gatewayIp) & mask != local & mask:
+            errors.append(f"gatewayIp {self.gatewayIp} is outside the subnet of localIp {self.localIp}.")
+        return errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in DEFAULT_CONFIG}
+
+# Normalizes a config dict the same way ConfigForm.to_dict() does, without any widgets
+def build_payload(d: Dict[str, Any]) -> Dict[str, Any]:
+    return SensorConfig.from_dict(d).to_dict()
+
+def build_json(d: Dict[str, Any]) -> str:
+    return json.dumps(build_payload(d), separators=(",", ":"), ensure_ascii=False)
@@ -0,0 +1,461 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# In-process stand-in for a sensor, so sessions, the scheduler and benchmarks run on machines
+# without Bluetooth. SimulatedPeripheral is the firmware side of the protocols in framing.py,
+# wire_codec.py and config_delta.py; SimulatedTransport puts it behind the Transport interface and
+# models the link: ATT MTU, one-way latency, per-packet air time, and loss of WriteWithoutResponse
+# packets (requests are acknowledged by ATT, so only unacknowledged writes can get lost).
+
+from __future__ import annotations
+import heapq, itertools, random, time, zlib
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtBluetooth import QBluetoothUuid
+
+from cert_store import CertStore
+from constants import SVC_UUID, CTRL_UUID, DATA_UUID, STAT_UUID
+from config_delta import apply_patch, digests_frame
+from framing import (
+    ATT_HEADER_LEN, CTRL_ABORT, CTRL_BEGIN, CTRL_CERT, CTRL_COMMIT, CTRL_DIGEST, CTRL_HELLO, CTRL_VERIFY, FLAG_RESUME,
+    FLAG_STREAM, ack_frame, caps_frame, cert_frame, MIN_MTU, nak_frame, parse_begin, parse_cert_query, parse_verify,
+    result_frame, split_chunk, verified_frame
+)
+from sensor_config import DEFAULT_CONFIG
+from transport import (
+    BULK_PROFILE, ConnectionProfile, LinkParams, PROP_NOTIFY, PROP_READ, PROP_WRITE, PROP_WRITE_NO_RESPONSE,
+    Transport
+)
+from wire_codec import CAP_CERT_REF, CAP_RESUME, CAP_VERIFY, FLAG_PATCH, SUPPORTED_CAPS, unpack_payload
+
+RESULT_OK = 0
+RESULT_BAD_CRC = 1
+RESULT_BAD_PAYLOAD = 2
+
+# Generic Access / Generic Attribute, enumerated before SVC_UUID like on the real firmware
+_GENERIC_SERVICES = (QBluetoothUuid(QBluetoothUuid.ServiceClassUuid.GenericAccess),
+                     QBluetoothUuid(QBluetoothUuid.ServiceClassUuid.GenericAttribute))
+
+class SimLink(NamedTuple):
+    mtu: int = 247
+    latency_ms: float = 15.0        # one way, per packet
+    packet_ms: float = 1.25         # air time of one packet, packets on the link never overlap
+    loss: float = 0.0               # probability that a WriteWithoutResponse packet is dropped
+    notify: bool = True             # STAT_UUID supports notifications
+    write_response: bool = True     # DATA_UUID accepts WriteWithResponse (it always accepts WriteWithoutResponse)
+    caps: int = SUPPORTED_CAPS      # 0 = firmware that predates the HELLO handshake
+    has_service: bool = True
+    connect_ms: float = 60.0
+    seed: Optional[int] = None
+    join_ms: float = 1500.0         # after storing a config: until the Wi-Fi status, 0 = never reported
+    mqtt_ms: float = 300.0          # after joining Wi-Fi: until the MQTT status
+    interval_ms: float = 30.0       # connection interval the stack starts with
+    min_interval_ms: float = 7.5    # shortest interval the sensor accepts in a connection update
+    drop_after: int = 0             # the link drops once after this many DATA_UUID writes, 0 = never
+    connect_fails: int = 0          # connect attempts after that drop that fail with a controller error
+
+    # "mtu=185,latency=20,loss=0.01,notify=0" -> SimLink
+    @classmethod
+    def parse(cls, spec: str) -> "SimLink":
+        aliases = {"latency": "latency_ms", "packet": "packet_ms", "connect": "connect_ms",
+                   "join": "join_ms", "mqtt": "mqtt_ms", "interval": "interval_ms", "min_interval": "min_interval_ms",
+                   "drop": "drop_after", "fail": "connect_fails"}
+        values: Dict[str, Any] = {}
+        for item in filter(None, (p.strip() for p in spec.split(","))):
+            key, _, text = item.partition("=")
+            key = aliases.get(key.strip(), key.strip())
+            if key not in cls._fields:
+                raise ValueError(f"Unknown simulator setting '{key}'.")
+            default = cls._field_defaults[key]
+            if isinstance(default, bool):
+                values[key] = text.strip().lower() in ("1", "true", "yes", "on")
+            elif key in ("caps", "seed") or isinstance(default, int):
+                values[key] = int(text, 0)
+            else:
+                values[key] = float(text)
+        return cls(**values)
+
+# Firmware model: keeps the stored config and answers CTRL/DATA writes with STAT frames
+class SimulatedPeripheral:
+    def __init__(self, config: Optional[Dict[str, Any]] = None, caps: int = SUPPORTED_CAPS) -> None:
+        self.config: Dict[str, Any] = dict(config if config is not None else DEFAULT_CONFIG)
+        self.caps = caps
+        self.stat_value = b""
+        self.notify_enabled = False
+        self.mtu = MIN_MTU      # negotiated ATT MTU, set by the transport
+        self.commits = 0
+        self.on_commit: Optional[Callable[[], None]] = None    # called whenever a config is stored
+        self.chunks_received = 0
+        self.chunks_dropped = 0
+        self._begin: Optional[Tuple[int, int, int, int, int]] = None
+        self._buf = bytearray()
+        self._next_seq = 0
+        self._acked_seq = 0
+        self._nak_sent = False
+        self._have: Set[int] = set()    # stream mode: chunks stored so far
+        self.certs = CertStore()        # every CA certificate this sensor has been given
+        self._keep_cert()
+
+    # Each handler returns the STAT_UUID notifications it produces
+    def on_write(self, uuid: QBluetoothUuid, value: bytes) -> List[bytes]:
+        if uuid == CTRL_UUID:
+            return self._on_ctrl(value)
+        if uuid == DATA_UUID:
+            return self._on_chunk(value) if self._begin is not None else self._on_plain(value)
+        return []
+
+    def _on_ctrl(self, value: bytes) -> List[bytes]:
+        op = value[0] if value else -1
+        if op == CTRL_HELLO:
+            return [caps_frame(self.caps)] if self.caps else []
+        if op == CTRL_CERT and self.caps & CAP_CERT_REF:
+            try:
+                return [cert_frame(parse_cert_query(value) in self.certs)]
+            except ValueError:
+                return []
+        if op == CTRL_DIGEST and self.caps:
+            self.stat_value = digests_frame(self.config)
+        elif op == CTRL_BEGIN:
+            flags, total, chunk_size, window, crc = parse_begin(value)
+            resume = bool(flags & FLAG_RESUME) and self.caps & CAP_RESUME
+            begin = (flags & ~FLAG_RESUME, total, chunk_size, window, crc)
+            if resume and self._begin is not None and self._same_transfer(begin):
+                # The partial transfer survived the disconnect
+                self._begin = begin
+                self._acked_seq = self._held_chunks()
+                self._nak_sent = False
+                return [ack_frame(self._acked_seq)]
+            self._begin = begin
+            # Stream mode stores chunks by seq, so the buffer has its final size from the start
+            self._buf = bytearray(total if flags & FLAG_STREAM else 0)
+            self._have = set()
+            self._next_seq = self._acked_seq = 0
+            self._nak_sent = False
+            if resume:
+                return [ack_frame(0)]
+        elif op == CTRL_VERIFY and self._begin is not None and self.caps & CAP_VERIFY:
+            self.stat_value = verified_frame(bytes(self._buf), parse_verify(value) * self._begin[2])
+            if len(self.stat_value) <= self.mtu - ATT_HEADER_LEN:
+                return [self.stat_value]
+        elif op == CTRL_ABORT:
+            self._begin = None
+        elif op == CTRL_COMMIT and self._begin is not None:
+            return [result_frame(self._commit())]
+        return []
+
+    def _on_chunk(self, value: bytes) -> List[bytes]:
+        assert self._begin is not None
+        flags, total, chunk_size, window, _ = self._begin
+        seq, data = split_chunk(value)
+        if flags & FLAG_STREAM:
+            start = seq * chunk_size
+            if start + len(data) <= total:
+                self._buf[start:start + len(data)] = data
+                self._have.add(seq)
+                self.chunks_received += 1
+            return []
+        if seq != self._next_seq:
+            # Gap (or a resent chunk we already have): ask once for a resend from the first missing chunk
+            if seq > self._next_seq and not self._nak_sent:
+                self._nak_sent = True
+                self._acked_seq = self._next_seq
+                return [nak_frame(self._next_seq)]
+            return []
+        self._buf += data
+        self._next_seq += 1
+        self._nak_sent = False
+        self.chunks_received += 1
+        total_chunks = max(1, -(-total // chunk_size))
+        # Acknowledge every half window so the sender never runs dry
+        if self._next_seq - self._acked_seq >= max(1, window // 2) or self._next_seq >= total_chunks:
+            self._acked_seq = self._next_seq
+            return [ack_frame(self._next_seq)]
+        return []
+
+    def _same_transfer(self, begin: Tuple[int, int, int, int, int]) -> bool:
+        assert self._begin is not None
+        (flags, total, chunk_size, _, crc), (old_flags, old_total, old_chunk, _, old_crc) = begin, self._begin
+        return (flags, total, chunk_size, crc) == (old_flags, old_total, old_chunk, old_crc)
+
+    def _held_chunks(self) -> int:
+        if self._begin is not None and self._begin[0] & FLAG_STREAM:
+            n = 0
+            while n in self._have:
+                n += 1
+            return n
+        return self._next_seq
+
+    def _commit(self) -> int:
+        assert self._begin is not None
+        flags, total, _, _, crc = self._begin
+        self._begin = None
+        buf = bytes(self._buf)
+        if len(buf) != total or zlib.crc32(buf) & 0xFFFFFFFF != crc:
+            return RESULT_BAD_CRC
+        try:
+            payload = self._resolve_cert(unpack_payload(buf, flags))
+        except (ValueError, zlib.error):
+            return RESULT_BAD_PAYLOAD
+        self.config = apply_patch(self.config, payload) if flags & FLAG_PATCH else payload
+        self._committed()
+        return RESULT_OK
+
+    def _on_plain(self, value: bytes) -> List[bytes]:
+        try:
+            self.config = self._resolve_cert(unpack_payload(value))
+        except (ValueError, zlib.error):
+            return [b"RX %d bytes" % len(value), b"ERR invalid config"]
+        self._committed()
+        return [b"RX %d bytes" % len(value), b"OK config saved"]
+
+    # caCertificateRef names a certificate from an earlier config
+    def _resolve_cert(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        ref = payload.pop("caCertificateRef", None)
+        if ref is not None:
+            pem = self.certs.pem(ref)
+            if pem is None:
+                raise ValueError("Unknown CA certificate.")
+            payload["caCertificate"] = pem
+        return payload
+
+    def _keep_cert(self) -> None:
+        try:
+            if self.config.get("caCertificate"):
+                self.certs.add(self.config["caCertificate"])
+        except ValueError:
+            pass    # stored as text all the same, just never offered by fingerprint
+
+    def _committed(self) -> None:
+        self._keep_cert()
+        self.commits += 1
+        if self.on_commit is not None:
+            self.on_commit()
+
+# Transport that talks to a SimulatedPeripheral through a modelled link. All events are delivered
+# from the Qt event loop, in order, like the real stack.
+class SimulatedTransport(Transport):
+    def __init__(self, peripheral: SimulatedPeripheral, link: SimLink = SimLink(),
+                 address: str = "5E:00:00:00:00:01", parent: Optional[QObject] = None) -> None:
+        super().__init__(address, "EnvSensor-Sim", parent)
+        self.peripheral = peripheral
+        self.link = link
+        self.packets_sent = 0
+        self.packets_lost = 0
+        self._rng = random.Random(link.seed)
+        self._connected = False
+        self._service_open = False
+        self._cccd_written = False
+        self._data_writes = 0
+        self._dropped = False
+        self._fails_left = 0
+        self._queue: List[Tuple[float, int, Callable[[], None]]] = []
+        self._order = itertools.count()
+        self._tx_free = 0.0     # central -> peripheral link busy until (monotonic seconds)
+        self._rx_free = 0.0     # peripheral -> central
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._run_due)
+
+        props = PROP_READ | (PROP_NOTIFY if link.notify else 0)
+        self._chars = {CTRL_UUID.toString(): PROP_WRITE,
+                       DATA_UUID.toString(): (PROP_WRITE if link.write_response else 0) | PROP_WRITE_NO_RESPONSE,
+                       STAT_UUID.toString(): props}
+
+    # Event queue
+
+    def _at(self, due: float, fn: Callable[[], None]) -> None:
+        heapq.heappush(self._queue, (due, next(self._order), fn))
+        self._arm()
+
+    def _arm(self) -> None:
+        if not self._queue: return
+        delay_ms = max(0.0, (self._queue[0][0] - time.monotonic()) * 1000.0)
+        self._timer.start(int(delay_ms + 0.999))
+
+    def _run_due(self) -> None:
+        now = time.monotonic()
+        while self._queue and self._queue[0][0] <= now + 0.0005:
+            _, _, fn = heapq.heappop(self._queue)
+            fn()
+        self._arm()
+
+    # Link timing: returns when a packet sent now arrives on the other side
+
+    def _uplink(self, packets: int = 1) -> float:
+        start = max(time.monotonic(), self._tx_free)
+        self._tx_free = start + packets * self.link.packet_ms / 1000.0
+        self.packets_sent += packets
+        return self._tx_free + self.link.latency_ms / 1000.0
+
+    def _downlink(self, after: float) -> float:
+        start = max(after, self._rx_free)
+        self._rx_free = start + self.link.packet_ms / 1000.0
+        return self._rx_free + self.link.latency_ms / 1000.0
+
+    def _notify(self, after: float, frames: List[bytes]) -> None:
+        if not (self.link.notify and self.peripheral.notify_enabled): return
+        for frame in frames:
+            self._at(self._downlink(after), lambda f=frame: self._emit_if_connected(
+                self.characteristicChanged, STAT_UUID, f))
+
+    def _emit_if_connected(self, signal: Any, *args: Any) -> None:
+        if self._connected:
+            signal.emit(*args)
+
+    def _update_link(self, **changes: Any) -> None:
+        if self._connected:
+            self._set_link(**changes)
+
+    # Transport
+
+    def connect_device(self) -> bool:
+        def done() -> None:
+            self._connected = True
+            self.peripheral.mtu = self.link.mtu
+            self.connected.emit()
+            # ATT MTU exchange, started by the stack right after connecting
+            self._at(self._downlink(self._uplink()), lambda: self._update_link(interval_ms=self.link.interval_ms))
+
+        def failed() -> None:
+            self.errorOccurred.emit("Controller error: Error occurred trying to connect to remote device.")
+        due = time.monotonic() + self.link.connect_ms / 1000.0
+        if self._fails_left:
+            self._fails_left -= 1
+            self._at(due, failed)
+        else:
+            self._at(due, done)
+        return True
+
+    def request_connection_update(self, profile: ConnectionProfile = BULK_PROFILE) -> bool:
+        if not self._connected: return False
+        if profile.max_interval_ms < self.link.min_interval_ms:
+            return True     # rejected by the sensor: parameters stay as they are
+        granted = max(profile.min_interval_ms, self.link.min_interval_ms)
+        # The link layer switches over a few connection events after the request
+        due = time.monotonic() + 6 * (self._link.interval_ms or self.link.interval_ms) / 1000.0
+        self._at(due, lambda: self._update_link(interval_ms=granted, latency=profile.latency,
+                                                supervision_timeout_ms=profile.supervision_timeout_ms))
+        return True
+
+    def disconnect_device(self) -> None:
+        self._drop_link()
+
+    # The sensor keeps a partial transfer across the disconnect, like the firmware does until it restarts
+    def _drop_link(self) -> None:
+        was_connected = self._connected
+        self._connected = False
+        self._service_open = False
+        self._cccd_written = False
+        self._link = LinkParams()
+        self._queue.clear()
+        self._timer.stop()
+        self.peripheral.notify_enabled = False
+        if was_connected:
+            QTimer.singleShot(0, self, self.disconnected.emit)
+
+    def discover_services(self) -> None:
+        if not self._connected: return
+        services = list(_GENERIC_SERVICES) + ([SVC_UUID] if self.link.has_service else [])
+        due = time.monotonic()
+        for uuid in services:
+            # One Read By Group Type request/response per service
+            due = self._downlink(self._uplink())
+            self._at(due, lambda u=uuid: self._emit_if_connected(self.serviceDiscovered, u))
+        self._at(due, lambda: self._emit_if_connected(self.discoveryFinished, self.link.has_service))
+
+    def open_service(self, skip_values: bool = False) -> bool:
+        if not self._connected or not self.link.has_service: return False
+        self._service_open = True
+        # Characteristic + descriptor discovery, plus one read per readable value unless skipped
+        rounds = 2 + (0 if skip_values else sum(1 for p in self._chars.values() if p & PROP_READ))
+        due = time.monotonic()
+        for _ in range(rounds):
+            due = self._downlink(self._uplink())
+        self._at(due, lambda: self._emit_if_connected(self.serviceReady))
+        return True
+
+    def characteristics(self) -> Dict[str, int]:
+        return dict(self._chars) if self._service_open else {}
+
+    def write(self, uuid: QBluetoothUuid, data: bytes, with_response: bool = True) -> None:
+        if not self._connected or not self.has(uuid): return
+        data = bytes(data)
+        if not with_response:
+            if len(data) > self.link.mtu - ATT_HEADER_LEN:
+                self._at(time.monotonic(), lambda: self.errorOccurred.emit(
+                    "Service error: write without response longer than the MTU allows"))
+                return
+            arrival = self._uplink()
+            if self._rng.random() < self.link.loss:
+                self.packets_lost += 1
+                self.peripheral.chunks_dropped += 1
+                return
+            self._at(arrival, lambda: self._deliver(uuid, data, arrival))
+            return
+
+        # Long writes go out as Prepare Write requests of (MTU - 5) bytes each plus one Execute
+        parts = 1 if len(data) <= self.link.mtu - ATT_HEADER_LEN else -(-len(data) // (self.link.mtu - 5)) + 1
+        arrival = response = time.monotonic()
+        for _ in range(parts):
+            arrival = self._uplink()
+            response = self._tx_free = self._downlink(arrival)   # one request outstanding at a time
+        self._at(arrival, lambda: self._deliver(uuid, data, arrival))
+        self._at(response, lambda: self._emit_if_connected(self.characteristicWritten, uuid, data))
+
+    def _deliver(self, uuid: QBluetoothUuid, data: bytes, arrival: float) -> None:
+        if not self._connected: return
+        if uuid == DATA_UUID and self.link.drop_after and not self._dropped:
+            self._data_writes += 1
+            if self._data_writes >= self.link.drop_after:
+                self._dropped = True
+                self._fails_left = self.link.connect_fails
+                self._drop_link()
+                return
+        commits = self.peripheral.commits
+        self._notify(arrival, self.peripheral.on_write(uuid, data))
+        if self.peripheral.commits != commits and self.link.join_ms > 0:
+            # The sensor restarts its network with the new config and reports its progress
+            joined = arrival + self.link.join_ms / 1000.0
+            self._at(joined, lambda: self._notify(time.monotonic(), [b"WIFI connected"]))
+            self._at(joined + self.link.mqtt_ms / 1000.0, lambda: self._notify(time.monotonic(), [b"MQTT connected"]))
+
+    def read(self, uuid: QBluetoothUuid) -> None:
+        if not self._connected or not (self.properties(uuid) & PROP_READ): return
+        arrival = self._uplink()
+        value_packets = max(1, -(-len(self.peripheral.stat_value) // (self.link.mtu - 1)))
+        due = arrival
+        for _ in range(value_packets):   # Read Blob for long values
+            due = self._downlink(due)
+        self._at(due, lambda: self._emit_if_connected(self.characteristicRead, uuid, self.peripheral.stat_value))
+
+    def enable_notifications(self, uuid: QBluetoothUuid) -> bool:
+        if not (self.properties(uuid) & PROP_NOTIFY): return False
+        if self._cccd_written: return True
+        self._cccd_written = True
+        arrival = self._uplink()
+        self._tx_free = self._downlink(arrival)   # descriptor write is a request as well
+
+        def enable() -> None:
+            self.peripheral.notify_enabled = True
+        self._at(arrival, enable)
+        return True
+
+    def mtu(self) -> int:
+        return self.link.mtu if self._connected else MIN_MTU
@@ -0,0 +1,65 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Startup timing for benchmarks/startup_bench.py. When ENVDATA_STARTUP_PROBE names a file, the app
+# writes wall-clock marks (process start to first paint and to interactive) there as JSON and
+# quits. Works the same for the script and the PyInstaller build.
+
+from __future__ import annotations
+import json, os, time
+from typing import Dict, Optional
+from PySide6.QtCore import QEvent, QObject, QTimer
+from PySide6.QtWidgets import QApplication, QMainWindow
+
+ENV_VAR = "ENVDATA_STARTUP_PROBE"
+
+class StartupProbe(QObject):
+    def __init__(self, path: str, marks: Dict[str, float], parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.path = path
+        self.marks = dict(marks)
+
+    @classmethod
+    def from_env(cls, marks: Dict[str, float]) -> Optional["StartupProbe"]:
+        path = os.environ.get(ENV_VAR)
+        return cls(path, marks) if path else None
+
+    def mark(self, name: str) -> None:
+        self.marks.setdefault(name, time.time())
+
+    # window must have a `ready` signal (MainWindow)
+    def watch(self, window: QMainWindow) -> None:
+        self.mark("window")
+        window.installEventFilter(self)
+        window.ready.connect(lambda: QTimer.singleShot(0, self._interactive))  # type: ignore[attr-defined]
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            self.mark("first_paint")
+        return False
+
+    def _interactive(self) -> None:
+        # The event loop is idle again after the deferred UI was built
+        self.mark("interactive")
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.marks, f)
+        except OSError:
+            pass
+        QApplication.quit()
@@ -0,0 +1,148 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Text status messages the firmware sends on STAT_UUID, and a per-device state machine that follows
+# them after a config was written. Messages are matched on keywords, case-insensitive:
+#
+#   RX ... / ... received ...               the config bytes arrived
+#   OK ... / ... saved|applied|stored ...   the config was stored
+#   WIFI|WI-FI|WLAN ... connected|joined    the sensor joined the Wi-Fi network
+#   MQTT ... connected                      the sensor reached the MQTT broker
+#   ERR ... / ... fail... / error ...       anything that went wrong
+#
+# A message with a negation (WIFI not connected, MQTT connection lost, ...) never counts as
+# progress. It and anything else is an "info" event and does not change state. Binary STAT frames (framing.py)
+# belong to the transfer; its RESULT is passed in by the caller as an "applied" or "error" event.
+
+from __future__ import annotations
+from typing import Dict, NamedTuple, Optional
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from framing import is_stat_frame
+
+EV_RECEIVED = "received"
+EV_APPLIED  = "applied"
+EV_WIFI     = "wifi"
+EV_MQTT     = "mqtt"
+EV_ERROR    = "error"
+EV_INFO     = "info"
+
+# Progress of a device after the write, in order
+STAGES = ("sent", EV_RECEIVED, EV_APPLIED, EV_WIFI, EV_MQTT)
+WAIT_STAGES = (EV_APPLIED, EV_WIFI, EV_MQTT)
+
+# How long to wait for a stage once the previous one was reached
+STAGE_TIMEOUT_MS: Dict[str, int] = {EV_RECEIVED: 10000, EV_APPLIED: 10000, EV_WIFI: 30000, EV_MQTT: 20000}
+
+_NEGATIONS = frozenset(("not", "no", "disconnected", "lost", "down"))
+
+class StatusEvent(NamedTuple):
+    kind: str
+    text: str
+
+def parse_status(value: bytes) -> Optional[StatusEvent]:
+    if is_stat_frame(value):
+        return None
+    text = value.decode("utf-8", errors="replace").strip()
+    words = text.lower().replace(":", " ").replace(",", " ").split()
+    if not words:
+        return None
+    first = words[0]
+    if first in ("err", "error") or any(w.startswith("fail") or w == "error" for w in words):
+        return StatusEvent(EV_ERROR, text)
+    if not _NEGATIONS.isdisjoint(words):
+        return StatusEvent(EV_INFO, text)
+    if first in ("wifi", "wi-fi", "wlan") and any(w in ("connected", "joined") for w in words):
+        return StatusEvent(EV_WIFI, text)
+    if first == "mqtt" and "connected" in words:
+        return StatusEvent(EV_MQTT, text)
+    if first == "ok" or any(w in ("saved", "applied", "stored") for w in words):
+        return StatusEvent(EV_APPLIED, text)
+    if first == "rx" or "received" in words:
+        return StatusEvent(EV_RECEIVED, text)
+    return StatusEvent(EV_INFO, text)
+
+# Follows one device from "sent" to `wait_for` and finishes the moment that stage is reported.
+# Stages the firmware does not report are skipped; a stage that takes longer than its timeout
+# finishes the tracker with ok=False and timed_out=True, unless stage_timeouts is off.
+class StatusTracker(QObject):
+    changed: Signal = Signal(str, str)      # stage, status text
+    finished: Signal = Signal(bool, str)    # ok, message
+
+    def __init__(self, wait_for: str = EV_APPLIED, parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        if wait_for not in WAIT_STAGES:
+            raise ValueError(f"Cannot wait for '{wait_for}', use one of {', '.join(WAIT_STAGES)}.")
+        self.wait_for = wait_for
+        self.stage = ""
+        self.timed_out = False
+        self.stage_timeouts = True
+        self._done = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timeout)
+
+    def is_active(self) -> bool:
+        return bool(self.stage) and not self._done
+
+    def start(self) -> None:
+        self._done = False
+        self.timed_out = False
+        self._advance("sent", "")
+
+    def stop(self) -> None:
+        self._done = True
+        self._timer.stop()
+
+    # Returns the parsed event (None for transfer frames) so the caller can log it
+    def feed(self, value: bytes) -> Optional[StatusEvent]:
+        event = parse_status(value)
+        if event is not None and self.is_active():
+            self.on_event(event)
+        return event
+
+    def on_event(self, event: StatusEvent) -> None:
+        if not self.is_active(): return
+        if event.kind == EV_ERROR:
+            self._finish(False, event.text)
+        elif event.kind in STAGES and STAGES.index(event.kind) > STAGES.index(self.stage):
+            self._advance(event.kind, event.text)
+
+    def _next_stage(self) -> str:
+        return STAGES[STAGES.index(self.stage) + 1]
+
+    def _advance(self, stage: str, text: str) -> None:
+        self.stage = stage
+        self.changed.emit(stage, text)
+        if STAGES.index(stage) >= STAGES.index(self.wait_for):
+            self._finish(True, text or stage); return
+        if self.stage_timeouts:
+            self._timer.start(STAGE_TIMEOUT_MS[self._next_stage()])
+
+    @Slot()
+    def _on_timeout(self) -> None:
+        if self._done: return
+        self.timed_out = True
+        stage = self._next_stage()
+        self._finish(False, f"No '{stage}' status from the device within {STAGE_TIMEOUT_MS[stage] // 1000} s.")
+
+    def _finish(self, ok: bool, msg: str) -> None:
+        if self._done: return
+        self.stop()
+        self.finished.emit(ok, msg)
@@ -0,0 +1,166 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Timing spans for the BLE phases. Every connection attempt gets a Trace with its own correlation
+# ID; each finished span is appended to a JSON-lines file and folded into per-phase histograms that
+# are written in the Prometheus text format (e.g. for the node_exporter textfile collector), so
+# the phase that dominates provisioning time can be compared across a whole fleet. Like the log
+# (log_sink.py), lines go through a queue to a listener thread that does the file I/O; the metrics
+# file is rewritten by write_prometheus(), which the GUI calls on a timer, and on close().
+
+from __future__ import annotations
+import json, logging, logging.handlers, os, queue, time, uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import app_data_path
+
+BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# With telemetry=None a Trace only tracks its spans, so callers never need to check for it
+class Trace:
+    def __init__(self, telemetry: Optional["Telemetry"], address: str) -> None:
+        self.telemetry = telemetry
+        self.address = address
+        self.id = uuid.uuid4().hex[:16]
+        self._open: Dict[str, Tuple[float, float, Dict[str, Any]]] = {}
+        self.closed = False
+
+    def start(self, phase: str, **attrs: Any) -> None:
+        if self.closed: return
+        self._open[phase] = (time.time(), time.perf_counter(), attrs)
+
+    def is_open(self, phase: str) -> bool:
+        return phase in self._open
+
+    # Returns the span duration in milliseconds, or None if the phase was not started
+    def end(self, phase: str, ok: bool = True, **attrs: Any) -> Optional[float]:
+        started = self._open.pop(phase, None)
+        if started is None: return None
+        wall, t0, start_attrs = started
+        ms = (time.perf_counter() - t0) * 1000.0
+        if self.telemetry is not None:
+            self.telemetry.record(self, phase, wall, ms, ok, {**start_attrs, **attrs})
+        return ms
+
+    def event(self, name: str, **attrs: Any) -> None:
+        if self.closed or self.telemetry is None: return
+        self.telemetry.record(self, name, time.time(), None, True, attrs)
+
+    # Ends whatever is still open as failed and counts the trace; ok=None counts it as failed only
+    # if a span was still open
+    def close(self, ok: Optional[bool] = None, reason: str = "") -> None:
+        if self.closed: return
+        if ok is None:
+            ok = not self._open
+        for phase in list(self._open):
+            self.end(phase, False, reason=reason or "closed")
+        self.closed = True
+        if self.telemetry is not None:
+            self.telemetry.trace_closed(ok)
+
+# Paths default to the app data folder; "" turns that output off. With max_bytes the JSON lines
+# rotate like the log file (telemetry.jsonl.1 ... .<backups>); 0 lets the file grow.
+class Telemetry:
+    def __init__(self, jsonl_path: Optional[str] = None, prom_path: Optional[str] = None,
+                 max_bytes: int = 0, backups: int = 5) -> None:
+        self.jsonl_path = app_data_path("telemetry.jsonl") if jsonl_path is None else jsonl_path
+        self.prom_path = app_data_path("metrics.prom") if prom_path is None else prom_path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue: Optional["queue.SimpleQueue[logging.LogRecord]"] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._metrics_dirty = False
+        # (phase, outcome) -> [bucket counts..., sum, count]
+        self._hist: Dict[Tuple[str, str], List[float]] = {}
+        self._traces = {"ok": 0, "failed": 0}
+
+    def trace(self, address: str) -> Trace:
+        return Trace(self, address)
+
+    # ms=None records a point-in-time event, which only goes to the JSON lines
+    def record(self, trace: Trace, phase: str, wall: float, ms: Optional[float], ok: bool,
+               attrs: Dict[str, Any]) -> None:
+        line = {"ts": round(wall, 3), "trace": trace.id, "device": trace.address,
+                ("span" if ms is not None else "event"): phase, **({"ms": round(ms, 3)} if ms is not None else {}),
+                "ok": ok, **attrs}
+        self._write_line(line)
+
+        if ms is None: return
+        seconds = ms / 1000.0
+        h = self._hist.setdefault((phase, "ok" if ok else "failed"), [0.0] * (len(BUCKETS) + 2))
+        for i, le in enumerate(BUCKETS):
+            if seconds <= le:
+                h[i] += 1
+        h[-2] += seconds
+        h[-1] += 1
+
+    def _write_line(self, line: Dict[str, Any]) -> None:
+        if not self.jsonl_path: return
+        if self._queue is None:
+            try:
+                out = logging.handlers.RotatingFileHandler(
+                    self.jsonl_path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8", delay=True)
+            except OSError:
+                self.jsonl_path = ""
+                return  # telemetry must never break provisioning
+            self._queue = queue.SimpleQueue()
+            # The handler reports write errors through handleError() instead of raising
+            self._listener = logging.handlers.QueueListener(self._queue, out)
+            self._listener.start()
+        self._queue.put(logging.makeLogRecord({"msg": json.dumps(line, ensure_ascii=False, default=str)}))
+
+    def trace_closed(self, ok: bool) -> None:
+        self._traces["ok" if ok else "failed"] += 1
+        self._metrics_dirty = True
+
+    def prometheus_text(self) -> str:
+        out = ["# HELP envdata_ble_phase_seconds Duration of BLE provisioning phases.",
+               "# TYPE envdata_ble_phase_seconds histogram"]
+        for (phase, outcome), h in sorted(self._hist.items()):
+            labels = f'phase="{phase}",outcome="{outcome}"'
+            for i, le in enumerate(BUCKETS):
+                out.append(f'envdata_ble_phase_seconds_bucket{{{labels},le="{le:g}"}} {int(h[i])}')
+            out.append(f'envdata_ble_phase_seconds_bucket{{{labels},le="+Inf"}} {int(h[-1])}')
+            out.append(f"envdata_ble_phase_seconds_sum{{{labels}}} {h[-2]:.6f}")
+            out.append(f"envdata_ble_phase_seconds_count{{{labels}}} {int(h[-1])}")
+        out.append("# HELP envdata_ble_traces_total Connection attempts by outcome.")
+        out.append("# TYPE envdata_ble_traces_total counter")
+        for outcome, n in self._traces.items():
+            out.append(f'envdata_ble_traces_total{{outcome="{outcome}"}} {n}')
+        return "\n".join(out) + "\n"
+
+    # Does nothing when no trace closed since the last write
+    def write_prometheus(self) -> None:
+        if not self.prom_path or not self._metrics_dirty: return
+        self._metrics_dirty = False
+        tmp = self.prom_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, self.prom_path)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        self.write_prometheus()
+        if self._listener is not None:
+            self._listener.stop()   # drains the queue
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = self._queue = None
@@ -0,0 +1,297 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# The connect/discover/write/notify operations the provisioning code needs from a BLE link, so the
+# same session logic runs against a real sensor (QtTransport) or the in-process simulator
+# (sim_peripheral.SimulatedTransport). Characteristics of SVC_UUID are addressed by UUID and their
+# property masks use the GATT bit values, the same ints GattCache stores.
+
+from __future__ import annotations
+import re
+from abc import ABCMeta, abstractmethod
+from typing import Dict, NamedTuple, Optional
+from PySide6.QtCore import QObject, QUuid, Signal, Slot, QByteArray
+from PySide6.QtBluetooth import (
+    QBluetoothAddress, QBluetoothDeviceInfo, QBluetoothUuid, QLowEnergyConnectionParameters,
+    QLowEnergyController, QLowEnergyService, QLowEnergyCharacteristic
+)
+
+from constants import SVC_UUID
+
+PROP_READ = 0x02
+PROP_WRITE_NO_RESPONSE = 0x04
+PROP_WRITE = 0x08
+PROP_NOTIFY = 0x10
+
+CCCD_NOTIFY = b"\x01\x00"
+
+DEFAULT_MTU = 23
+ATT_WRITE_OVERHEAD = 3     # a single write carries at most MTU - 3 bytes
+
+# Connection parameters as requested by the app
+class ConnectionProfile(NamedTuple):
+    min_interval_ms: float = 7.5    # shortest interval BLE allows
+    max_interval_ms: float = 15.0
+    latency: int = 0                # connection events the peripheral may skip
+    supervision_timeout_ms: int = 4000
+
+# Short interval and no peripheral latency: every connection event can carry packets
+BULK_PROFILE = ConnectionProfile()
+
+# What the stack actually negotiated; interval_ms stays 0 until the stack reports it
+class LinkParams(NamedTuple):
+    mtu: int = DEFAULT_MTU
+    interval_ms: float = 0.0
+    latency: int = 0
+    supervision_timeout_ms: int = 0
+
+    def describe(self) -> str:
+        interval = f"{self.interval_ms:g} ms" if self.interval_ms else "stack default"
+        return f"MTU {self.mtu}, interval {interval}, latency {self.latency}"
+
+_MAC_RX = re.compile(r"^([0-9A-Fa-f]{2}:){5}[0-9A-Fa-f]{2}$")
+
+def is_device_address(text: str) -> bool:
+    return bool(_MAC_RX.match(text)) or not QUuid(text).isNull()
+
+# Same sensor, however the address was typed
+def address_key(address: str) -> str:
+    return address.strip().upper()
+
+def device_info_for(address: str, name: str = "") -> QBluetoothDeviceInfo:
+    # macOS/iOS only expose a per-host device UUID instead of the MAC address
+    if _MAC_RX.match(address):
+        info = QBluetoothDeviceInfo(QBluetoothAddress(address), name, 0)
+    else:
+        info = QBluetoothDeviceInfo(QBluetoothUuid(QUuid(address)), name, 0)
+    info.setCoreConfigurations(QBluetoothDeviceInfo.CoreConfiguration.LowEnergyCoreConfiguration)
+    return info
+
+def device_address(info: QBluetoothDeviceInfo) -> str:
+    addr = info.address()
+    return info.deviceUuid().toString() if addr.isNull() else addr.toString()
+
+class _TransportMeta(ABCMeta, type(QObject)):   # type: ignore[misc]
+    pass
+
+# Shiboken does not check abstract methods on construction, so __new__ does what object.__new__
+# would for a plain ABC: a transport missing any of them fails as soon as it is created
+class Transport(QObject, metaclass=_TransportMeta):
+    connected: Signal = Signal()
+    disconnected: Signal = Signal()
+    errorOccurred: Signal = Signal(str)
+    serviceDiscovered: Signal = Signal(object)          # QBluetoothUuid of any primary service
+    discoveryFinished: Signal = Signal(bool)            # True when SVC_UUID is present
+    serviceReady: Signal = Signal()                     # SVC_UUID characteristics discovered
+    characteristicWritten: Signal = Signal(object, bytes)   # characteristic UUID, value
+    characteristicChanged: Signal = Signal(object, bytes)   # notification
+    characteristicRead: Signal = Signal(object, bytes)
+    linkChanged: Signal = Signal(object)                # LinkParams, after an MTU exchange or connection update
+
+    def __new__(cls, *_args: object, **_kwargs: object) -> "Transport":
+        if cls.__abstractmethods__:
+            raise TypeError(f"Can't instantiate abstract class {cls.__name__} without "
+                            + ", ".join(sorted(cls.__abstractmethods__)))
+        return super().__new__(cls)
+
+    def __init__(self, address: str, name: str = "", parent: Optional[QObject] = None) -> None:
+        super().__init__(parent)
+        self.address = address
+        self.name = name
+        self._link = LinkParams()
+
+    # Returns False when no connection attempt could be started
+    @abstractmethod
+    def connect_device(self) -> bool:
+        ...
+
+    @abstractmethod
+    def disconnect_device(self) -> None:
+        ...
+
+    @abstractmethod
+    def discover_services(self) -> None:
+        ...
+
+    # skip_values: the layout is already known (GattCache), do not read characteristic values
+    @abstractmethod
+    def open_service(self, skip_values: bool = False) -> bool:
+        ...
+
+    @abstractmethod
+    def characteristics(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def write(self, uuid: QBluetoothUuid, data: bytes, with_response: bool = True) -> None:
+        ...
+
+    @abstractmethod
+    def read(self, uuid: QBluetoothUuid) -> None:
+        ...
+
+    # Returns False when the characteristic cannot notify
+    @abstractmethod
+    def enable_notifications(self, uuid: QBluetoothUuid) -> bool:
+        ...
+
+    @abstractmethod
+    def mtu(self) -> int:
+        ...
+
+    # Returns False when the stack cannot change connection parameters; the outcome arrives as linkChanged
+    def request_connection_update(self, profile: ConnectionProfile = BULK_PROFILE) -> bool:
+        return False
+
+    def link_params(self) -> LinkParams:
+        return self._link._replace(mtu=self.mtu())
+
+    def _set_link(self, **changes: object) -> None:
+        self._link = self._link._replace(**changes)
+        self.linkChanged.emit(self.link_params())
+
+    def error_string(self) -> str:
+        return ""
+
+    def properties(self, uuid: QBluetoothUuid) -> int:
+        return self.characteristics().get(uuid.toString(), 0)
+
+    def has(self, uuid: QBluetoothUuid) -> bool:
+        return uuid.toString() in self.characteristics()
+
+class QtTransport(Transport):
+    def __init__(self, device: QBluetoothDeviceInfo, parent: Optional[QObject] = None) -> None:
+        super().__init__(device_address(device), device.name(), parent)
+        self.device = device
+        self.controller: Optional[QLowEnergyController] = None
+        self.service: Optional[QLowEnergyService] = None
+        self._chars: Dict[str, QLowEnergyCharacteristic] = {}
+
+    def connect_device(self) -> bool:
+        self._release()
+        self.controller = QLowEnergyController.createCentral(self.device, self)
+        if self.controller is None:
+            return False
+        self.controller.connected.connect(self.connected)
+        self.controller.disconnected.connect(self.disconnected)
+        self.controller.errorOccurred.connect(self._on_ctl_error)
+        self.controller.serviceDiscovered.connect(self.serviceDiscovered)
+        self.controller.discoveryFinished.connect(
+            lambda: self.discoveryFinished.emit(SVC_UUID in self.controller.services()))
+        self.controller.mtuChanged.connect(lambda mtu: self._set_link(mtu=mtu))
+        self.controller.connectionUpdated.connect(self._on_connection_updated)
+        self.controller.connectToDevice()
+        return True
+
+    def disconnect_device(self) -> None:
+        if self.controller is not None:
+            self.controller.disconnectFromDevice()
+
+    # A reconnect starts from a fresh controller; the old one may still hold the dead link
+    def _release(self) -> None:
+        if self.service is not None:
+            self.service.deleteLater()
+            self.service = None
+        if self.controller is not None:
+            self.controller.blockSignals(True)
+            self.controller.deleteLater()
+            self.controller = None
+        self._chars = {}
+        self._link = LinkParams()
+
+    def discover_services(self) -> None:
+        if self.controller is not None:
+            self.controller.discoverServices()
+
+    def open_service(self, skip_values: bool = False) -> bool:
+        if self.controller is None: return False
+        self.service = self.controller.createServiceObject(SVC_UUID, self)
+        if self.service is None:
+            return False
+        self.service.stateChanged.connect(self._on_service_state)
+        self.service.errorOccurred.connect(lambda err: self.errorOccurred.emit(f"Service error: {err}"))
+        self.service.characteristicWritten.connect(
+            lambda ch, value: self.characteristicWritten.emit(ch.uuid(), value.data()))
+        self.service.characteristicChanged.connect(
+            lambda ch, value: self.characteristicChanged.emit(ch.uuid(), value.data()))
+        self.service.characteristicRead.connect(
+            lambda ch, value: self.characteristicRead.emit(ch.uuid(), value.data()))
+        self.service.discoverDetails(QLowEnergyService.DiscoveryMode.SkipValueDiscovery if skip_values
+                                     else QLowEnergyService.DiscoveryMode.FullDiscovery)
+        return True
+
+    def characteristics(self) -> Dict[str, int]:
+        return {uuid: int(ch.properties().value) for uuid, ch in self._chars.items()}
+
+    def write(self, uuid: QBluetoothUuid, data: bytes, with_response: bool = True) -> None:
+        ch = self._chars.get(uuid.toString())
+        if self.service is None or ch is None: return
+        self.service.writeCharacteristic(ch, QByteArray(data),
+                                         QLowEnergyService.WriteMode.WriteWithResponse if with_response
+                                         else QLowEnergyService.WriteMode.WriteWithoutResponse)
+
+    def read(self, uuid: QBluetoothUuid) -> None:
+        ch = self._chars.get(uuid.toString())
+        if self.service is not None and ch is not None:
+            self.service.readCharacteristic(ch)
+
+    def enable_notifications(self, uuid: QBluetoothUuid) -> bool:
+        ch = self._chars.get(uuid.toString())
+        if self.service is None or ch is None or not (ch.properties() & QLowEnergyCharacteristic.PropertyType.Notify):
+            return False
+        desc = ch.descriptor(QBluetoothUuid.DescriptorType.ClientCharacteristicConfiguration)
+        if not desc.isValid():
+            return False
+        if desc.value().data() != CCCD_NOTIFY:
+            self.service.writeDescriptor(desc, QByteArray(CCCD_NOTIFY))
+        return True
+
+    def mtu(self) -> int:
+        return self.controller.mtu() if self.controller is not None else DEFAULT_MTU
+
+    # Honoured by BlueZ and Android; other backends keep the parameters the OS picked
+    def request_connection_update(self, profile: ConnectionProfile = BULK_PROFILE) -> bool:
+        if self.controller is None: return False
+        params = QLowEnergyConnectionParameters()
+        params.setIntervalRange(profile.min_interval_ms, profile.max_interval_ms)
+        params.setLatency(profile.latency)
+        params.setSupervisionTimeout(profile.supervision_timeout_ms)
+        self.controller.requestConnectionUpdate(params)
+        return True
+
+    @Slot(QLowEnergyConnectionParameters)
+    def _on_connection_updated(self, params: QLowEnergyConnectionParameters) -> None:
+        self._set_link(interval_ms=params.maximumInterval(), latency=params.latency(),
+                       supervision_timeout_ms=params.supervisionTimeout())
+
+    def error_string(self) -> str:
+        return self.controller.errorString() if self.controller is not None else ""
+
+    @Slot(QLowEnergyController.Error)
+    def _on_ctl_error(self, err: QLowEnergyController.Error) -> None:
+        # A dropped link also arrives as disconnected, which the caller may answer with a reconnect;
+        # a connect that fails is reported, and a caller that is reconnecting counts it as one attempt
+        if err == QLowEnergyController.Error.RemoteHostClosedError: return
+        self.errorOccurred.emit(f"Controller error: {self.error_string()}")
+
+    @Slot(QLowEnergyService.ServiceState)
+    def _on_service_state(self, state: QLowEnergyService.ServiceState) -> None:
+        if state != QLowEnergyService.ServiceState.ServiceDiscovered or self.service is None: return
+        self._chars = {ch.uuid().toString(): ch for ch in self.service.characteristics()}
+        self.serviceReady.emit()
@@ -19,17 +19,26 @@
 
 from __future__ import annotations
 import os, sys
-from PySide6.QtCore import QRegularExpression
+from PySide6.QtCore import QRegularExpression, QStandardPaths
 from PySide6.QtGui import QRegularExpressionValidator
 
+from sensor_config import IPV4_PATTERN
+
 def make_ip_validator() -> QRegularExpressionValidator:
-    rx = QRegularExpression(r"^(\d{1,3}\.){3}\d{1,3}$")
+    rx = QRegularExpression(IPV4_PATTERN)
     return QRegularExpressionValidator(rx)
 
 def resource_path(name: str) -> str:
     base = getattr(sys, "_MEIPASS", os.path.abspath(""))
     return os.path.join(base, name)
 
+def app_data_path(name: str) -> str:
+    # Per-user data file, e.g. ~/.local/share/EnvDataMqtt_Setup/<name> or %LOCALAPPDATA%\EnvDataMqtt_Setup\<name>
+    base = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.GenericDataLocation)
+    folder = os.path.join(base or os.path.expanduser("~"), "EnvDataMqtt_Setup")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name)
+
 def set_app_user_model_id(app_id: str) -> None:
     if sys.platform != "win32":
         return
@@ -0,0 +1,263 @@
+#  Copyright (c) 2025. Andrew Kevin Bailey
+#  This code, firmware, and software is released under the MIT License (http://opensource.org/licenses/MIT).
+#
+#  The MIT License (MIT)
+#  Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+#  documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+#  the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+#  and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all copies or significant portions of
+#  the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING
+#  BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+#  NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+#  CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+#  ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+#  SOFTWARE.
+
+# Payload encodings for DATA_UUID.
+#
+#   JSON     the original ConfigForm.build_json() text, always supported.
+#   Compact  TLV_MAGIC followed by <varint tag><varint len><value> records. Ints are varints,
+#            IPv4 addresses are 4 raw bytes and empty fields are left out entirely. The firmware
+#            decodes an absent field the same way as an empty string / default in JSON.
+#
+# The magic prefix can never start a JSON document, so the firmware can also tell the two apart
+# on a plain (unframed) write.
+#
+# A payload flagged with FLAG_PATCH holds only the changed fields (config_delta.py); the firmware
+# merges it into its stored config. In a compact patch, cleared fields are sent with length 0.
+#
+# On top of either encoding the whole payload may be zlib-compressed; framed transfers flag this
+# with FLAG_DEFLATE in BEGIN, plain writes are recognized by the zlib header byte (0x78).
+# With the compact encoding the CA certificate can also travel as DER instead of PEM text, or as
+# just its SHA-256 fingerprint when the device reports (CTRL CERT, framing.py) that it already
+# holds that certificate.
+
+from __future__ import annotations
+import json, zlib
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from cert_store import CertStore
+from cert_utils import der_to_pem, pem_to_der
+from sensor_config import DEFAULT_CONFIG, STATIC_IP_KEYS
+
+ENC_JSON    = 0x0
+ENC_COMPACT = 0x1
+
+# BEGIN flags: low nibble is the encoding, high nibble holds modifiers
+ENCODING_MASK = 0x0F
+FLAG_DEFLATE  = 0x10
+FLAG_PATCH    = 0x20
+
+# Capability bits exchanged in HELLO/CAPS (see framing.py)
+CAP_JSON     = 1 << ENC_JSON
+CAP_COMPACT  = 1 << ENC_COMPACT
+CAP_DER_CERT = 1 << 4
+CAP_DEFLATE  = 1 << 5
+CAP_PATCH    = 1 << 6
+CAP_VERIFY   = 1 << 7      # framed FLAG_STREAM transfers with VERIFY (framing.py)
+CAP_RESUME   = 1 << 8      # framed FLAG_RESUME after a reconnect (framing.py)
+CAP_CERT_REF = 1 << 9      # CTRL CERT query and the caCertificateRef field
+SUPPORTED_CAPS = (CAP_JSON | CAP_COMPACT | CAP_DER_CERT | CAP_DEFLATE | CAP_PATCH | CAP_VERIFY | CAP_RESUME
+                  | CAP_CERT_REF)
+
+ENCODING_NAMES = {ENC_JSON: "JSON", ENC_COMPACT: "compact"}
+
+# User-facing choices: "auto" negotiates over CTRL_UUID and falls back to JSON
+ENCODING_MODES = ("json", "compact", "auto")
+
+ZLIB_HEADER = 0x78
+
+TLV_MAGIC = b"\xED\x01"
+
+# Tags are part of the wire format: never renumber, only append
+FIELD_TAGS: Dict[str, int] = {
+    "blePasskey": 1,
+    "localIp": 2,
+    "subnet": 3,
+    "dns1Ip": 4,
+    "dns2Ip": 5,
+    "gatewayIp": 6,
+    "wifiSsid": 7,
+    "wifiPassword": 8,
+    "sensorId": 9,
+    "configName": 10,
+    "httpConfigURL": 11,
+    "mqttServer": 12,
+    "mqttPort": 13,
+    "mqttUsername": 14,
+    "mqttPassword": 15,
+    "mqttTopic": 16,
+    "caCertificate": 17,
+    "caCertificateDer": 18,     # same field as caCertificate, sent as DER bytes
+    "caCertificateRef": 19,     # same field again, as the fingerprint of a certificate the device holds
+}
+_TAG_FIELDS = {tag: key for key, tag in FIELD_TAGS.items()}
+_INT_FIELDS = frozenset(k for k, v in DEFAULT_CONFIG.items() if isinstance(v, int))
+_IP_FIELDS = frozenset(STATIC_IP_KEYS)
+
+def _varint(n: int) -> bytes:
+    if n < 0:
+        raise ValueError(f"Cannot encode negative value {n}.")
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    n = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ValueError("Truncated varint.")
+        b = buf[pos]; pos += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, pos
+        shift += 7
+
+def pack_ipv4(text: str) -> bytes:
+    parts = text.split(".")
+    if len(parts) != 4 or not all(p.isdigit() and int(p) <= 255 for p in parts):
+        raise ValueError(f"Invalid IPv4 address: '{text}'")
+    return bytes(int(p) for p in parts)
+
+def unpack_ipv4(raw: bytes) -> str:
+    if len(raw) != 4:
+        raise ValueError(f"IPv4 field has {len(raw)} bytes.")
+    return ".".join(str(b) for b in raw)
+
+class TransferOptions(NamedTuple):
+    framed: bool = False        # chunked transfer (framing.py) instead of a single long write
+    window: int = 8             # unacknowledged chunks in flight when framed
+    encoding: str = "json"      # one of ENCODING_MODES
+    der_cert: bool = False      # compact only: send the CA certificate as DER
+    deflate: bool = False       # zlib-compress the encoded payload when it gets smaller
+    delta: bool = False         # framed only: send just the fields that differ from the device
+    wait_for: str = "applied"   # status the firmware must report before a device counts as done (status_monitor.py)
+    verify: bool = False        # framed only: stream without ACKs and verify digests before COMMIT
+    cert_ref: bool = False      # compact only: send the CA certificate's fingerprint if the device holds it
+
+    def needs_caps(self) -> bool:
+        return self.encoding == "auto" or self.delta or self.verify or self.cert_ref
+
+# Applies the device's CAPS: "auto" becomes a concrete encoding, der_cert and deflate then mean
+# "use if the device supports it", and delta, verify and cert_ref are dropped for firmware without them
+def resolve_options(options: TransferOptions, device_caps: int) -> TransferOptions:
+    options = options._replace(delta=options.delta and bool(device_caps & CAP_PATCH),
+                               verify=options.verify and bool(device_caps & CAP_VERIFY),
+                               cert_ref=options.cert_ref and bool(device_caps & CAP_CERT_REF))
+    if options.encoding == "auto":
+        compact = bool(device_caps & CAP_COMPACT)
+        options = options._replace(encoding="compact" if compact else "json",
+                                   der_cert=options.der_cert and compact and bool(device_caps & CAP_DER_CERT),
+                                   deflate=options.deflate and bool(device_caps & CAP_DEFLATE))
+    # Only the compact encoding has a field for the fingerprint
+    return options._replace(cert_ref=options.cert_ref and options.encoding == "compact")
+
+# `certs` (a CertStore shared by a batch) saves parsing the same CA certificate for every device
+def encode_compact(payload: Dict[str, Any], der_cert: bool = False, patch: bool = False,
+                   certs: Optional[CertStore] = None) -> bytes:
+    out = bytearray(TLV_MAGIC)
+    for key, tag in FIELD_TAGS.items():
+        value = payload.get(key)
+        if key == "caCertificateDer" or value is None:
+            continue
+        if value == "":
+            if patch and key in payload:
+                out += _varint(tag) + _varint(0)
+            continue
+        if key == "caCertificate" and der_cert:
+            der = certs.der_of(str(value)) if certs is not None else pem_to_der(str(value))
+            key, tag, raw = "caCertificateDer", FIELD_TAGS["caCertificateDer"], der
+        elif key == "caCertificateRef":
+            raw = bytes(value)
+        elif key in _INT_FIELDS:
+            raw = _varint(int(value))
+        elif key in _IP_FIELDS:
+            raw = pack_ipv4(str(value))
+        else:
+            raw = str(value).encode("utf-8")
+        out += _varint(tag) + _varint(len(raw)) + raw
+    return bytes(out)
+
+def decode_compact(buf: bytes, patch: bool = False) -> Dict[str, Any]:
+    if not buf.startswith(TLV_MAGIC):
+        raise ValueError("Not a compact payload.")
+    d: Dict[str, Any] = {} if patch else dict(DEFAULT_CONFIG)
+    pos = len(TLV_MAGIC)
+    while pos < len(buf):
+        tag, pos = _read_varint(buf, pos)
+        size, pos = _read_varint(buf, pos)
+        raw = buf[pos:pos + size]
+        if len(raw) != size:
+            raise ValueError("Truncated field.")
+        pos += size
+        key = _TAG_FIELDS.get(tag)
+        if key is None:
+            continue    # newer field, skip like the firmware does
+        if not raw:
+            d["caCertificate" if key in ("caCertificateDer", "caCertificateRef") else key] = ""
+        elif key == "caCertificateDer":
+            d["caCertificate"] = der_to_pem(raw)
+        elif key == "caCertificateRef":
+            d[key] = bytes(raw)     # resolved by whoever holds the certificates
+        elif key in _INT_FIELDS:
+            d[key] = _read_varint(raw, 0)[0]
+        elif key in _IP_FIELDS:
+            d[key] = unpack_ipv4(raw)
+        else:
+            d[key] = raw.decode("utf-8")
+    return d
+
+def encode_payload(payload: Dict[str, Any], encoding: int = ENC_JSON) -> bytes:
+    if encoding == ENC_COMPACT:
+        return encode_compact(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def decode_payload(buf: bytes, patch: bool = False) -> Dict[str, Any]:
+    if buf.startswith(TLV_MAGIC):
+        return decode_compact(buf, patch)
+    return json.loads(buf.decode("utf-8"))
+
+# Encodes a resolved TransferOptions; returns the bytes for DATA_UUID and the BEGIN flags.
+# With patch=True, payload holds only the changed fields.
+def pack_payload(payload: Dict[str, Any], options: TransferOptions, patch: bool = False,
+                 certs: Optional[CertStore] = None) -> Tuple[bytes, int]:
+    if options.encoding == "auto":
+        raise ValueError("Resolve 'auto' encoding before packing the payload.")
+    encoding = ENC_COMPACT if options.encoding == "compact" else ENC_JSON
+    if options.der_cert and encoding != ENC_COMPACT:
+        raise ValueError("Sending the CA certificate as DER needs the compact encoding.")
+    if patch and not options.framed:
+        raise ValueError("Delta pushes need the framed transfer.")
+    if "caCertificateRef" in payload and encoding != ENC_COMPACT:
+        raise ValueError("Sending the CA certificate by fingerprint needs the compact encoding.")
+
+    if encoding == ENC_COMPACT:
+        data = encode_compact(payload, options.der_cert, patch, certs)
+    else:
+        data = encode_payload(payload)
+    flags = encoding | (FLAG_PATCH if patch else 0)
+    if options.deflate:
+        packed = zlib.compress(data, 9)
+        if len(packed) < len(data):
+            data, flags = packed, flags | FLAG_DEFLATE
+    return data, flags
+
+def unpack_payload(buf: bytes, flags: Optional[int] = None) -> Dict[str, Any]:
+    deflated = bool(flags & FLAG_DEFLATE) if flags is not None else buf[:1] == bytes((ZLIB_HEADER,))
+    patch = flags is not None and bool(flags & FLAG_PATCH)
+    return decode_payload(zlib.decompress(buf) if deflated else buf, patch)
+
+def describe_flags(flags: int) -> str:
+    name = ENCODING_NAMES.get(flags & ENCODING_MASK, f"encoding {flags & ENCODING_MASK}")
+    return (name + (" patch" if flags & FLAG_PATCH else "")
+            + (" + deflate" if flags & FLAG_DEFLATE else ""))
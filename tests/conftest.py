@@ -0,0 +1,21 @@
+import os, sys, pathlib
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "tests"))
+
+import pytest
+from PySide6.QtWidgets import QApplication
+
+# A QApplication so the MainWindow tests can create widgets; offscreen needs no display
+@pytest.fixture(scope="session", autouse=True)
+def qapp() -> QApplication:
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture(autouse=True)
+def app_data(tmp_path, monkeypatch):
+    # GattCache, the registry and the log write below app_data_path(); keep them out of $HOME
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("APPDATA", str(tmp_path))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path))
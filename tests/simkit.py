@@ -0,0 +1,51 @@
+# Helpers for driving the Qt signal code against the simulated sensor from plain pytest tests
+import pathlib
+from typing import Any, Dict, List, Optional, Tuple
+from PySide6.QtCore import QEventLoop, QTimer, SignalInstance
+
+from ble_session import ProvisionSession
+from reconnect import Backoff
+from sensor_config import DEFAULT_CONFIG, build_payload
+from sim_peripheral import SimLink, SimulatedPeripheral, SimulatedTransport
+from wire_codec import TransferOptions
+
+CA_PEM = (pathlib.Path(__file__).parent / "data" / "ca.pem").read_text()
+
+# Short delays so a whole session takes a few milliseconds
+FAST = SimLink(latency_ms=1.0, packet_ms=0.05, connect_ms=1.0, join_ms=20.0, mqtt_ms=10.0, seed=1)
+
+def payload(**overrides: Any) -> Dict[str, Any]:
+    return build_payload({**DEFAULT_CONFIG, "sensorId": "sim-1", "configName": "test",
+                          "wifiSsid": "lab", "wifiPassword": "secret-pass", "mqttServer": "broker.local",
+                          "mqttTopic": "sensors/sim-1", **overrides})
+
+def sim(link: SimLink = FAST, address: str = "5E:00:00:00:00:01",
+        peripheral: Optional[SimulatedPeripheral] = None) -> SimulatedTransport:
+    return SimulatedTransport(peripheral or SimulatedPeripheral(caps=link.caps), link, address)
+
+# Runs the Qt event loop until `signal` fires; returns its arguments
+def wait_signal(signal: SignalInstance, timeout_ms: int = 10000) -> Tuple[Any, ...]:
+    loop = QEventLoop()
+    got: List[Tuple[Any, ...]] = []
+
+    def on_signal(*args: Any) -> None:
+        got.append(args)
+        loop.quit()
+    signal.connect(on_signal)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    try:
+        loop.exec()
+    finally:
+        signal.disconnect(on_signal)
+    assert got, f"signal not emitted within {timeout_ms} ms"
+    return got[0]
+
+def provision(transport: SimulatedTransport, config: Dict[str, Any],
+              options: TransferOptions = TransferOptions(), timeout_ms: int = 5000,
+              backoff: Optional[Backoff] = None, **kwargs: Any) -> Tuple[bool, str, ProvisionSession]:
+    session = ProvisionSession(transport, config, timeout_ms, options, **kwargs)
+    if backoff is not None:
+        session.backoff = backoff
+    QTimer.singleShot(0, session.start)
+    _address, ok, msg = wait_signal(session.finished, timeout_ms + 2000)
+    return ok, msg, session
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+import async_ble
+import status_monitor
+from async_ble import AsyncLink, LinkError
+from constants import DATA_UUID
+from sensor_config import build_json
+from simkit import FAST, payload, sim
+
+def test_watch_status_subscribes_before_the_write():
+    async def main():
+        t = sim(FAST)
+        async with AsyncLink(t, timeout=5.0) as link:
+            await link.discover()
+            status = link.watch_status("mqtt")
+            await link.write(DATA_UUID, build_json(payload()).encode())
+            return await status, t
+    msg, t = async_ble.run(main())
+    assert "MQTT" in msg
+    assert t.peripheral.config == payload()
+
+def test_status_timeout_none_waits_past_link_and_stage_timeouts(monkeypatch):
+    monkeypatch.setitem(status_monitor.STAGE_TIMEOUT_MS, status_monitor.EV_WIFI, 50)
+    async def main():
+        link = AsyncLink(sim(FAST._replace(join_ms=300)), timeout=0.1)
+        await link.connect(timeout=5.0)
+        await link.discover(timeout=5.0)
+        status = link.watch_status("wifi", timeout=None)
+        await link.write(DATA_UUID, build_json(payload()).encode(), timeout=5.0)
+        return await status
+    assert "WIFI" in async_ble.run(main())
+
+def test_link_timeout_applies_by_default():
+    async def main():
+        link = AsyncLink(sim(FAST._replace(connect_ms=2000)), timeout=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await link.connect()
+        with pytest.raises(LinkError):
+            link.watch_status()
+    async_ble.run(main())
+
+def test_stage_timeouts_apply_with_a_finite_timeout(monkeypatch):
+    monkeypatch.setitem(status_monitor.STAGE_TIMEOUT_MS, status_monitor.EV_WIFI, 50)
+
+    async def main():
+        link = AsyncLink(sim(FAST._replace(join_ms=300)), timeout=5.0)
+        await link.connect()
+        await link.discover()
+        status = link.watch_status("wifi")
+        await link.write(DATA_UUID, build_json(payload()).encode())
+        with pytest.raises(LinkError):
+            await status
+    async_ble.run(main())
+
+def test_cancelled_connect_drops_the_attempt():
+    async def main():
+        t = sim(FAST._replace(connect_ms=100))
+        link = AsyncLink(t, timeout=5.0)
+        task = asyncio.ensure_future(link.connect())
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.2)
+        return t
+    assert not async_ble.run(main())._connected
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from config_bundle import BundleError, ConfigBundle
+from simkit import payload
+
+@pytest.fixture
+def bundle(tmp_path):
+    with ConfigBundle(str(tmp_path / "fleet.cfgdb")) as b:
+        yield b
+
+def test_put_and_get(bundle):
+    keys = bundle.put([payload(sensorId=f"s-{i}") for i in range(3)])
+    assert keys == [(f"s-{i}", "test") for i in range(3)]
+    assert bundle.get("s-1", "test") == payload(sensorId="s-1")
+    assert bundle.config_names("s-2") == ["test"]
+
+def test_invalid_config_rolls_back_whole_put(bundle):
+    bundle.BATCH = 2
+    configs = [payload(sensorId=f"s-{i}") for i in range(5)] + [{**payload(), "mqttPort": 0}]
+    with pytest.raises(BundleError, match="Config #6"):
+        bundle.put(configs)
+    assert len(bundle) == 0
+
+@pytest.mark.parametrize("content", ["[1, 2]", "\"text\"", "{"])
+def test_import_rejects_non_object_json(bundle, tmp_path, content):
+    path = tmp_path / "config.json"
+    path.write_text(content)
+    with pytest.raises(BundleError):
+        bundle.import_file(str(path))
+
+def test_export_import_round_trip(bundle, tmp_path):
+    bundle.put([payload(sensorId=f"s-{i}") for i in range(4)])
+    out = tmp_path / "fleet.jsonl"
+    assert bundle.export(str(out)) == 4
+    assert json.loads(out.read_text().splitlines()[0]) == payload(sensorId="s-0")
+    with ConfigBundle(str(tmp_path / "copy.cfgdb")) as copy:
+        assert copy.import_file(str(out)) == 4
+        assert list(copy.keys()) == list(bundle.keys())
@@ -0,0 +1,14 @@
+from config_delta import ALWAYS_SENT, config_digests, diff_config, digests_frame, parse_digests_frame
+from simkit import payload
+
+def test_digests_frame_leaves_out_passwords():
+    digests = parse_digests_frame(digests_frame(payload()))
+    assert digests == config_digests(payload())
+    assert not set(ALWAYS_SENT) & set(digests)
+
+def test_delta_always_sends_passwords():
+    stored = payload()
+    digests = parse_digests_frame(digests_frame(stored))
+    assert diff_config(stored, digests) == {key: stored[key] for key in ALWAYS_SENT}
+    changed = payload(mqttTopic="sensors/moved")
+    assert set(diff_config(changed, digests)) == {"mqttTopic", *ALWAYS_SENT}
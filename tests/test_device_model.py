@@ -0,0 +1,75 @@
+from PySide6.QtBluetooth import QBluetoothAddress, QBluetoothDeviceInfo
+from PySide6.QtCore import Qt
+
+from constants import SVC_UUID
+from device_model import NO_RSSI, DeviceFilterProxy, DeviceListModel
+from simkit import wait_signal
+
+def info(address, name="", rssi=0, service=False):
+    i = QBluetoothDeviceInfo(QBluetoothAddress(address), name, 0)
+    if rssi:
+        i.setRssi(rssi)
+    if service:
+        i.setServiceUuids([SVC_UUID])
+    return i
+
+def proxied(model):
+    proxy = DeviceFilterProxy()
+    proxy.setSourceModel(model)
+    proxy.sort(0, Qt.SortOrder.DescendingOrder)
+    return proxy
+
+def addresses(proxy):
+    return [proxy.index(row, 0).data(DeviceListModel.AddressRole) for row in range(proxy.rowCount())]
+
+def test_upsert_inserts_once_and_merges_updates():
+    model = DeviceListModel()
+    assert model.upsert(info("AA:00:00:00:00:01", "env-1", -70))
+    assert not model.upsert(info("AA:00:00:00:00:01", "", -50, service=True))
+    assert model.rowCount() == 1
+    rec = model.record(0)
+    assert (rec.name, rec.rssi, rec.has_service) == ("env-1", -50, True)
+    assert model.target_count() == 1
+    # A later packet without the service UUID or name keeps what is known
+    model.upsert(info("AA:00:00:00:00:01"))
+    assert (rec.name, rec.rssi, rec.has_service) == ("env-1", -50, True)
+    assert model.target_count() == 1
+
+def test_updates_are_coalesced_into_one_data_changed():
+    model = DeviceListModel()
+    for n in range(3):
+        model.upsert(info(f"AA:00:00:00:00:0{n}", rssi=-80))
+    changed = []
+    model.dataChanged.connect(lambda top, bottom: changed.append((top.row(), bottom.row())))
+    model.upsert(info("AA:00:00:00:00:02", rssi=-60))
+    model.upsert(info("AA:00:00:00:00:00", rssi=-60))
+    wait_signal(model.dataChanged, 2000)
+    assert changed == [(0, 2)]
+
+def test_proxy_sorts_by_rssi_and_filters():
+    model = DeviceListModel()
+    proxy = proxied(model)
+    model.upsert(info("AA:00:00:00:00:01", "env-a", -80, service=True))
+    model.upsert(info("AA:00:00:00:00:02", "other", -40))
+    model.upsert(info("AA:00:00:00:00:03", "env-b"))
+    assert addresses(proxy) == ["AA:00:00:00:00:02", "AA:00:00:00:00:01", "AA:00:00:00:00:03"]
+    assert model.record(2).rssi == NO_RSSI
+
+    model.upsert(info("AA:00:00:00:00:03", rssi=-30))
+    wait_signal(model.dataChanged, 2000)
+    assert addresses(proxy)[0] == "AA:00:00:00:00:03"
+
+    proxy.set_text(" ENV ")
+    assert addresses(proxy) == ["AA:00:00:00:00:03", "AA:00:00:00:00:01"]
+    proxy.set_target_only(True)
+    assert addresses(proxy) == ["AA:00:00:00:00:01"]
+    proxy.set_text("")
+    proxy.set_target_only(False)
+    assert len(addresses(proxy)) == 3
+
+def test_clear_resets_rows_and_targets():
+    model = DeviceListModel()
+    model.upsert(info("AA:00:00:00:00:01", service=True))
+    model.clear()
+    assert model.rowCount() == 0 and model.target_count() == 0
+    assert model.upsert(info("AA:00:00:00:00:01"))
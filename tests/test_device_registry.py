@@ -0,0 +1,47 @@
+import json
+import time
+
+from device_registry import DeviceRegistry
+
+def test_record_merges_and_persists(tmp_path):
+    path = str(tmp_path / "devices.json")
+    registry = DeviceRegistry(path)
+    registry.record("aa:00:00:00:00:01", "env-1", -70)
+    registry.record("AA:00:00:00:00:01", "", 0)     # a packet without name or RSSI keeps both
+    registry.record("AA:00:00:00:00:02", "env-2", -50)
+    assert registry.get("AA:00:00:00:00:01")["name"] == "env-1"
+    assert registry.get("aa:00:00:00:00:01")["rssi"] == -70
+    registry.save()
+
+    loaded = DeviceRegistry(path)
+    assert len(loaded) == 2
+    assert "aa:00:00:00:00:02" in loaded
+    loaded.forget("AA:00:00:00:00:02")
+    loaded.save()
+    assert list(json.loads((tmp_path / "devices.json").read_text())) == ["AA:00:00:00:00:01"]
+
+def test_entries_most_recent_first(tmp_path):
+    path = tmp_path / "devices.json"
+    now = int(time.time())
+    path.write_text(json.dumps({"AA:00:00:00:00:01": {"name": "old", "rssi": None, "lastSeen": now - 60},
+                                "AA:00:00:00:00:02": {"name": "new", "rssi": None, "lastSeen": now}}))
+    assert [e["name"] for e in DeviceRegistry(str(path)).entries()] == ["new", "old"]
+
+def test_stale_and_malformed_entries_expire_on_load(tmp_path):
+    path = tmp_path / "devices.json"
+    old = time.time() - (DeviceRegistry.MAX_AGE_DAYS + 1) * 86400
+    path.write_text(json.dumps({"AA:00:00:00:00:01": {"name": "gone", "lastSeen": old},
+                                "AA:00:00:00:00:02": {"name": "kept", "lastSeen": time.time()},
+                                "AA:00:00:00:00:03": "junk"}))
+    registry = DeviceRegistry(str(path))
+    assert [e["name"] for e in registry.entries()] == ["kept"]
+    registry.save()
+    assert list(json.loads(path.read_text())) == ["AA:00:00:00:00:02"]
+
+def test_unreadable_file_starts_empty_and_save_is_lazy(tmp_path):
+    path = tmp_path / "devices.json"
+    path.write_text("{not json")
+    registry = DeviceRegistry(str(path))
+    assert len(registry) == 0
+    registry.save()
+    assert path.read_text() == "{not json"
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from fleet_manifest import FleetManifest, ManifestError
+from simkit import payload
+
+BASE = {**payload(), "mqttTopic": "sensors/{site}/{sensorId}", "wifiPassword": "p{a}ss{", "mqttPassword": "{x}"}
+
+def manifest(tmp_path, rows, base=BASE, name="fleet.csv"):
+    path = tmp_path / name
+    path.write_text(rows)
+    return FleetManifest(base, str(path))
+
+def test_rows_expand_templates_and_override_base(tmp_path):
+    m = manifest(tmp_path, "address,sensorId,site,mqttPort\n"
+                           "AA:00:00:00:00:01,gh-01,north,\n"
+                           "AA:00:00:00:00:02,gh-02,south,8883\n")
+    first, second = list(m)
+    assert first.payload["mqttTopic"] == "sensors/north/gh-01"
+    assert first.payload["mqttPort"] == 1883
+    assert second.payload["mqttPort"] == 8883
+    assert second.line == 3 and second.timeout_ms is None
+
+def test_braces_in_passwords_are_literal(tmp_path):
+    entry, = manifest(tmp_path, "address,site\nAA:00:00:00:00:01,north\n")
+    assert entry.payload["wifiPassword"] == "p{a}ss{"
+    assert entry.payload["mqttPassword"] == "{x}"
+
+def test_unused_column_is_reported(tmp_path):
+    m = manifest(tmp_path, "address,site,sensorID\nAA:00:00:00:00:01,north,gh-01\n")
+    with pytest.raises(ManifestError, match="Line 2 .*sensorID"):
+        list(m)
+
+def test_unknown_template_variable_is_reported(tmp_path):
+    m = manifest(tmp_path, "address,sensorId\nAA:00:00:00:00:01,gh-01\n")
+    with pytest.raises(ManifestError, match="template variable 'site'"):
+        list(m)
+
+def test_bad_template_in_base_is_rejected(tmp_path):
+    with pytest.raises(ManifestError, match="Base mqttTopic"):
+        manifest(tmp_path, "", base={**payload(), "mqttTopic": "sensors/{"})
+
+def test_jsonl_rows_and_timeouts(tmp_path):
+    rows = [{"address": "AA:00:00:00:00:01", "site": "n", "sensorId": "a", "timeout": 2.5},
+            {"address": "AA:00:00:00:00:02", "site": "s", "sensorId": "b", "timeout": None}]
+    m = manifest(tmp_path, "\n".join(json.dumps(r) for r in rows) + "\n", name="fleet.jsonl")
+    assert [e.timeout_ms for e in m] == [2500, None]
+
+def test_validate_collects_every_problem(tmp_path):
+    m = manifest(tmp_path, "address,site,sensorId,mqttPort,timeout\n"
+                           "AA:00:00:00:00:01,n,a,,\n"
+                           ",n,b,,\n"
+                           "AA:00:00:00:00:01,n,c,,\n"
+                           "AA:00:00:00:00:03,n,a,,\n"
+                           "AA:00:00:00:00:04,n,d,99999,\n"
+                           "AA:00:00:00:00:05,n,e,,0\n")
+    count, errors = m.validate()
+    assert count == 6
+    assert len(errors) == 5
+    assert "missing 'address'" in errors[0]
+    assert "duplicate address" in errors[1]
+    assert "duplicate sensorId 'a'" in errors[2]
+    assert "mqttPort" in errors[3]
+    assert "timeout must be positive" in errors[4]
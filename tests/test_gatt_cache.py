@@ -0,0 +1,33 @@
+import json
+import os
+
+from gatt_cache import GattCache
+
+LAYOUT = {"config": 0x10, "status": 0x12}
+
+def test_put_reports_changes_and_persists(tmp_path):
+    path = str(tmp_path / "gatt_cache.json")
+    cache = GattCache(path)
+    assert cache.put("aa:00:00:00:00:01", LAYOUT)
+    assert not cache.put("AA:00:00:00:00:01", LAYOUT)
+    assert cache.put("AA:00:00:00:00:01", {**LAYOUT, "status": 0x14})
+    cache.save()
+
+    loaded = GattCache(path)
+    assert loaded.get("aa:00:00:00:00:01")["characteristics"] == {**LAYOUT, "status": 0x14}
+    loaded.invalidate("AA:00:00:00:00:01")
+    loaded.save()
+    assert json.loads((tmp_path / "gatt_cache.json").read_text()) == {}
+
+def test_failed_save_is_retried(tmp_path, monkeypatch):
+    path = tmp_path / "gatt_cache.json"
+    cache = GattCache(str(path))
+    cache.put("AA:00:00:00:00:01", LAYOUT)
+    def fail(src, dst):
+        raise OSError("disk full")
+    with monkeypatch.context() as m:
+        m.setattr(os, "replace", fail)
+        cache.save()
+    assert not path.exists()
+    cache.save()
+    assert "AA:00:00:00:00:01" in json.loads(path.read_text())
@@ -0,0 +1,103 @@
+import json
+
+from job_journal import (ST_CONFIRMED, ST_CONNECTING, ST_FAILED, ST_PENDING, ST_WRITTEN, JobJournal,
+                         payload_digest)
+from scheduler import ProvisionJob
+from simkit import FAST, payload
+from test_scheduler import run
+
+A = "5E:00:00:00:00:01"
+B = "5E:00:00:00:00:02"
+
+def test_replay_keeps_last_state_per_device(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    journal = JobJournal(path)
+    journal.record(A, ST_CONNECTING, payload())
+    journal.record(A, ST_CONFIRMED, payload())
+    journal.record(B.lower(), ST_FAILED, payload(), "Timed out.")
+    journal.close()
+    journal = JobJournal(path)
+    assert dict(journal) == {A: ST_CONFIRMED, B: ST_FAILED}
+    assert journal.is_confirmed(A.lower(), payload())
+    assert not journal.is_confirmed(A, payload(mqttTopic="other"))
+    journal.close()
+
+def test_torn_last_line_is_cut_off(tmp_path):
+    path = tmp_path / "j.jsonl"
+    journal = JobJournal(str(path))
+    journal.record(A, ST_CONFIRMED, payload())
+    journal.close()
+    good = path.read_bytes()
+    path.write_bytes(good + b'{"address": "5E:00:00:00:00:02", "sta')
+    journal = JobJournal(str(path))
+    assert dict(journal) == {A: ST_CONFIRMED}
+    journal.close()
+    assert path.read_bytes() == good
+
+def test_corrupt_middle_lines_are_skipped(tmp_path):
+    path = tmp_path / "j.jsonl"
+    confirmed = json.dumps({"address": B, "state": ST_CONFIRMED, "config": payload_digest(payload()), "t": 1})
+    path.write_text(f"garbage\n[1, 2]\n{{\"state\": \"confirmed\"}}\n{confirmed}\n")
+    journal = JobJournal(str(path))
+    assert journal.skipped_lines == 3
+    assert dict(journal) == {B: ST_CONFIRMED}
+    journal.close()
+    assert path.read_text().endswith(confirmed + "\n")
+
+def test_pending_does_not_hide_running_session(tmp_path):
+    journal = JobJournal(str(tmp_path / "j.jsonl"))
+    journal.record(A, ST_CONNECTING, payload())
+    journal.record(A, ST_PENDING, payload(mqttTopic="second"))
+    journal.record(A, ST_CONFIRMED, payload())
+    assert journal.is_confirmed(A, payload())
+    journal.close()
+
+def test_long_journal_is_compacted_on_open(tmp_path):
+    path = tmp_path / "j.jsonl"
+    journal = JobJournal(str(path))
+    for _ in range(10):
+        journal.record(A, ST_CONNECTING, payload())
+        journal.record(A, ST_FAILED, payload())
+    journal.close()
+    journal = JobJournal(str(path))
+    journal.close()
+    assert len(path.read_text().splitlines()) == 1
+    assert dict(JobJournal(str(path))) == {A: ST_FAILED}
+
+def test_resume_skips_confirmed_devices(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    jobs = [ProvisionJob(A, payload()), ProvisionJob(A, payload(mqttTopic="second")), ProvisionJob(B, payload())]
+    journal = JobJournal(path)
+    scheduler, _ = run(jobs, journal=journal)
+    journal.close()
+    assert all(r["ok"] for r in scheduler.results)
+    journal = JobJournal(path)
+    assert journal.is_confirmed(A, payload(mqttTopic="second"))
+    scheduler, active = run(jobs[1:], journal=journal)
+    journal.close()
+    assert scheduler.skipped == 2
+    assert active == []
+
+def test_unacknowledged_write_is_journaled_as_written(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    journal = JobJournal(path)
+    scheduler, _ = run([ProvisionJob(A, payload())], journal=journal,
+                       link=FAST._replace(mtu=517, write_response=False, notify=False))
+    journal.close()
+    assert scheduler.results[0]["message"] == "Write requested (unconfirmed)."
+    journal = JobJournal(path)
+    assert journal.state(A) == ST_WRITTEN
+    assert not journal.is_confirmed(A, payload())
+    journal.close()
+
+def test_invalid_timeout_is_journaled_as_failed(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    journal = JobJournal(path)
+    scheduler, active = run([ProvisionJob(A, payload(), 0), ProvisionJob(B, payload())], journal=journal)
+    journal.close()
+    assert active == [0]
+    assert scheduler.results[0]["message"] == "Invalid timeout: 0 ms."
+    journal = JobJournal(path)
+    assert journal.state(A) == ST_FAILED
+    assert journal.state(B) == ST_CONFIRMED
+    journal.close()
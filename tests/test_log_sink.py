@@ -0,0 +1,40 @@
+from PySide6.QtWidgets import QPlainTextEdit
+
+from log_sink import LogSink
+
+def test_close_flushes_widget_and_file(tmp_path):
+    path = tmp_path / "app.log"
+    widget = QPlainTextEdit()
+    sink = LogSink(widget, str(path))
+    for n in range(50):
+        sink.write(f"line {n}")
+    sink.close()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 50
+    assert lines[-1].endswith(" line 49")
+    assert widget.toPlainText().splitlines() == [f"line {n}" for n in range(50)]
+
+def test_file_rotates_at_max_bytes(tmp_path, monkeypatch):
+    monkeypatch.setattr(LogSink, "MAX_BYTES", 1000)
+    monkeypatch.setattr(LogSink, "BACKUPS", 2)
+    path = tmp_path / "app.log"
+    sink = LogSink(QPlainTextEdit(), str(path))
+    for n in range(200):
+        sink.write(f"line {n:03d} " + "x" * 20)
+    sink.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["app.log", "app.log.1", "app.log.2"]
+    assert all(p.stat().st_size <= 1000 for p in tmp_path.iterdir())
+    assert path.read_text().splitlines()[-1].endswith("line 199 " + "x" * 20)
+
+def test_burst_beyond_capacity_is_summarized_in_widget(tmp_path, monkeypatch):
+    monkeypatch.setattr(LogSink, "CAPACITY", 10)
+    path = tmp_path / "app.log"
+    widget = QPlainTextEdit()
+    sink = LogSink(widget, str(path))
+    for n in range(25):
+        sink.write(f"line {n}")
+    sink.close()
+    shown = widget.toPlainText().splitlines()
+    assert shown[0] == f"… 15 lines skipped, see {path}"
+    assert shown[1:] == [f"line {n}" for n in range(15, 25)]
+    assert len(path.read_text().splitlines()) == 25
@@ -0,0 +1,70 @@
+import pytest
+from PySide6.QtCore import QEventLoop, QTimer
+
+from reconnect import Backoff
+from simkit import CA_PEM, FAST, payload, sim
+
+def settle(ms: int) -> None:
+    loop = QEventLoop()
+    QTimer.singleShot(ms, loop.quit)
+    loop.exec()
+
+@pytest.fixture
+def window():
+    from main_window import MainWindow
+    w = MainWindow()
+    yield w
+    w.close()
+    w.deleteLater()
+
+def send_plain(window, link):
+    transport = sim(link)
+    window.connect_transport(transport)
+    settle(200)
+    window.form_widget.load_from_dict(payload())
+    window.cb_framed.setChecked(False)
+    window.on_send()
+    return transport
+
+def test_status_followed_when_subscribed(window):
+    send_plain(window, FAST._replace(join_ms=0))
+    assert window._subscribed
+    settle(100)
+    assert window.lbl_status.text() == "Device: applied"
+
+def test_no_status_tracking_without_notifications(window):
+    transport = send_plain(window, FAST._replace(notify=False))
+    settle(100)
+    assert transport.peripheral.commits == 1
+    assert not window._subscribed
+    assert not window.status.is_active()
+    assert "no status" not in window.lbl_status.text()
+
+@pytest.mark.parametrize("fails, done", [(2, True), (9, False)])
+def test_failed_reconnects_retry_framed_transfer(window, fails, done):
+    transport = sim(FAST._replace(mtu=23, drop_after=5, connect_fails=fails))
+    window.backoff = Backoff(base_ms=5, cap_ms=20)
+    window.connect_transport(transport)
+    settle(200)
+    window.form_widget.load_from_dict(payload(caCertificate=CA_PEM))
+    window.cb_framed.setChecked(True)
+    window.on_send()
+    settle(1500)
+    assert transport.peripheral.commits == (1 if done else 0)
+    assert not window._reconnecting and not window._retry_due
+    if not done:
+        assert window._interrupted is None
+
+def test_load_from_bundle_with_invalid_form(window, tmp_path, monkeypatch):
+    from config_bundle import ConfigBundle
+    from PySide6.QtWidgets import QInputDialog
+    path = str(tmp_path / "fleet.cfgdb")
+    with ConfigBundle(path) as bundle:
+        bundle.put([payload(sensorId="s-1")])
+    window.form_widget.load_from_dict(payload(sensorId="s-1"))
+    window.form_widget.te_ca_cert.setPlainText("x" * 4000)
+    asked = []
+    monkeypatch.setattr(QInputDialog, "getText", lambda *a, text="": (asked.append(text), (text, True))[1])
+    window._load_from_bundle(path)
+    assert asked == ["s-1"]
+    assert window.form_widget.to_dict() == payload(sensorId="s-1")
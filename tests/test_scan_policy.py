@@ -0,0 +1,63 @@
+import pytest
+
+from scan_policy import ScanPolicy, ScanTracker
+
+def tracker(**policy):
+    t = ScanTracker(ScanPolicy(**policy))
+    t.start(now=100.0)
+    return t
+
+def test_stops_on_address_regardless_of_case():
+    t = tracker(address="aa:00:00:00:00:02")
+    assert t.observe("AA:00:00:00:00:01", "env", True, now=100.2) is None
+    assert t.observe("AA:00:00:00:00:02", "", False, now=100.5) == "found aa:00:00:00:00:02"
+    assert t.time_to_first_target() == pytest.approx(0.2)
+
+def test_name_must_match_exactly():
+    t = tracker(name="env")
+    assert t.observe("AA:00:00:00:00:01", "env-outdoor", False, now=100.1) is None
+    assert t.observe("AA:00:00:00:00:02", "env", False, now=100.3) == "found env"
+
+def test_max_targets_counts_each_sensor_once():
+    t = tracker(max_targets=2)
+    assert t.observe("AA:00:00:00:00:01", "", True, now=100.1) is None
+    assert t.observe("aa:00:00:00:00:01", "", True, now=100.2) is None
+    assert t.observe("AA:00:00:00:00:03", "", False, now=100.3) is None
+    assert t.observe("AA:00:00:00:00:02", "", True, now=100.4) == "found 2 sensors"
+
+def test_quiet_period_runs_from_the_last_new_target():
+    t = tracker(quiet_ms=1500)
+    assert t.check_quiet(now=105.0) is None                 # nothing found yet: keep scanning
+    t.observe("AA:00:00:00:00:01", "", True, now=101.0)
+    t.observe("AA:00:00:00:00:02", "", True, now=102.0)
+    t.observe("AA:00:00:00:00:01", "", True, now=103.0)     # seen before: does not extend the quiet period
+    assert t.check_quiet(now=103.4) is None
+    assert t.check_quiet(now=103.5) == "no new sensors for 1.5 s"
+
+def test_first_stop_reason_is_kept():
+    t = tracker(max_targets=1, quiet_ms=100)
+    assert t.observe("AA:00:00:00:00:01", "", True, now=100.1) == "found 1 sensors"
+    assert t.check_quiet(now=101.0) == "found 1 sensors"
+    assert t.summary() == "first sensor after 0.10 s, 1 total, stopped: found 1 sensors"
+
+def test_default_policy_never_stops_early():
+    t = tracker()
+    for n in range(20):
+        assert t.observe(f"AA:00:00:00:00:{n:02X}", "", True, now=100.0 + n) is None
+    assert t.check_quiet(now=200.0) is None
+    assert t.policy.timeout_ms == 8000
+
+def test_picker_early_stop_ignores_filter_text(tmp_path):
+    from device_picker import DevicePicker
+    from device_registry import DeviceRegistry
+    picker = DevicePicker(registry=DeviceRegistry(str(tmp_path / "devices.json")))
+    picker.filter_edit.setText("env")
+    picker.stop_early.setChecked(False)
+    assert picker._effective_policy() == ScanPolicy()
+    picker.stop_early.setChecked(True)
+    picker.address_edit.setText(" AA:00:00:00:00:01 ")
+    assert picker._effective_policy() == ScanPolicy(address="AA:00:00:00:00:01",
+                                                    quiet_ms=DevicePicker.EARLY_STOP_QUIET_MS)
+    picker.address_edit.setText("AA:00")
+    assert picker._effective_policy().address == ""
+    picker.deleteLater()
@@ -0,0 +1,63 @@
+from PySide6.QtCore import QTimer
+
+from scheduler import ProvisionJob, ProvisionScheduler
+from simkit import FAST, payload, sim, wait_signal
+from wire_codec import TransferOptions
+
+def run(jobs, concurrency=4, link=FAST, **kwargs):
+    active = []
+    scheduler = ProvisionScheduler(jobs, concurrency, 5000, **kwargs,
+                                   transport_factory=lambda address: (active.append(scheduler.active_count()),
+                                                                      sim(link, address))[1])
+    QTimer.singleShot(0, scheduler.start)
+    wait_signal(scheduler.finished)
+    return scheduler, active
+
+def test_runs_every_job_within_concurrency():
+    jobs = [ProvisionJob(f"5E:00:00:00:00:{i:02X}", payload(sensorId=f"s{i}")) for i in range(10)]
+    scheduler, active = run(jobs, concurrency=3)
+    assert len(scheduler.results) == 10
+    assert all(r["ok"] for r in scheduler.results)
+    assert max(active) < 3
+
+def test_same_sensor_never_runs_twice_at_once():
+    jobs = [ProvisionJob("aa:bb:cc:dd:ee:01", payload()), ProvisionJob("AA:BB:CC:DD:EE:01", payload())]
+    scheduler, active = run(jobs)
+    assert active == [0, 0]
+    assert all(r["ok"] for r in scheduler.results)
+
+def test_invalid_job_timeout_fails_without_connecting():
+    scheduler, active = run([ProvisionJob("5E:00:00:00:00:01", payload(), 0)])
+    assert active == []
+    assert not scheduler.results[0]["ok"]
+
+def test_failing_job_generator_still_finishes():
+    def jobs():
+        yield ProvisionJob("5E:00:00:00:00:01", payload())
+        raise ValueError("Line 3: bad row")
+    scheduler = ProvisionScheduler(jobs(), 4, 5000, transport_factory=lambda address: sim(FAST, address))
+    errors = []
+    scheduler.jobsFailed.connect(errors.append)
+    QTimer.singleShot(0, scheduler.start)
+    wait_signal(scheduler.finished)
+    assert errors == ["Job list failed: Line 3: bad row"]
+    assert scheduler.job_error == errors[0]
+    # The generator failure is not a device result
+    assert [(r["address"], r["ok"]) for r in scheduler.results] == [("5E:00:00:00:00:01", True)]
+
+def test_results_report_negotiated_mtu_and_interval():
+    # The update to BULK_PROFILE lands six connection events in, well before the session ends
+    link = FAST._replace(mtu=185, interval_ms=30.0, min_interval_ms=10.0, join_ms=400.0)
+    scheduler, _ = run([ProvisionJob("5E:00:00:00:00:01", payload())], link=link,
+                       options=TransferOptions(wait_for="wifi"))
+    result, = scheduler.results
+    assert result["ok"], result["message"]
+    assert result["mtu"] == 185
+    assert result["intervalMs"] == 10.0
+
+def test_results_keep_initial_interval_when_sensor_rejects_update():
+    link = FAST._replace(mtu=100, interval_ms=45.0, min_interval_ms=20.0)
+    scheduler, _ = run([ProvisionJob("5E:00:00:00:00:01", payload())], link=link,
+                       options=TransferOptions(wait_for="wifi"))
+    result, = scheduler.results
+    assert (result["mtu"], result["intervalMs"]) == (100, 45.0)
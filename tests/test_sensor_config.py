@@ -0,0 +1,60 @@
+import pytest
+
+from sensor_config import DEFAULT_CONFIG, ConfigError, SensorConfig
+
+def config(**overrides):
+    return {**DEFAULT_CONFIG, "sensorId": "sim-1", **overrides}
+
+@pytest.mark.parametrize("value, expected", [("1883", 1883), (" 8883 ", 8883), (1884, 1884), (1885.0, 1885)])
+def test_ints_accept_whole_numbers(value, expected):
+    assert SensorConfig.from_dict(config(mqttPort=value)).mqttPort == expected
+
+@pytest.mark.parametrize("value", [True, 1883.5, "port", None, [1883]])
+def test_ints_reject_other_values(value):
+    with pytest.raises(ConfigError, match="mqttPort must be a whole number"):
+        SensorConfig.from_dict(config(mqttPort=value))
+
+@pytest.mark.parametrize("value", [None, 42, False])
+def test_strings_reject_non_text(value):
+    with pytest.raises(ConfigError, match="mqttTopic must be text"):
+        SensorConfig.from_dict(config(mqttTopic=value))
+
+def test_secrets_keep_whitespace():
+    cfg = SensorConfig.from_dict(config(wifiPassword=" secret-pass ", mqttTopic=" t "))
+    assert cfg.wifiPassword == " secret-pass "
+    assert cfg.mqttTopic == "t"
+
+def static(**overrides):
+    return config(**{"localIp": "192.168.1.50", "subnet": "255.255.255.0", "gatewayIp": "192.168.1.1",
+                     **overrides})
+
+def test_static_plan_accepted():
+    cfg = SensorConfig.from_dict(static(dns1Ip="8.8.8.8"))
+    assert (cfg.localIp, cfg.subnet, cfg.gatewayIp) == ("192.168.1.50", "255.255.255.0", "192.168.1.1")
+
+@pytest.mark.parametrize("mask", ["255.0.255.0", "255.255.255.1", "0.0.0.0"])
+def test_bad_subnet_masks_rejected(mask):
+    with pytest.raises(ConfigError, match="Invalid subnet mask"):
+        SensorConfig.from_dict(static(subnet=mask))
+
+@pytest.mark.parametrize("mask", ["255.255.255.255", "255.255.255.254", "128.0.0.0"])
+def test_edge_subnet_masks_accepted(mask):
+    SensorConfig.from_dict(static(localIp="10.0.0.0", gatewayIp="", subnet=mask))
+
+@pytest.mark.parametrize("local", ["192.168.1.0", "192.168.1.255"])
+def test_network_and_broadcast_local_ip_rejected(local):
+    with pytest.raises(ConfigError, match="network or broadcast address"):
+        SensorConfig.from_dict(static(localIp=local))
+
+def test_gateway_outside_subnet_rejected():
+    with pytest.raises(ConfigError, match="gatewayIp 192.168.2.1 is outside the subnet"):
+        SensorConfig.from_dict(static(gatewayIp="192.168.2.1"))
+
+@pytest.mark.parametrize("value", ["١٩٢.168.1.50", "192.168.1.５０", "192.168.1", "192.168.01.50"])
+def test_malformed_addresses_rejected(value):
+    with pytest.raises(ConfigError, match="Invalid IPv4 address in localIp"):
+        SensorConfig.from_dict(static(localIp=value))
+
+def test_dhcp_clears_static_fields():
+    cfg = SensorConfig.from_dict(static(localIp="", subnet="0.0.0.0", gatewayIp="not an address"))
+    assert all(getattr(cfg, key) == "" for key in ("localIp", "subnet", "gatewayIp", "dns1Ip", "dns2Ip"))
@@ -0,0 +1,107 @@
+
+import pytest
+
+from reconnect import Backoff
+from sim_peripheral import SimulatedPeripheral
+from simkit import CA_PEM, FAST, payload, provision, sim
+from wire_codec import CAP_JSON, TransferOptions
+
+def test_plain_write_stores_config():
+    t = sim()
+    ok, msg, _ = provision(t, payload())
+    assert ok, msg
+    assert t.peripheral.config == payload()
+
+def test_framed_write_at_minimum_mtu():
+    t = sim(FAST._replace(mtu=23))
+    ok, msg, _ = provision(t, payload(caCertificate=CA_PEM), TransferOptions(framed=True))
+    assert ok, msg
+    assert "Framed transfer complete" in msg
+    assert t.peripheral.config["caCertificate"] == CA_PEM
+
+def test_plain_write_without_response_must_fit_mtu():
+    t = sim(FAST._replace(mtu=23, write_response=False))
+    ok, msg, _ = provision(t, payload())
+    assert not ok
+    assert "do not fit" in msg
+
+def test_verified_stream_resends_lost_chunks():
+    t = sim(FAST._replace(mtu=23, loss=0.1, seed=7))
+    ok, msg, _ = provision(t, payload(caCertificate=CA_PEM), TransferOptions(framed=True, verify=True))
+    assert ok, msg
+    assert t.peripheral.config["caCertificate"] == CA_PEM
+
+@pytest.mark.parametrize("options", [
+    TransferOptions(encoding="compact"),
+    TransferOptions(framed=True, encoding="compact", der_cert=True, deflate=True),
+    TransferOptions(framed=True, encoding="auto", deflate=True),
+])
+def test_encodings_round_trip(options):
+    t = sim(FAST._replace(mtu=185))
+    config = payload(caCertificate=CA_PEM)
+    ok, msg, _ = provision(t, config, options)
+    assert ok, msg
+    assert t.peripheral.config == config
+
+def test_auto_encoding_falls_back_to_json_without_caps():
+    t = sim(FAST._replace(caps=0))
+    ok, msg, session = provision(t, payload(), TransferOptions(framed=True, encoding="auto"))
+    assert ok, msg
+    assert session._caps == CAP_JSON
+
+def test_delta_sends_only_changed_fields():
+    device = SimulatedPeripheral(payload())
+    t = sim(FAST._replace(mtu=185), peripheral=device)
+    changed = payload(mqttTopic="sensors/moved")
+    ok, msg, session = provision(t, changed, TransferOptions(framed=True, encoding="compact", delta=True))
+    assert ok, msg
+    assert device.config == changed
+    assert len(session.data) < 40
+
+def test_cert_ref_sends_fingerprint_when_device_holds_cert():
+    device = SimulatedPeripheral(payload(caCertificate=CA_PEM))
+    t = sim(FAST._replace(mtu=185), peripheral=device)
+    ok, msg, session = provision(t, payload(caCertificate=CA_PEM, mqttTopic="x"),
+                                 TransferOptions(framed=True, encoding="compact", cert_ref=True))
+    assert ok, msg
+    assert device.config["caCertificate"] == CA_PEM
+    assert len(session.data) < 200
+
+def test_missing_service_fails():
+    ok, msg, _ = provision(sim(FAST._replace(has_service=False)), payload())
+    assert not ok
+    assert "not found" in msg
+
+def test_wait_for_mqtt_follows_status_messages():
+    ok, msg, _ = provision(sim(), payload(), TransferOptions(wait_for="mqtt"))
+    assert ok, msg
+    assert "MQTT" in msg
+
+def test_session_timeout():
+    ok, msg, _ = provision(sim(FAST._replace(connect_ms=2000)), payload(), timeout_ms=100)
+    assert not ok
+    assert msg == "Timed out."
+
+def test_failed_reconnects_use_up_backoff_steps():
+    t = sim(FAST._replace(mtu=23, drop_after=5, connect_fails=2))
+    config = payload(caCertificate=CA_PEM)
+    ok, msg, session = provision(t, config, TransferOptions(framed=True), backoff=Backoff(base_ms=5, cap_ms=20))
+    assert ok, msg
+    assert session.backoff.attempt == 3
+    assert t.peripheral.config == config
+
+def test_session_fails_once_reconnects_run_out():
+    t = sim(FAST._replace(mtu=23, drop_after=5, connect_fails=9))
+    ok, msg, session = provision(t, payload(), TransferOptions(framed=True), backoff=Backoff(base_ms=5, cap_ms=20))
+    assert not ok
+    assert msg.startswith("Controller error")
+    assert session.backoff.attempt == session.backoff.attempts
+
+def test_cert_ref_with_json_sends_cert_in_full():
+    device = SimulatedPeripheral(payload(caCertificate=CA_PEM))
+    t = sim(FAST._replace(mtu=185), peripheral=device)
+    config = payload(caCertificate=CA_PEM, mqttTopic="x")
+    ok, msg, session = provision(t, config, TransferOptions(framed=True, encoding="json", cert_ref=True))
+    assert ok, msg
+    assert device.config == config
+    assert not session._resolved.cert_ref
@@ -0,0 +1,29 @@
+import pytest
+
+from status_monitor import EV_APPLIED, EV_ERROR, EV_INFO, EV_MQTT, EV_RECEIVED, EV_WIFI, parse_status
+
+@pytest.mark.parametrize("text, kind", [
+    ("RX 311 bytes", EV_RECEIVED),
+    ("OK config saved", EV_APPLIED),
+    ("WIFI connected", EV_WIFI),
+    ("Wi-Fi: joined lab", EV_WIFI),
+    ("MQTT connected", EV_MQTT),
+    ("ERR invalid config", EV_ERROR),
+    ("MQTT connect failed", EV_ERROR),
+    ("booting", EV_INFO),
+])
+def test_parse_status(text, kind):
+    assert parse_status(text.encode()).kind == kind
+
+@pytest.mark.parametrize("text", [
+    "WiFi not connected",
+    "WIFI disconnected",
+    "Wi-Fi: connection lost",
+    "MQTT not connected",
+    "MQTT disconnected",
+    "MQTT connection lost",
+    "WLAN down, connected to nothing",
+    "config not saved",
+])
+def test_negated_status_is_not_progress(text):
+    assert parse_status(text.encode()).kind == EV_INFO
@@ -0,0 +1,52 @@
+import json
+
+from telemetry import Telemetry
+
+def test_spans_rotate_at_max_bytes(tmp_path):
+    path = tmp_path / "telemetry.jsonl"
+    telemetry = Telemetry(str(path), "", max_bytes=2000, backups=2)
+    for i in range(200):
+        trace = telemetry.trace(f"AA:BB:CC:DD:EE:{i % 256:02X}")
+        trace.start("connect")
+        trace.end("connect")
+    telemetry.close()
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["telemetry.jsonl", "telemetry.jsonl.1", "telemetry.jsonl.2"]
+    assert all(p.stat().st_size <= 2000 for p in tmp_path.iterdir())
+    assert json.loads(path.read_text().splitlines()[-1])["span"] == "connect"
+
+def test_unbounded_by_default(tmp_path):
+    path = tmp_path / "t.jsonl"
+    telemetry = Telemetry(str(path), "")
+    for _ in range(100):
+        telemetry.trace("AA:BB:CC:DD:EE:01").event("status", text="x" * 50)
+    telemetry.close()
+    assert len(path.read_text().splitlines()) == 100
+
+def test_metrics_written_on_request_not_per_trace(tmp_path):
+    prom = tmp_path / "metrics.prom"
+    telemetry = Telemetry(str(tmp_path / "t.jsonl"), str(prom))
+    for _ in range(3):
+        trace = telemetry.trace("AA:BB:CC:DD:EE:01")
+        trace.start("connect")
+        trace.close()
+    assert not prom.exists()
+    telemetry.write_prometheus()
+    assert 'envdata_ble_traces_total{outcome="failed"} 3' in prom.read_text()
+    prom.unlink()
+    telemetry.write_prometheus()
+    assert not prom.exists()
+    telemetry.close()
+
+def test_lines_are_written_off_the_calling_thread(tmp_path, monkeypatch):
+    import logging.handlers, threading
+    writers = set()
+    emit = logging.handlers.RotatingFileHandler.emit
+    monkeypatch.setattr(logging.handlers.RotatingFileHandler, "emit",
+                        lambda self, record: (writers.add(threading.get_ident()), emit(self, record))[1])
+    path = tmp_path / "t.jsonl"
+    telemetry = Telemetry(str(path), "")
+    telemetry.trace("AA:BB:CC:DD:EE:01").event("status", text="x")
+    telemetry.close()
+    assert len(path.read_text().splitlines()) == 1
+    assert writers and threading.get_ident() not in writers
@@ -0,0 +1,25 @@
+import pytest
+
+from sim_peripheral import SimulatedTransport
+from transport import Transport, address_key
+
+def test_transport_missing_methods_fails_on_construction():
+    class Partial(Transport):
+        def connect_device(self) -> bool:
+            return True
+
+    with pytest.raises(TypeError, match="abstract class Partial"):
+        Partial("AA:BB:CC:DD:EE:01")
+
+def test_base_transport_is_abstract():
+    with pytest.raises(TypeError):
+        Transport("AA:BB:CC:DD:EE:01")
+
+def test_simulated_transport_is_complete(qapp):
+    from simkit import sim
+    t = sim()
+    assert isinstance(t, SimulatedTransport)
+    assert t.address == "5E:00:00:00:00:01"
+
+def test_address_key_ignores_case_and_whitespace():
+    assert address_key(" aa:bb:cc:dd:ee:01 ") == address_key("AA:BB:CC:DD:EE:01")
@@ -0,0 +1,36 @@
+import pytest
+
+import cert_store
+from cert_store import CertStore
+from cert_utils import pem_to_der
+from config_delta import diff_config, field_digest
+from simkit import CA_PEM, payload
+from wire_codec import CAP_CERT_REF, CAP_COMPACT, CAP_JSON, TransferOptions, pack_payload, resolve_options, \
+    unpack_payload
+
+ALL_CAPS = CAP_JSON | CAP_COMPACT | CAP_CERT_REF
+
+@pytest.mark.parametrize("encoding, caps, cert_ref", [
+    ("compact", ALL_CAPS, True),
+    ("auto", ALL_CAPS, True),
+    ("auto", CAP_JSON | CAP_CERT_REF, False),
+    ("json", ALL_CAPS, False),
+    ("compact", CAP_JSON | CAP_COMPACT, False),
+])
+def test_cert_ref_needs_compact_encoding(encoding, caps, cert_ref):
+    options = resolve_options(TransferOptions(framed=True, encoding=encoding, cert_ref=True), caps)
+    assert options.cert_ref is cert_ref
+
+def test_cert_store_parses_each_certificate_once(monkeypatch):
+    parsed = []
+    monkeypatch.setattr(cert_store, "pem_to_der", lambda pem: (parsed.append(pem), pem_to_der(pem))[1])
+    certs = CertStore()
+    options = TransferOptions(framed=True, encoding="compact", der_cert=True)
+    config = payload(caCertificate=CA_PEM)
+    for i in range(5):
+        data, flags = pack_payload({**config, "sensorId": f"s{i}"}, options, certs=certs)
+        assert unpack_payload(data, flags)["caCertificate"] == CA_PEM
+        digest = field_digest("caCertificate", CA_PEM, certs)
+    assert len(parsed) == 1
+    assert digest == field_digest("caCertificate", CA_PEM)
+    assert diff_config(config, {"caCertificate": digest}, certs).keys() == set(config) - {"caCertificate"}